@@ -0,0 +1,217 @@
+"""
+Admission Control - Adaptive concurrency limiter with a bounded, deadline-aware, tenant-fair wait queue
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Callable, AsyncIterator
+
+class AdmissionRejected(Exception):
+    def __init__(self, message: str, status_code: int, retry_after: int, reason: str = "saturated"):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+        self.reason = reason
+
+class WeightedFairQueue:
+    """Start-time fair queue: tenants are served in proportion to their weights."""
+
+    def __init__(self, weight_for: Callable[[str], float] = None):
+        self.weight_for = weight_for or (lambda tenant: 1.0)
+        self._heap = []
+        self._seq = itertools.count()
+        self._finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self.queued: Counter = Counter()
+
+    def __len__(self) -> int:
+        return len(self._heap)
+
+    def push(self, tenant: str, item: Any, cost: float = 1.0):
+        # Items pop in finish-tag order, so a deep backlog cannot starve a light tenant
+        start = max(self._virtual_time, self._finish.get(tenant, 0.0))
+        finish = start + cost / max(self.weight_for(tenant), 1e-6)
+        self._finish[tenant] = finish
+        heapq.heappush(self._heap, (finish, next(self._seq), start, tenant, item))
+        self.queued[tenant] += 1
+
+    def pop(self) -> Any:
+        _, _, start, tenant, item = heapq.heappop(self._heap)
+        self._virtual_time = max(self._virtual_time, start)
+        self._dequeued(tenant)
+        return item
+
+    def remove(self, item: Any) -> bool:
+        for index, entry in enumerate(self._heap):
+            if entry[4] is item:
+                self._heap[index] = self._heap[-1]
+                self._heap.pop()
+                heapq.heapify(self._heap)
+                self._dequeued(entry[3])
+                return True
+        return False
+
+    def _dequeued(self, tenant: str):
+        self.queued[tenant] -= 1
+        if not self.queued[tenant]:
+            del self.queued[tenant]
+            # An idle tenant restarts from the current virtual time, so drop its tag
+            if self._finish.get(tenant, 0.0) <= self._virtual_time:
+                self._finish.pop(tenant, None)
+
+class FairScheduler:
+    """Fixed-capacity slots handed out across tenants by ``WeightedFairQueue``."""
+
+    def __init__(self, capacity: int, weight_for: Callable[[str], float] = None):
+        self.capacity = capacity
+        self.in_flight = 0
+        self._queue = WeightedFairQueue(weight_for)
+
+    @asynccontextmanager
+    async def slot(self, tenant: str) -> AsyncIterator[None]:
+        if self.in_flight < self.capacity and not self._queue:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._queue.push(tenant, waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    self._release()
+                else:
+                    self._queue.remove(waiter)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        self.in_flight -= 1
+        while self._queue and self.in_flight < self.capacity:
+            waiter = self._queue.pop()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "capacity": self.capacity,
+            "in_flight": self.in_flight,
+            "queued": len(self._queue),
+            "queued_by_tenant": dict(self._queue.queued)
+        }
+
+class AdaptiveLimiter:
+    """AIMD concurrency limit driven by observed latency, with a bounded tenant-fair wait queue."""
+
+    def __init__(
+        self,
+        initial_limit: int = 20,
+        min_limit: int = 2,
+        max_limit: int = 200,
+        max_queue: int = 100,
+        queue_timeout: float = 10.0,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        max_queue_per_tenant: int = 0,
+        weight_for: Callable[[str], float] = None
+    ):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.max_queue_per_tenant = max_queue_per_tenant
+
+        self.in_flight = 0
+        self._waiters = WeightedFairQueue(weight_for)
+        self.avg_latency = None
+        self.baseline_latency = None
+
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    def _retry_after(self) -> int:
+        return max(1, math.ceil(self.avg_latency or 1))
+
+    async def acquire(self, tenant: str = "default"):
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("Service is saturated, try again later", 429, self._retry_after(), "queue_full")
+        if self.max_queue_per_tenant and self._waiters.queued[tenant] >= self.max_queue_per_tenant:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected("Too many queued requests for this tenant", 429, self._retry_after(), "tenant_queue_full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.push(tenant, waiter)
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout)
+        except asyncio.TimeoutError:
+            self.rejected_timeout += 1
+            raise AdmissionRejected("Timed out waiting for capacity", 503, self._retry_after(), "queue_timeout")
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the caller went away
+                self.release(None)
+            raise
+        finally:
+            self._waiters.remove(waiter)
+        self.admitted += 1
+
+    def release(self, latency: float = None, failed: bool = False):
+        """Free a slot; ``latency`` (seconds) and ``failed`` feed the limit adjustment."""
+        self.in_flight -= 1
+        if latency is not None or failed:
+            self._adjust(latency, failed)
+
+        # Hand freed slots straight to waiters so the in-flight count stays accurate
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.pop()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def _adjust(self, latency: float, failed: bool):
+        # A fast average against a slow baseline, so a mix of cache hits and LLM calls does not skew it
+        if latency is not None:
+            if self.avg_latency is None:
+                self.avg_latency = self.baseline_latency = latency
+            else:
+                self.avg_latency = 0.9 * self.avg_latency + 0.1 * latency
+                self.baseline_latency = 0.99 * self.baseline_latency + 0.01 * latency
+
+        if failed or (self.avg_latency is not None and self.avg_latency > self.baseline_latency * self.tolerance):
+            self.limit = max(self.min_limit, self.limit * self.backoff)
+        else:
+            self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit": int(self.limit),
+            "min_limit": self.min_limit,
+            "max_limit": self.max_limit,
+            "in_flight": self.in_flight,
+            "queued": len(self._waiters),
+            "queued_by_tenant": dict(self._waiters.queued),
+            "max_queue": self.max_queue,
+            "max_queue_per_tenant": self.max_queue_per_tenant,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+            "avg_latency_ms": round(self.avg_latency * 1000, 2) if self.avg_latency is not None else None,
+            "baseline_latency_ms": round(self.baseline_latency * 1000, 2) if self.baseline_latency is not None else None
+        }
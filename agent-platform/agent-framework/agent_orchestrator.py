@@ -2,20 +2,137 @@
 Agent Orchestrator - Manages all agents
 """
 
-from typing import Dict, Any
-from data_analysis_agent import DataAnalysisAgent
-from web_automation_agent import WebAutomationAgent
-from task_management_agent import TaskManagementAgent
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime, timezone
+from typing import Dict, Any, AsyncIterator, List, Tuple, Callable, Optional
+from llm_client import LLMClientPool
+from response_cache import ResponseCache
+from llm_router import LLMRouter
+from llm_batcher import MicroBatcher
+from cpu_executor import CPUExecutor
+from prompt_builder import PromptBuilder
+from singleflight import SingleFlight
+from agent_registry import AgentRegistry, discover_agents
+from workflow import WorkflowEngine
+from sessions import SessionManager
+from execution_history import ExecutionRecorder
+from admission import FairScheduler
+from tenancy import current_tenant
+from resilience import is_overload
+from metrics import stage, current_timings, REQUEST_LATENCY
+from tracing import traced, set_attributes
 
 class AgentOrchestrator:
-    def __init__(self, llm_service_url: str):
-        self.agents = {
-            "data_analysis": DataAnalysisAgent(llm_service_url),
-            "web_automation": WebAutomationAgent(llm_service_url),
-            "task_management": TaskManagementAgent(llm_service_url)
+    def __init__(
+        self,
+        llm_service_url: str,
+        llm_client: LLMClientPool = None,
+        response_cache: ResponseCache = None,
+        llm_router: LLMRouter = None,
+        prompt_builder: PromptBuilder = None,
+        llm_batcher: MicroBatcher = None,
+        executor: CPUExecutor = None,
+        sessions: SessionManager = None,
+        history: ExecutionRecorder = None,
+        resources: Dict[str, Callable[[], Any]] = None,
+        enabled_agents: Optional[List[str]] = None,
+        agent_plugins: Dict[str, str] = None,
+        agent_options: Dict[str, Dict[str, Any]] = None,
+        batch_concurrency: int = 32,
+        agent_concurrency: Dict[str, int] = None,
+        coalesce_requests: bool = True,
+        max_workflow_runs: int = 1000,
+        workflow_step_cache_size: int = 1024,
+        tenant_weight: Callable[[str], float] = None
+    ):
+        # One connection pool shared by every agent
+        self.llm_client = llm_client or LLMClientPool()
+        self.response_cache = response_cache
+        self.llm_router = llm_router or LLMRouter([llm_service_url], self.llm_client)
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        agent_kwargs = {
+            "llm_client": self.llm_client,
+            "response_cache": response_cache,
+            "llm_router": self.llm_router,
+            "prompt_builder": self.prompt_builder,
+            "llm_batcher": llm_batcher,
+            "executor": executor
         }
+        # Agents are imported and constructed on first use; shared resources
+        # such as the data engine are built from ``resources`` factories
+        self.agents = AgentRegistry(
+            llm_service_url,
+            discover_agents(agent_plugins),
+            enabled=enabled_agents,
+            agent_kwargs=agent_kwargs,
+            agent_options=agent_options,
+            resources=resources
+        )
+        
+        # Conversation history for tasks that carry a ``session_id``
+        self.sessions = sessions or SessionManager(prompt_builder=self.prompt_builder)
+        
+        # Optional: every executed task is recorded here off the request path
+        self.history = history
+        
+        # Identical concurrent requests share one execution
+        self.singleflight = SingleFlight() if coalesce_requests else None
+        
+        # Batch fan-out limits, shared by every batch running in this process;
+        # global slots are handed out fairly across tenants by weight
+        self.batch_concurrency = batch_concurrency
+        self.agent_concurrency = dict(agent_concurrency or {})
+        self.batch_scheduler = FairScheduler(batch_concurrency, tenant_weight)
+        self._agent_semaphores = {
+            agent_type: asyncio.Semaphore(limit)
+            for agent_type, limit in self.agent_concurrency.items()
+        }
+        
+        # Multi-step workflows run their steps under the same fan-out limits
+        self.workflows = WorkflowEngine(self, max_workflow_runs, workflow_step_cache_size)
     
+    @traced("orchestrator.execute_task")
     async def execute_task(self, agent_type: str, task: Dict[str, Any]) -> Dict[str, Any]:
+        set_attributes({"agent.type": agent_type, "agent.use_cache": task.get("use_cache", True)})
+        if self.history is None:
+            return await self._execute_task(agent_type, task)
+        
+        start = time.perf_counter()
+        try:
+            result = await self._execute_task(agent_type, task)
+        except Exception as e:
+            self.history.record(self._history_entry(agent_type, task, {"status": "error", "error": str(e)}, start))
+            raise
+        execution_id = self.history.record(self._history_entry(agent_type, task, result, start))
+        if execution_id is not None:
+            result["execution_id"] = execution_id
+        return result
+    
+    def _history_entry(self, agent_type: str, task: Dict[str, Any], result: Dict[str, Any], start: float) -> Dict[str, Any]:
+        response = result.get("response")
+        return {
+            "id": uuid.uuid4().hex,
+            "created_at": datetime.now(timezone.utc),
+            "tenant": current_tenant(),
+            "agent_type": agent_type,
+            "status": result.get("status", "unknown"),
+            "session_id": task.get("session_id"),
+            "task_description": task.get("task_description", ""),
+            "parameters": task.get("parameters"),
+            "response": response,
+            "error": result.get("error"),
+            "prompt_tokens": result.get("prompt_tokens"),
+            "response_tokens": self.prompt_builder.estimate_tokens(response) if response else None,
+            "duration_ms": round((time.perf_counter() - start) * 1000, 3),
+            "timings": current_timings()
+        }
+    
+    async def _execute_task(self, agent_type: str, task: Dict[str, Any]) -> Dict[str, Any]:
         if agent_type not in self.agents:
             return {
                 "status": "error",
@@ -23,11 +140,100 @@ class AgentOrchestrator:
                 "available_agents": list(self.agents.keys())
             }
         
-        agent = self.agents[agent_type]
-        return await agent.execute(task)
+        agent = await self.agents.get(agent_type)
+        session_id = task.get("session_id")
+        async with self.sessions.open(session_id) if session_id else nullcontext():
+            with stage("execute_task"):
+                # Session requests are serialized per session and carry their own history, so never coalesce
+                if self.singleflight is None or session_id or not task.get("use_cache", True):
+                    return await agent.execute(task)
+                
+                result = await self.singleflight.do(
+                    self._request_key(agent_type, task),
+                    lambda: agent.execute(task)
+                )
+        # Followers share the leader's result; give each caller its own copy
+        return dict(result)
     
-    def get_capabilities(self) -> Dict[str, Any]:
-        return {
-            agent_name: agent.capabilities 
-            for agent_name, agent in self.agents.items()
-        }
+    @staticmethod
+    def _request_key(agent_type: str, task: Dict[str, Any]) -> str:
+        canonical = json.dumps([agent_type, task], sort_keys=True, separators=(",", ":"), default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+    
+    async def execute_batch(self, items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Run ``{"agent_type": ..., "task": {...}}`` items concurrently; results keep input order."""
+        results = await asyncio.gather(*(
+            self._execute_limited(index, item) for index, item in enumerate(items)
+        ))
+        return [result for _, result in results]
+    
+    async def execute_batch_as_completed(self, items: List[Dict[str, Any]]) -> AsyncIterator[Dict[str, Any]]:
+        """Like ``execute_batch`` but yields each result, tagged with its ``index``, as soon as it finishes."""
+        pending = [
+            asyncio.ensure_future(self._execute_limited(index, item))
+            for index, item in enumerate(items)
+        ]
+        try:
+            for next_done in asyncio.as_completed(pending):
+                index, result = await next_done
+                yield {"index": index, **result}
+        finally:
+            # The consumer went away (e.g. client disconnect): stop the rest of the batch
+            for future in pending:
+                future.cancel()
+    
+    async def execute_workflow(self, steps: List[Dict[str, Any]], use_cache: bool = True) -> Dict[str, Any]:
+        """Run a DAG of agent steps; see ``WorkflowEngine``. Raises ``WorkflowError`` for invalid graphs."""
+        return await self.workflows.run(steps, use_cache)
+    
+    async def rerun_workflow(self, workflow_id: str, step_ids: List[str] = None) -> Dict[str, Any]:
+        return await self.workflows.rerun(workflow_id, step_ids)
+    
+    async def _execute_limited(self, index: int, item: Dict[str, Any], mode: str = "batch") -> Tuple[int, Dict[str, Any]]:
+        agent_type = item.get("agent_type")
+        # Take the per-agent slot first so tasks queued behind a saturated agent
+        # do not hold global slots that other agents could use
+        async with self._agent_semaphores.get(agent_type, nullcontext()):
+            async with self.batch_scheduler.slot(current_tenant()):
+                start = time.perf_counter()
+                try:
+                    result = await self.execute_task(agent_type, item.get("task", {}))
+                except Exception as e:
+                    result = {
+                        "status": "error",
+                        "agent_type": agent_type,
+                        "error": str(e),
+                        "overloaded": is_overload(e)
+                    }
+                REQUEST_LATENCY.labels(
+                    agent_type if agent_type in self.agents else "unknown",
+                    mode,
+                    result.get("status", "unknown")
+                ).observe(time.perf_counter() - start)
+                return index, result
+    
+    async def stream_task(self, agent_type: str, task: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """Yield ``token`` events as the LLM produces them, then one ``done`` or ``error`` event."""
+        if agent_type not in self.agents:
+            yield {
+                "event": "error",
+                "error": f"Unknown agent type: {agent_type}",
+                "available_agents": list(self.agents.keys())
+            }
+            return
+        
+        try:
+            agent = await self.agents.get(agent_type)
+            session_id = task.get("session_id")
+            async with self.sessions.open(session_id) if session_id else nullcontext():
+                async for token in agent.execute_stream(task):
+                    yield {"event": "token", "token": token}
+        except Exception as e:
+            yield {"event": "error", "agent_type": agent_type, "error": str(e), "overloaded": is_overload(e)}
+            return
+        
+        yield {"event": "done", "agent_type": agent_type, "capabilities": agent.capabilities}
+    
+    async def get_capabilities(self) -> Dict[str, Any]:
+        # Never loads agents: listing must not import their modules or build their resources
+        return {agent_name: self.agents.capabilities(agent_name) for agent_name in self.agents}
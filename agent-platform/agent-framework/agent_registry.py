@@ -0,0 +1,207 @@
+"""
+Agent Registry - Plugin discovery with lazy agent import and construction
+"""
+
+import asyncio
+import importlib
+import inspect
+import logging
+import time
+from collections.abc import Mapping
+from importlib.metadata import entry_points
+from typing import Dict, Any, Optional, List, Callable, Iterator
+
+logger = logging.getLogger("agent.registry")
+
+# Installed packages can contribute agents under this entry point group:
+#   [project.entry-points."agent_platform.agents"]
+#   legal_review = "legal_agents:LegalReviewAgent"
+ENTRY_POINT_GROUP = "agent_platform.agents"
+
+BUILTIN_AGENTS = {
+    "data_analysis": "data_analysis_agent:DataAnalysisAgent",
+    "web_automation": "web_automation_agent:WebAutomationAgent",
+    "task_management": "task_management_agent:TaskManagementAgent"
+}
+
+# Declared here rather than read from the classes, so listing agents imports none of them
+BUILTIN_CAPABILITIES = {
+    "data_analysis": ["csv_analysis", "parquet_analysis", "statistical_analysis", "data_visualization"],
+    "web_automation": ["web_scraping", "web_crawling", "api_integration", "content_extraction"],
+    "task_management": ["project_planning", "task_scheduling", "progress_tracking"]
+}
+
+def load_object(target: str) -> Any:
+    """Import ``"package.module:attribute"``."""
+    module_name, _, attribute = target.partition(":")
+    if not attribute:
+        raise ValueError(f"Agent target must look like 'module:Class': {target!r}")
+    return getattr(importlib.import_module(module_name), attribute)
+
+def discover_agents(plugins: Optional[Dict[str, str]] = None, use_entry_points: bool = True) -> Dict[str, str]:
+    """Agent name to import target: built-ins, then entry points, then configured plugins.
+
+    Only metadata is read here; nothing is imported until an agent is used.
+    """
+    targets = dict(BUILTIN_AGENTS)
+    if use_entry_points:
+        for entry_point in entry_points(group=ENTRY_POINT_GROUP):
+            targets[entry_point.name] = entry_point.value
+    targets.update(plugins or {})
+    return targets
+
+class AgentRegistry(Mapping):
+    """Enabled agents by name, imported and constructed on first use.
+
+    Membership and iteration only consult the configured names, so listing or
+    validating agents never imports them. Agent modules are imported in a
+    worker thread so heavy dependencies do not stall the event loop, and each
+    agent is constructed once with the shared ``agent_kwargs`` plus
+    per-agent ``agent_options``. Constructor parameters named after a
+    registered resource (e.g. ``data_engine``) receive that resource, which
+    is also built lazily from its factory and shared between agents.
+    """
+
+    def __init__(
+        self,
+        llm_service_url: str,
+        targets: Dict[str, str],
+        enabled: Optional[List[str]] = None,
+        agent_kwargs: Optional[Dict[str, Any]] = None,
+        agent_options: Optional[Dict[str, Dict[str, Any]]] = None,
+        resources: Optional[Dict[str, Callable[[], Any]]] = None,
+        capabilities: Optional[Dict[str, List[str]]] = None
+    ):
+        if enabled:
+            unknown = [name for name in enabled if name not in targets]
+            if unknown:
+                raise ValueError(f"Unknown agents enabled: {', '.join(unknown)}; available: {', '.join(targets)}")
+            targets = {name: targets[name] for name in enabled}
+        self.llm_service_url = llm_service_url
+        self.targets = targets
+        self.agent_kwargs = dict(agent_kwargs or {})
+        self.agent_options = dict(agent_options or {})
+        self.factories = dict(resources or {})
+        self.declared_capabilities = dict(BUILTIN_CAPABILITIES if capabilities is None else capabilities)
+
+        self._agents: Dict[str, Any] = {}
+        self._resources: Dict[str, Any] = {}
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._resource_lock = asyncio.Lock()
+        self.load_times: Dict[str, float] = {}
+        self.load_errors: Dict[str, str] = {}
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.targets
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.targets)
+
+    def __len__(self) -> int:
+        return len(self.targets)
+
+    def __getitem__(self, name: str) -> Any:
+        # Synchronous path for scripts and tests; the service uses ``get``
+        if name not in self._agents:
+            if name not in self.targets:
+                raise KeyError(name)
+            start = time.perf_counter()
+            agent_class = load_object(self.targets[name])
+            shared = {
+                resource: self.resource_sync(resource)
+                for resource in self._wanted_resources(agent_class)
+            }
+            self._construct(name, agent_class, shared, start)
+        return self._agents[name]
+
+    async def get(self, name: str) -> Any:
+        agent = self._agents.get(name)
+        if agent is not None:
+            return agent
+        if name not in self.targets:
+            raise KeyError(name)
+
+        # Concurrent first requests share one load
+        loading = self._loading.get(name)
+        if loading is None:
+            loading = self._loading[name] = asyncio.ensure_future(self._load(name))
+            loading.add_done_callback(lambda _: self._loading.pop(name, None))
+        return await asyncio.shield(loading)
+
+    async def _load(self, name: str) -> Any:
+        start = time.perf_counter()
+        try:
+            agent_class = await asyncio.to_thread(load_object, self.targets[name])
+            shared = {
+                resource: await self.resource(resource)
+                for resource in self._wanted_resources(agent_class)
+            }
+        except Exception as e:
+            self.load_errors[name] = str(e)
+            logger.error(f"Agent {name} failed to load from {self.targets[name]}: {str(e)}")
+            raise
+        return self._construct(name, agent_class, shared, start)
+
+    def _wanted_resources(self, agent_class) -> List[str]:
+        parameters = inspect.signature(agent_class).parameters
+        return [name for name in self.factories if name in parameters]
+
+    def _construct(self, name: str, agent_class, shared: Dict[str, Any], start: float) -> Any:
+        kwargs = {**self.agent_kwargs, **shared, **self.agent_options.get(name, {})}
+        agent = self._agents[name] = agent_class(self.llm_service_url, **kwargs)
+        self.load_times[name] = time.perf_counter() - start
+        self.load_errors.pop(name, None)
+        logger.info(f"Loaded agent {name} in {self.load_times[name] * 1000:.1f} ms")
+        return agent
+
+    async def resource(self, name: str) -> Any:
+        """The shared resource ``name``, built in a worker thread on first use."""
+        if name not in self._resources:
+            async with self._resource_lock:
+                if name not in self._resources:
+                    self._resources[name] = await asyncio.to_thread(self.factories[name])
+        return self._resources[name]
+
+    def resource_sync(self, name: str) -> Any:
+        if name not in self._resources:
+            self._resources[name] = self.factories[name]()
+        return self._resources[name]
+
+    def peek_resource(self, name: str) -> Optional[Any]:
+        """The resource if it has been built, without building it."""
+        return self._resources.get(name)
+
+    def capabilities(self, name: str) -> Optional[List[str]]:
+        """Capabilities of a loaded agent, else as declared; None for plugins that are not loaded yet."""
+        agent = self._agents.get(name)
+        if agent is not None:
+            return list(agent.capabilities)
+        declared = self.declared_capabilities.get(name)
+        return list(declared) if declared is not None else None
+
+    async def preload(self, names: List[str]):
+        await asyncio.gather(*(self.get(name) for name in names))
+
+    def loaded(self) -> Dict[str, Any]:
+        return dict(self._agents)
+
+    async def close(self):
+        for name, instance in self._resources.items():
+            close = getattr(instance, "close", None)
+            if close is None:
+                continue
+            try:
+                result = close()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.warning(f"Closing resource {name} failed: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": list(self.targets),
+            "loaded": list(self._agents),
+            "load_ms": {name: round(seconds * 1000, 1) for name, seconds in self.load_times.items()},
+            "load_errors": dict(self.load_errors),
+            "resources": list(self._resources)
+        }
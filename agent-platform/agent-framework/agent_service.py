@@ -2,22 +2,382 @@
 Agent Service - FastAPI service for agent management
 """
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Dict, Any, Optional
+import time
+# Taken before the imports below so the startup report includes them
+STARTED_AT = time.perf_counter()
+
+from fastapi import FastAPI, HTTPException, Request, Response, Header, Depends
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, field_validator
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST, CollectorRegistry, multiprocess
+from typing import Dict, Any, Optional, List, Callable, Awaitable
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
 import asyncio
+import json
+import logging
+import os
 from agent_orchestrator import AgentOrchestrator
+from llm_client import LLMClientPool
+from llm_router import LLMRouter, DEFAULT_MODEL
+from llm_batcher import MicroBatcher
+from cpu_executor import CPUExecutor, LoopLagMonitor, available_cpus
+from resilience import ResiliencePolicy, is_overload
+from response_cache import ResponseCache
+from prompt_builder import PromptBuilder
+from sessions import SessionManager, InMemorySessionStore, RedisSessionStore, llm_summarizer, SESSION_ID
+from execution_history import ExecutionRecorder, PostgresExecutionStore, SQLiteExecutionStore
+from workflow import WorkflowError
+from job_queue import InMemoryJobStore, RedisJobStore, JobWorkerPool, QueueFullError
+from admission import AdaptiveLimiter, AdmissionRejected
+from tenancy import TenantLimiter, TenantPolicy, TENANT_ID, DEFAULT_TENANT, set_tenant
+from tracing import setup_tracing, shutdown_tracing, span, traced, set_attributes, TracingMiddleware
+from metrics import start_timings, record_timing, set_service_state, REQUEST_LATENCY, QUEUE_WAIT, TENANT_LATENCY, TENANT_REJECTIONS
+
+logger = logging.getLogger("agent.service")
+
+LLM_SERVICE_URL = os.getenv("LLM_SERVICE_URL", "http://llm-service:8000")  # Internal Kubernetes service
+# Comma-separated LLM replicas to balance across; defaults to the single service above
+LLM_SERVICE_URLS = [url.strip() for url in os.getenv("LLM_SERVICE_URLS", LLM_SERVICE_URL).split(",") if url.strip()]
+
+# Tracing is off unless TRACE_EXPORTER is console, file or otlp; sampled requests
+# carry their trace context to the LLM service in the traceparent header
+setup_tracing(
+    service_name=os.getenv("OTEL_SERVICE_NAME", "agent-service"),
+    exporter=os.getenv("TRACE_EXPORTER", "none"),
+    sample_ratio=float(os.getenv("TRACE_SAMPLE_RATIO", "0.05")),
+    file_path=os.getenv("TRACE_FILE", "/tmp/agent-traces.jsonl")
+)
+
+# Uvicorn worker processes when run as a script; "auto" starts one per available CPU
+WORKERS = available_cpus() if os.getenv("WORKERS", "1") == "auto" else int(os.getenv("WORKERS", "1"))
+
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "500"))
+MAX_WORKFLOW_STEPS = int(os.getenv("MAX_WORKFLOW_STEPS", "50"))
+
+def parse_agent_settings(value: str, cast=float) -> Dict[str, Any]:
+    """Parse ``"data_analysis=180,web_automation=60"`` into a per-agent map."""
+    settings = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        agent_name, _, setting = item.partition("=")
+        settings[agent_name.strip()] = cast(setting)
+    return settings
+
+# Shared LLM connection pool, opened on startup and closed on shutdown
+llm_pool = LLMClientPool(
+    max_connections=int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100")),
+    max_keepalive_connections=int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20")),
+    keepalive_expiry=float(os.getenv("LLM_POOL_KEEPALIVE_EXPIRY", "30")),
+    http2=os.getenv("LLM_HTTP2", "false").lower() == "true",
+    default_timeout=float(os.getenv("LLM_TIMEOUT", "120")),
+    agent_timeouts=parse_agent_settings(os.getenv("LLM_AGENT_TIMEOUTS", ""))
+)
+
+def build_resilience_policies():
+    """Default retry/hedging policy plus per-agent overrides (e.g. ``LLM_AGENT_HEDGE="data_analysis=true"``)."""
+    as_bool = lambda value: value.strip().lower() == "true"
+    defaults = {
+        "max_attempts": int(os.getenv("LLM_MAX_ATTEMPTS", "3")),
+        "base_delay": float(os.getenv("LLM_RETRY_BASE_DELAY", "0.2")),
+        "max_delay": float(os.getenv("LLM_RETRY_MAX_DELAY", "2")),
+        "retry_on_timeout": as_bool(os.getenv("LLM_RETRY_ON_TIMEOUT", "false")),
+        "hedge": as_bool(os.getenv("LLM_HEDGE", "false")),
+        "hedge_quantile": float(os.getenv("LLM_HEDGE_QUANTILE", "0.95"))
+    }
+    overrides = {}
+    for setting, env_name, cast in (
+        ("max_attempts", "LLM_AGENT_MAX_ATTEMPTS", int),
+        ("retry_on_timeout", "LLM_AGENT_RETRY_ON_TIMEOUT", as_bool),
+        ("hedge", "LLM_AGENT_HEDGE", as_bool)
+    ):
+        for agent_name, value in parse_agent_settings(os.getenv(env_name, ""), cast).items():
+            overrides.setdefault(agent_name, {})[setting] = value
+    
+    agent_policies = {
+        agent_name: ResiliencePolicy(**{**defaults, **settings})
+        for agent_name, settings in overrides.items()
+    }
+    return ResiliencePolicy(**defaults), agent_policies
+
+default_policy, agent_policies = build_resilience_policies()
+
+# Endpoint selection, passive health tracking and retries across LLM replicas
+llm_router = LLMRouter(
+    LLM_SERVICE_URLS,
+    llm_pool,
+    strategy=os.getenv("LLM_ROUTING_STRATEGY", "least_outstanding"),
+    failure_threshold=int(os.getenv("LLM_EJECT_AFTER_FAILURES", "3")),
+    ejection_time=float(os.getenv("LLM_EJECTION_TIME", "30")),
+    default_model=os.getenv("LLM_MODEL", DEFAULT_MODEL),
+    agent_models=parse_agent_settings(os.getenv("LLM_AGENT_MODELS", ""), str),
+    default_policy=default_policy,
+    agent_policies=agent_policies
+)
+
+# CPU-bound agent steps (dataset parsing and aggregation) run in a process pool
+# with CPU_EXECUTOR=process, sized by default to this worker's share of the CPUs;
+# otherwise they run on a thread, which frees the event loop but not the GIL
+cpu_executor = None
+if os.getenv("CPU_EXECUTOR", "thread") == "process":
+    cpu_executor = CPUExecutor(
+        max_workers=int(os.getenv("CPU_EXECUTOR_WORKERS", "0")) or max(1, available_cpus() // WORKERS),
+        shared_memory_threshold=int(float(os.getenv("CPU_SHARED_MEMORY_MIN_MB", "1")) * 1024 * 1024)
+    )
+
+# Reports event-loop stalls and the stack that caused them
+loop_monitor = None
+if os.getenv("LOOP_LAG_MONITOR", "true").lower() == "true":
+    loop_monitor = LoopLagMonitor(
+        interval=float(os.getenv("LOOP_LAG_INTERVAL", "0.25")),
+        threshold=float(os.getenv("LOOP_LAG_THRESHOLD_MS", "100")) / 1000
+    )
+
+# Optional micro-batching of concurrent prompts; needs an llm-service with a batch endpoint
+llm_batcher = None
+if os.getenv("LLM_BATCHING", "false").lower() == "true":
+    llm_batcher = MicroBatcher(
+        llm_router,
+        max_batch_size=int(os.getenv("LLM_BATCH_MAX_SIZE", "16")),
+        max_wait_ms=float(os.getenv("LLM_BATCH_MAX_WAIT_MS", "5")),
+        batch_path=os.getenv("LLM_BATCH_PATH", "/chat/batch")
+    )
+
+# LLM response cache: in-process LRU, plus Redis when REDIS_URL is set
+response_cache = None
+if os.getenv("CACHE_ENABLED", "true").lower() == "true":
+    response_cache = ResponseCache(
+        max_entries=int(os.getenv("CACHE_MAX_ENTRIES", "1024")),
+        ttl=float(os.getenv("CACHE_TTL", "300")),
+        redis_url=os.getenv("REDIS_URL")
+    )
+
+# Per-agent prompt token budgets, e.g. PROMPT_AGENT_TOKEN_BUDGETS="data_analysis=8192"
+prompt_builder = PromptBuilder(
+    default_budget=int(os.getenv("PROMPT_TOKEN_BUDGET", "4096")),
+    agent_budgets=parse_agent_settings(os.getenv("PROMPT_AGENT_TOKEN_BUDGETS", ""), int),
+    chars_per_token=float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4"))
+)
+
+# Conversation sessions keep history within SESSION_HISTORY_TOKENS, folding older
+# turns into a summary; SESSION_BACKEND=redis shares sessions across replicas
+SESSION_TTL = float(os.getenv("SESSION_TTL", "3600"))
+if os.getenv("SESSION_BACKEND", "memory") == "redis":
+    session_store = RedisSessionStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"), ttl=SESSION_TTL)
+else:
+    session_store = InMemorySessionStore(max_sessions=int(os.getenv("SESSION_MAX_SESSIONS", "10000")), ttl=SESSION_TTL)
+
+session_manager = SessionManager(
+    session_store,
+    prompt_builder,
+    history_budget=int(os.getenv("SESSION_HISTORY_TOKENS", "2048")),
+    # "llm" summarizes compacted turns with the model; "extractive" keeps their first lines
+    summarizer=llm_summarizer(llm_router) if os.getenv("SESSION_SUMMARIZER", "extractive") == "llm" else None
+)
+
+# Execution history, off by default. HISTORY_BACKEND=postgres writes to the platform's
+# RDS instance at HISTORY_DATABASE_URL; sqlite writes a local file for development.
+# Writes are buffered and batched; when the database falls behind entries are dropped
+execution_history = None
+HISTORY_BACKEND = os.getenv("HISTORY_BACKEND", "none")
+if HISTORY_BACKEND in ("postgres", "sqlite"):
+    if HISTORY_BACKEND == "postgres":
+        history_store = PostgresExecutionStore(
+            os.getenv("HISTORY_DATABASE_URL", "postgresql://localhost:5432/agent_platform"),
+            max_connections=int(os.getenv("HISTORY_DB_POOL_SIZE", "4"))
+        )
+    else:
+        history_store = SQLiteExecutionStore(os.getenv("HISTORY_SQLITE_PATH", "/tmp/agent-history.db"))
+    execution_history = ExecutionRecorder(
+        history_store,
+        max_buffer=int(os.getenv("HISTORY_MAX_BUFFER", "10000")),
+        batch_size=int(os.getenv("HISTORY_BATCH_SIZE", "500")),
+        flush_interval=float(os.getenv("HISTORY_FLUSH_INTERVAL", "1")),
+        drop_policy=os.getenv("HISTORY_DROP_POLICY", "drop_newest")
+    )
+
+# Shared resources are built on first use by an agent or endpoint, so pods
+# that never analyse data do not import pandas
 
-app = FastAPI(title="AI Platform Agent Service", version="1.0.0")
+def build_data_engine():
+    """Datasets for the data analysis agent: uploads and data_path inputs live under DATA_DIR."""
+    from data_engine import DataEngine
+    return DataEngine(
+        data_dir=os.getenv("DATA_DIR", "/tmp/agent-data"),
+        chunk_size=int(os.getenv("DATA_CHUNK_SIZE", "100000")),
+        sample_size=int(os.getenv("DATA_SAMPLE_SIZE", "10000")),
+        max_upload_bytes=int(float(os.getenv("DATA_MAX_UPLOAD_MB", "1024")) * 1024 * 1024)
+    )
+
+def build_web_fetcher():
+    """Page fetching for the web automation agent."""
+    from web_fetcher import WebFetcher
+    return WebFetcher(
+        max_concurrency=int(os.getenv("FETCH_MAX_CONCURRENCY", "16")),
+        per_host_concurrency=int(os.getenv("FETCH_PER_HOST_CONCURRENCY", "2")),
+        per_host_delay=float(os.getenv("FETCH_PER_HOST_DELAY", "0.5")),
+        timeout=float(os.getenv("FETCH_TIMEOUT", "15")),
+        max_bytes=int(float(os.getenv("FETCH_MAX_MB", "2")) * 1024 * 1024),
+        cache_dir=os.getenv("FETCH_CACHE_DIR", "/tmp/agent-web-cache") or None,
+        fresh_ttl=float(os.getenv("FETCH_FRESH_TTL", "300")),
+        cache_max_entries=int(os.getenv("FETCH_CACHE_MAX_ENTRIES", "10000")),
+        respect_robots=os.getenv("FETCH_RESPECT_ROBOTS", "true").lower() == "true",
+        block_private_networks=os.getenv("FETCH_BLOCK_PRIVATE_NETWORKS", "true").lower() == "true",
+        user_agent=os.getenv("FETCH_USER_AGENT", "AgentPlatformBot/1.0"),
+        max_redirects=int(os.getenv("FETCH_MAX_REDIRECTS", "5")),
+        max_crawl_delay=float(os.getenv("FETCH_MAX_CRAWL_DELAY", "30"))
+    )
+
+def build_tenant_limiter():
+    """Per-tenant policies, e.g. ``TENANT_WEIGHTS="gold=4"`` and ``TENANT_RATE_LIMITS="free=2"`` (requests/s).
+
+    Tenants without an entry get the ``TENANT_DEFAULT_*`` policy; a rate or
+    concurrency of 0 means unlimited.
+    """
+    weights = parse_agent_settings(os.getenv("TENANT_WEIGHTS", ""))
+    rates = parse_agent_settings(os.getenv("TENANT_RATE_LIMITS", ""))
+    bursts = parse_agent_settings(os.getenv("TENANT_BURSTS", ""))
+    concurrency = parse_agent_settings(os.getenv("TENANT_MAX_CONCURRENCY", ""), int)
+    default = TenantPolicy(
+        rate=float(os.getenv("TENANT_DEFAULT_RATE", "0")) or None,
+        burst=float(os.getenv("TENANT_DEFAULT_BURST", "0")) or None,
+        max_concurrency=int(os.getenv("TENANT_DEFAULT_MAX_CONCURRENCY", "0")) or None
+    )
+    policies = {
+        tenant: TenantPolicy(
+            weight=weights.get(tenant, default.weight),
+            rate=rates.get(tenant, default.rate) or None,
+            # A tenant-specific rate without a burst gets a burst derived from that rate
+            burst=bursts.get(tenant, None if tenant in rates else default.burst) or None,
+            max_concurrency=concurrency.get(tenant, default.max_concurrency) or None
+        )
+        for tenant in {*weights, *rates, *bursts, *concurrency}
+    }
+    # TENANT_LIMITS_BACKEND=redis enforces the limits across replicas
+    redis_url = None
+    if os.getenv("TENANT_LIMITS_BACKEND", "memory") == "redis":
+        redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    return TenantLimiter(policies, default, redis_url=redis_url)
+
+tenant_limiter = build_tenant_limiter()
 
 # Initialize orchestrator
-LLM_SERVICE_URL = "http://llm-service:8000"  # Internal Kubernetes service
-orchestrator = AgentOrchestrator(LLM_SERVICE_URL)
+orchestrator = AgentOrchestrator(
+    LLM_SERVICE_URL,
+    llm_pool,
+    response_cache=response_cache,
+    llm_router=llm_router,
+    prompt_builder=prompt_builder,
+    llm_batcher=llm_batcher,
+    executor=cpu_executor,
+    sessions=session_manager,
+    history=execution_history,
+    resources={"data_engine": build_data_engine, "web_fetcher": build_web_fetcher},
+    # Comma-separated agents to serve in this deployment (default: all discovered);
+    # AGENT_PLUGINS="legal_review=legal_agents:LegalReviewAgent" adds agents by import path
+    enabled_agents=[name.strip() for name in os.getenv("AGENTS_ENABLED", "").split(",") if name.strip()] or None,
+    agent_plugins=parse_agent_settings(os.getenv("AGENT_PLUGINS", ""), str),
+    batch_concurrency=int(os.getenv("BATCH_CONCURRENCY", "32")),
+    agent_concurrency=parse_agent_settings(os.getenv("BATCH_AGENT_CONCURRENCY", ""), int),
+    coalesce_requests=os.getenv("COALESCE_REQUESTS", "true").lower() == "true",
+    max_workflow_runs=int(os.getenv("WORKFLOW_MAX_RUNS", "1000")),
+    workflow_step_cache_size=int(os.getenv("WORKFLOW_STEP_CACHE_SIZE", "1024")),
+    tenant_weight=tenant_limiter.weight_for
+)
+
+# Asynchronous job mode; JOB_BACKEND=redis shares the queue across replicas
+if os.getenv("JOB_BACKEND", "memory") == "redis":
+    job_store = RedisJobStore(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+else:
+    job_store = InMemoryJobStore()
+
+job_pool = JobWorkerPool(
+    job_store,
+    orchestrator.execute_task,
+    workers=int(os.getenv("JOB_WORKERS", "4")),
+    max_queue=int(os.getenv("JOB_MAX_QUEUE", "1000")),
+    block_private_callbacks=os.getenv("JOB_CALLBACK_BLOCK_PRIVATE_NETWORKS", "true").lower() == "true"
+)
+
+# Adaptive admission control in front of the interactive execute endpoints
+admission = None
+if os.getenv("ADMISSION_ENABLED", "true").lower() == "true":
+    admission = AdaptiveLimiter(
+        initial_limit=int(os.getenv("ADMISSION_INITIAL_LIMIT", "20")),
+        min_limit=int(os.getenv("ADMISSION_MIN_LIMIT", "2")),
+        max_limit=int(os.getenv("ADMISSION_MAX_LIMIT", "200")),
+        max_queue=int(os.getenv("ADMISSION_MAX_QUEUE", "100")),
+        queue_timeout=float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "10")),
+        max_queue_per_tenant=int(os.getenv("ADMISSION_MAX_QUEUE_PER_TENANT", "0")),
+        weight_for=tenant_limiter.weight_for
+    )
+
+# Agents to construct before serving, trading startup time for first-request latency
+AGENTS_PRELOAD = [name.strip() for name in os.getenv("AGENTS_PRELOAD", "").split(",") if name.strip()]
+
+startup_report: Dict[str, Any] = {}
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    imported = time.perf_counter()
+    await llm_pool.start()
+    await job_pool.start()
+    if execution_history is not None:
+        await execution_history.start()
+    if loop_monitor is not None:
+        loop_monitor.start()
+    if cpu_executor is not None:
+        await asyncio.to_thread(cpu_executor.warm)
+    await orchestrator.agents.preload(AGENTS_PRELOAD)
+    startup_report.update({
+        "import_ms": round((imported - STARTED_AT) * 1000, 1),
+        "ready_ms": round((time.perf_counter() - STARTED_AT) * 1000, 1),
+        "agents_enabled": list(orchestrator.agents),
+        "agents_preloaded": AGENTS_PRELOAD,
+        "pid": os.getpid()
+    })
+    logger.info(f"Agent service ready: {json.dumps(startup_report)}")
+    yield
+    await job_pool.stop()
+    if execution_history is not None:
+        # After the job workers so their last results are still written
+        await execution_history.stop()
+    if llm_batcher is not None:
+        # Before the pool, so queued prompts can still be sent
+        await llm_batcher.close()
+    await llm_pool.close()
+    await orchestrator.agents.close()
+    await tenant_limiter.close()
+    await session_manager.close()
+    if loop_monitor is not None:
+        await loop_monitor.stop()
+    if cpu_executor is not None:
+        cpu_executor.shutdown()
+    shutdown_tracing()
+    if response_cache is not None:
+        await response_cache.close()
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Removes this worker's live gauge files
+        multiprocess.mark_process_dead(os.getpid())
+
+app = FastAPI(title="AI Platform Agent Service", version="1.0.0", lifespan=lifespan)
+app.add_middleware(TracingMiddleware)
 
 class AgentRequest(BaseModel):
     agent_type: str
     task_description: str
     parameters: Optional[Dict[str, Any]] = None
+    use_cache: bool = True
+    debug_timings: bool = False
+    # Follow-ups with the same session id see the earlier turns of the conversation
+    session_id: Optional[str] = None
+    
+    @field_validator("session_id")
+    @classmethod
+    def check_session_id(cls, value: Optional[str]) -> Optional[str]:
+        if value is not None and not SESSION_ID.match(value):
+            raise ValueError("session_id must be 1-128 letters, digits, '.', '_', ':' or '-'")
+        return value
 
 class AgentResponse(BaseModel):
     status: str
@@ -25,6 +385,133 @@ class AgentResponse(BaseModel):
     response: Optional[str] = None
     error: Optional[str] = None
     capabilities: Optional[list] = None
+    prompt_tokens: Optional[int] = None
+    data_summary: Optional[Dict[str, Any]] = None
+    sources: Optional[List[Dict[str, Any]]] = None
+    session_id: Optional[str] = None
+    execution_id: Optional[str] = None
+    timings: Optional[Dict[str, float]] = None
+
+class JobRequest(AgentRequest):
+    callback_url: Optional[str] = None
+
+class BatchRequest(BaseModel):
+    tasks: List[AgentRequest]
+    stream: bool = False
+
+class BatchResponse(BaseModel):
+    results: List[AgentResponse]
+
+class WorkflowStep(BaseModel):
+    id: str
+    agent_type: str
+    task_description: str = ""
+    parameters: Optional[Dict[str, Any]] = None
+    depends_on: List[str] = []
+
+class WorkflowRequest(BaseModel):
+    steps: List[WorkflowStep]
+    use_cache: bool = True
+
+class WorkflowRerunRequest(BaseModel):
+    # Steps to re-run along with everything downstream; default is the failed and skipped ones
+    steps: Optional[List[str]] = None
+
+def build_task(request: AgentRequest) -> Dict[str, Any]:
+    task = {
+        "task_description": request.task_description,
+        "parameters": request.parameters or {},
+        "use_cache": request.use_cache
+    }
+    if request.session_id:
+        task["session_id"] = request.session_id
+    return task
+
+def workflow_response(record: Dict[str, Any]) -> Dict[str, Any]:
+    steps = []
+    for step in record["steps"]:
+        result = record["results"].get(step["id"], {"status": "pending"})
+        steps.append({
+            "id": step["id"],
+            "depends_on": step.get("depends_on", []),
+            **{key: value for key, value in result.items() if key not in ("capabilities", "available_agents")}
+        })
+    return {"workflow_id": record["id"], "status": record["status"], "steps": steps}
+
+def rejection_error(e: AdmissionRejected, tenant: str) -> HTTPException:
+    TENANT_REJECTIONS.labels(tenant_limiter.label(tenant), e.reason).inc()
+    return HTTPException(status_code=e.status_code, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
+def agent_label(agent_type: str) -> str:
+    # Keep metric label cardinality bounded against arbitrary client input
+    return agent_type if agent_type in orchestrator.agents else "unknown"
+
+def observe_tenant(tenant: str, mode: str, status: str, seconds: float):
+    TENANT_LATENCY.labels(tenant_limiter.label(tenant), mode, status).observe(seconds)
+
+async def tenant_id(x_tenant_id: Optional[str] = Header(None)) -> str:
+    """Tenant from the ``X-Tenant-ID`` header, set by the gateway after authentication."""
+    tenant = x_tenant_id or DEFAULT_TENANT
+    if not TENANT_ID.match(tenant):
+        raise HTTPException(status_code=400, detail="X-Tenant-ID must be 1-64 letters, digits, '.', '_' or '-'")
+    # Async so the context variable is set in the request's own context
+    set_tenant(tenant)
+    return tenant
+
+async def admit(tenant: str) -> bool:
+    """Take the tenant and admission slots; returns whether the tenant slot was counted in Redis."""
+    counted_in_redis = await tenant_limiter.acquire(tenant)
+    if admission is not None:
+        start = time.perf_counter()
+        try:
+            with span("admission_wait"):
+                await admission.acquire(tenant)
+        except BaseException:
+            await tenant_limiter.release(tenant, counted_in_redis)
+            raise
+        waited = time.perf_counter() - start
+        QUEUE_WAIT.labels("admission").observe(waited)
+        record_timing("admission_wait", waited)
+    return counted_in_redis
+
+async def release(tenant: str, counted_in_redis: bool, latency: float, failed: bool):
+    if admission is not None:
+        admission.release(latency, failed)
+    await tenant_limiter.release(tenant, counted_in_redis)
+
+class SlotStreamingResponse(StreamingResponse):
+    """Streaming response that runs ``finish`` once the response is over, however it ended.
+
+    Streams are admitted before the response starts, so their slots are given
+    back here rather than in the body generator: a generator whose client
+    disconnected before the first chunk never starts, and never runs its
+    ``finally``.
+    """
+
+    def __init__(self, content, finish: Callable[[], Awaitable[None]], **kwargs):
+        super().__init__(content, **kwargs)
+        self.finish = finish
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            await self.body_iterator.aclose()
+            await self.finish()
+
+def build_response(request: AgentRequest, result: Dict[str, Any]) -> AgentResponse:
+    return AgentResponse(
+        status=result.get("status", "unknown"),
+        agent_type=result.get("agent_type", request.agent_type),
+        response=result.get("response"),
+        error=result.get("error"),
+        capabilities=result.get("capabilities"),
+        prompt_tokens=result.get("prompt_tokens"),
+        data_summary=result.get("data_summary"),
+        sources=result.get("sources"),
+        session_id=request.session_id,
+        execution_id=result.get("execution_id")
+    )
 
 @app.get("/")
 async def root():
@@ -32,37 +519,357 @@ async def root():
         "service": "AI Platform Agent Service",
         "version": "1.0.0",
         "available_agents": list(orchestrator.agents.keys()),
-        "capabilities": orchestrator.get_capabilities()
+        "capabilities": await orchestrator.get_capabilities()
     }
 
 @app.get("/agents")
 async def list_agents():
     return {
         "agents": list(orchestrator.agents.keys()),
-        "capabilities": orchestrator.get_capabilities()
+        "capabilities": await orchestrator.get_capabilities()
     }
 
+def resource_stats(name: str) -> Optional[Dict[str, Any]]:
+    # Report only resources that exist; /stats should not build them
+    resource = orchestrator.agents.peek_resource(name)
+    return resource.stats() if resource is not None else None
+
+@app.get("/stats")
+async def stats():
+    return {
+        "llm_pool": llm_pool.stats(),
+        "llm_router": llm_router.stats(),
+        "llm_batcher": llm_batcher.stats() if llm_batcher is not None else None,
+        "response_cache": response_cache.stats() if response_cache is not None else None,
+        "prompt_builder": prompt_builder.stats(),
+        "startup": startup_report,
+        "agents": orchestrator.agents.stats(),
+        "data_engine": resource_stats("data_engine"),
+        "web_fetcher": resource_stats("web_fetcher"),
+        "workflows": orchestrator.workflows.stats(),
+        "coalescing": orchestrator.singleflight.stats() if orchestrator.singleflight is not None else None,
+        "jobs": await job_pool.stats(),
+        "admission": admission.stats() if admission is not None else None,
+        "batch_scheduler": orchestrator.batch_scheduler.stats(),
+        "tenants": tenant_limiter.stats(),
+        "sessions": session_manager.stats(),
+        "execution_history": execution_history.stats() if execution_history is not None else None,
+        "cpu_executor": cpu_executor.stats() if cpu_executor is not None else {"mode": "thread"},
+        "event_loop": loop_monitor.stats() if loop_monitor is not None else None
+    }
+
+@app.get("/metrics")
+async def metrics():
+    # Refresh point-in-time gauges on scrape instead of on the request path
+    set_service_state("llm_pool", llm_pool.stats())
+    set_service_state("jobs", await job_pool.stats())
+    if admission is not None:
+        set_service_state("admission", admission.stats())
+    set_service_state("batch_scheduler", orchestrator.batch_scheduler.stats())
+    if response_cache is not None:
+        set_service_state("response_cache", response_cache.stats())
+    if llm_batcher is not None:
+        set_service_state("llm_batcher", llm_batcher.stats())
+    set_service_state("sessions", session_manager.stats())
+    if execution_history is not None:
+        set_service_state("execution_history", execution_history.stats())
+    if cpu_executor is not None:
+        set_service_state("cpu_executor", cpu_executor.stats())
+    if loop_monitor is not None:
+        set_service_state("event_loop", loop_monitor.stats())
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        # Multi-worker mode: aggregate the metrics every worker process wrote
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return Response(generate_latest(registry), media_type=CONTENT_TYPE_LATEST)
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 @app.post("/agents/execute", response_model=AgentResponse)
-async def execute_agent(request: AgentRequest):
+@traced("agent_service.execute_agent")
+async def execute_agent(request: AgentRequest, tenant: str = Depends(tenant_id)):
+    set_attributes({"agent.type": agent_label(request.agent_type), "tenant": tenant})
+    timings = start_timings() if request.debug_timings else None
+    start = time.perf_counter()
+    status = "error"
     try:
-        task = {
-            "task_description": request.task_description,
-            "parameters": request.parameters or {}
-        }
+        counted_in_redis = await admit(tenant)
+        run_start = time.monotonic()
+        # Only backend overload feeds the AIMD limit; bad input must not shrink it
+        overloaded = False
+        try:
+            result = await orchestrator.execute_task(request.agent_type, build_task(request))
+            overloaded = result.get("overloaded", False)
+        except Exception as e:
+            overloaded = is_overload(e)
+            raise
+        finally:
+            await release(tenant, counted_in_redis, time.monotonic() - run_start, overloaded)
         
-        result = await orchestrator.execute_task(request.agent_type, task)
-        
-        return AgentResponse(
-            status=result.get("status", "unknown"),
-            agent_type=result.get("agent_type", request.agent_type),
-            response=result.get("response"),
-            error=result.get("error"),
-            capabilities=result.get("capabilities")
-        )
+        status = result.get("status", "unknown")
+        response = build_response(request, result)
+        if timings is not None:
+            timings["total"] = round((time.perf_counter() - start) * 1000, 3)
+            response.timings = timings
+        return response
         
+    except AdmissionRejected as e:
+        status = "rejected"
+        raise rejection_error(e, tenant)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        elapsed = time.perf_counter() - start
+        REQUEST_LATENCY.labels(agent_label(request.agent_type), "execute", status).observe(elapsed)
+        observe_tenant(tenant, "execute", status, elapsed)
+
+@app.post("/agents/execute/batch")
+async def execute_agent_batch(batch: BatchRequest, tenant: str = Depends(tenant_id)):
+    if len(batch.tasks) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=413, detail=f"Batch exceeds {MAX_BATCH_SIZE} tasks")
+    
+    items = [
+        {"agent_type": request.agent_type, "task": build_task(request)}
+        for request in batch.tasks
+    ]
+    
+    # Every task counts against the tenant's rate limit; the batch holds one concurrency slot
+    start = time.perf_counter()
+    try:
+        counted_in_redis = await tenant_limiter.acquire(tenant, cost=len(items))
+    except AdmissionRejected as e:
+        observe_tenant(tenant, "batch", "rejected", time.perf_counter() - start)
+        raise rejection_error(e, tenant)
+    
+    if not batch.stream:
+        try:
+            results = await orchestrator.execute_batch(items)
+        finally:
+            await tenant_limiter.release(tenant, counted_in_redis)
+            observe_tenant(tenant, "batch", "completed", time.perf_counter() - start)
+        return BatchResponse(results=[
+            build_response(request, result)
+            for request, result in zip(batch.tasks, results)
+        ])
+    
+    async def ndjson_stream():
+        # One JSON line per task, in completion order, tagged with its input index
+        async for result in orchestrator.execute_batch_as_completed(items):
+            index = result["index"]
+            line = {"index": index, **jsonable_encoder(build_response(batch.tasks[index], result))}
+            yield json.dumps(line) + "\n"
+    
+    async def finish():
+        await tenant_limiter.release(tenant, counted_in_redis)
+        observe_tenant(tenant, "batch", "completed", time.perf_counter() - start)
+    
+    return SlotStreamingResponse(ndjson_stream(), finish, media_type="application/x-ndjson")
+
+@app.post("/agents/execute/stream")
+async def execute_agent_stream(request: AgentRequest, tenant: str = Depends(tenant_id)):
+    task = build_task(request)
+    
+    # Admit before the response starts so saturation is still a clean 429/503
+    request_start = time.perf_counter()
+    try:
+        counted_in_redis = await admit(tenant)
+    except AdmissionRejected as e:
+        elapsed = time.perf_counter() - request_start
+        REQUEST_LATENCY.labels(agent_label(request.agent_type), "stream", "rejected").observe(elapsed)
+        observe_tenant(tenant, "stream", "rejected", elapsed)
+        raise rejection_error(e, tenant)
+    
+    start = time.monotonic()
+    failed = False
+    overloaded = False
+    
+    async def event_stream():
+        nonlocal failed, overloaded
+        # Server-Sent Events: one frame per token, flushed as soon as it arrives
+        async for event in orchestrator.stream_task(request.agent_type, task):
+            name = event.pop("event")
+            failed = failed or name == "error"
+            overloaded = overloaded or event.pop("overloaded", False)
+            yield f"event: {name}\ndata: {json.dumps(event)}\n\n"
+    
+    async def finish():
+        await release(tenant, counted_in_redis, time.monotonic() - start, overloaded)
+        status = "error" if failed else "completed"
+        elapsed = time.perf_counter() - request_start
+        REQUEST_LATENCY.labels(agent_label(request.agent_type), "stream", status).observe(elapsed)
+        observe_tenant(tenant, "stream", status, elapsed)
+    
+    return SlotStreamingResponse(
+        event_stream(),
+        finish,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/datasets", status_code=201)
+async def upload_dataset(request: Request, format: str = "csv"):
+    """Stream a CSV or Parquet request body to disk for use as a task's ``dataset_id``."""
+    data_engine = await orchestrator.agents.resource("data_engine")
+    from data_engine import DatasetError
+    try:
+        return await data_engine.save_upload(request.stream(), format)
+    except DatasetError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post("/jobs", status_code=202)
+async def submit_job(request: JobRequest, tenant: str = Depends(tenant_id)):
+    if request.callback_url and not request.callback_url.startswith(("http://", "https://")):
+        raise HTTPException(status_code=400, detail="callback_url must be an http(s) URL")
+    
+    # Jobs run later on the worker pool, so only the rate limit applies at submission
+    try:
+        await tenant_limiter.acquire(tenant, hold=False)
+    except AdmissionRejected as e:
+        raise rejection_error(e, tenant)
+    
+    try:
+        job = await job_pool.submit(request.agent_type, build_task(request), request.callback_url)
+    except QueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    
+    return {"job_id": job["id"], "status": job["status"]}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, tenant: str = Depends(tenant_id)):
+    job = await job_pool.get(job_id)
+    # Another tenant's job is reported as unknown so job ids cannot be probed
+    if job is None or job.get("tenant", DEFAULT_TENANT) != tenant:
+        raise HTTPException(status_code=404, detail=f"Unknown job: {job_id}")
+    return job
+
+@app.get("/sessions/{session_id}")
+async def get_session(session_id: str, tenant: str = Depends(tenant_id)):
+    session = await session_manager.load(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return {
+        "session_id": session_id,
+        "turns": len(session.turns),
+        "summarized": bool(session.summary),
+        "history_tokens": session_manager.history_tokens(session)
+    }
+
+@app.delete("/sessions/{session_id}", status_code=204)
+async def delete_session(session_id: str, tenant: str = Depends(tenant_id)):
+    if not await session_manager.delete(session_id):
+        raise HTTPException(status_code=404, detail=f"Unknown session: {session_id}")
+    return Response(status_code=204)
+
+def history_enabled():
+    if execution_history is None:
+        raise HTTPException(status_code=404, detail="Execution history is not enabled (set HISTORY_BACKEND)")
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Timestamps without an offset are taken as UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+@app.get("/executions")
+async def list_executions(
+    agent_type: Optional[str] = None,
+    status: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    limit: int = 50,
+    tenant: str = Depends(tenant_id)
+):
+    """The tenant's recorded executions, newest first; entries still buffered are not listed yet."""
+    history_enabled()
+    if not 1 <= limit <= 500:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 500")
+    executions = await execution_history.query(
+        tenant,
+        agent_type=agent_type,
+        status=status,
+        session_id=session_id,
+        since=as_utc(since),
+        before=as_utc(before),
+        limit=limit
+    )
+    return {"executions": executions}
+
+@app.get("/executions/{execution_id}")
+async def get_execution(execution_id: str, tenant: str = Depends(tenant_id)):
+    history_enabled()
+    execution = await execution_history.get(tenant, execution_id)
+    if execution is None:
+        raise HTTPException(status_code=404, detail=f"Unknown execution: {execution_id}")
+    return execution
+
+@app.post("/workflows")
+async def execute_workflow(request: WorkflowRequest, tenant: str = Depends(tenant_id)):
+    if len(request.steps) > MAX_WORKFLOW_STEPS:
+        raise HTTPException(status_code=413, detail=f"Workflow exceeds {MAX_WORKFLOW_STEPS} steps")
+    
+    try:
+        counted_in_redis = await tenant_limiter.acquire(tenant, cost=len(request.steps))
+    except AdmissionRejected as e:
+        raise rejection_error(e, tenant)
+    
+    start = time.perf_counter()
+    try:
+        record = await orchestrator.execute_workflow(
+            [jsonable_encoder(step) for step in request.steps],
+            use_cache=request.use_cache
+        )
+    except WorkflowError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        await tenant_limiter.release(tenant, counted_in_redis)
+    observe_tenant(tenant, "workflow", record["status"], time.perf_counter() - start)
+    return workflow_response(record)
+
+@app.get("/workflows/{workflow_id}")
+async def get_workflow(workflow_id: str, tenant: str = Depends(tenant_id)):
+    record = orchestrator.workflows.get(workflow_id)
+    # Runs are only visible to the tenant that started them
+    if record is None or record["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow_id}")
+    return workflow_response(record)
+
+@app.post("/workflows/{workflow_id}/rerun")
+async def rerun_workflow(
+    workflow_id: str,
+    request: Optional[WorkflowRerunRequest] = None,
+    tenant: str = Depends(tenant_id)
+):
+    existing = orchestrator.workflows.get(workflow_id)
+    if existing is None or existing["tenant"] != tenant:
+        raise HTTPException(status_code=404, detail=f"Unknown workflow: {workflow_id}")
+    try:
+        counted_in_redis = await tenant_limiter.acquire(tenant, cost=len(existing["steps"]))
+    except AdmissionRejected as e:
+        raise rejection_error(e, tenant)
+    
+    start = time.perf_counter()
+    try:
+        record = await orchestrator.rerun_workflow(workflow_id, request.steps if request else None)
+    except WorkflowError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    finally:
+        await tenant_limiter.release(tenant, counted_in_redis)
+    observe_tenant(tenant, "workflow", record["status"], time.perf_counter() - start)
+    return workflow_response(record)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    if WORKERS > 1:
+        # Each worker is a separate process with its own caches, limiters and
+        # in-memory stores; use JOB_BACKEND=redis so any worker can serve /jobs
+        if os.getenv("JOB_BACKEND", "memory") != "redis":
+            logger.warning("WORKERS > 1 with the in-memory job store: job status is only visible to the worker that accepted it")
+        metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+        if metrics_dir:
+            # Stale files from a previous run would be merged into /metrics
+            os.makedirs(metrics_dir, exist_ok=True)
+            for name in os.listdir(metrics_dir):
+                os.remove(os.path.join(metrics_dir, name))
+        uvicorn.run("agent_service:app", host="0.0.0.0", port=8001, workers=WORKERS)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -5,40 +5,185 @@ Base Agent Class for Enterprise AI Platform
 import asyncio
 import json
 import logging
+import time
 from abc import ABC, abstractmethod
-from typing import Dict, Any
+from typing import Dict, Any, List, Tuple, AsyncIterator
 from datetime import datetime
 import httpx
+from llm_client import LLMClientPool, iter_stream_tokens
+from response_cache import ResponseCache, make_cache_key
+from llm_router import LLMRouter
+from llm_batcher import MicroBatcher
+from cpu_executor import CPUExecutor
+from prompt_builder import PromptBuilder
+from sessions import current_session
+from metrics import (
+    stage, record_timing, observe_token_usage,
+    LLM_LATENCY, TIME_TO_FIRST_TOKEN, PROMPT_SIZE, PROMPT_TOKENS, RESPONSE_SIZE, CACHE_LOOKUPS
+)
+from tracing import traced, set_attributes
+
+DEFAULT_PROMPT = """
+Task: {task_description}
+Parameters: {parameters}
+"""
 
 class BaseAgent(ABC):
-    def __init__(self, name: str, llm_service_url: str):
+    # Built-in agents repeat these in agent_registry.BUILTIN_CAPABILITIES for listing
+    capabilities: List[str] = []
+    
+    def __init__(
+        self,
+        name: str,
+        llm_service_url: str,
+        llm_client: LLMClientPool = None,
+        response_cache: ResponseCache = None,
+        llm_router: LLMRouter = None,
+        prompt_builder: PromptBuilder = None,
+        llm_batcher: MicroBatcher = None,
+        executor: CPUExecutor = None
+    ):
         self.name = name
         self.llm_service_url = llm_service_url
+        self.llm_client = llm_client or LLMClientPool()
+        self.llm_router = llm_router or LLMRouter([llm_service_url], self.llm_client)
+        self.response_cache = response_cache
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        # Optional: coalesces concurrent prompts into batched LLM requests
+        self.llm_batcher = llm_batcher
+        # Optional process pool for CPU-bound steps; without one they run on a thread
+        self.executor = executor
+        self.model = self.llm_router.model_for(name)
         self.logger = logging.getLogger(f"agent.{name}")
         
     @abstractmethod
     async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
         pass
     
-    async def chat_with_llm(self, message: str, system_prompt: str = None) -> str:
+    def build_prompt(self, task: Dict[str, Any]) -> Tuple[str, str]:
+        """Return the ``(prompt, system_prompt)`` pair for a task; by default the description and compact parameters."""
+        return self.render_prompt(DEFAULT_PROMPT, task, f"You are the {self.name} agent. Complete the task accurately and concisely.")
+    
+    def render_prompt(self, template: str, task: Dict[str, Any], system_prompt: str) -> Tuple[str, str]:
+        """Fill a prompt template from the task within this agent's token budget."""
+        return self.prompt_builder.build(self.name, template, task, system_prompt), system_prompt
+    
+    def prompt_tokens(self, prompt: str, system_prompt: str = None) -> int:
+        return self.prompt_builder.estimate_tokens(prompt) + self.prompt_builder.estimate_tokens(system_prompt)
+    
+    async def run_cpu(self, func, *args) -> Any:
+        """Run CPU-bound ``func(*args)`` off the event loop; ``func`` and its arguments must be picklable."""
+        if self.executor is None:
+            return await asyncio.to_thread(func, *args)
+        return await self.executor.run(func, *args)
+    
+    async def run_cpu_buffer(self, func, data: bytes, *args) -> Any:
+        """Like ``run_cpu`` for ``func(buffer, *args)``; large ``data`` reaches the worker through shared memory."""
+        if self.executor is None:
+            return await asyncio.to_thread(func, data, *args)
+        return await self.executor.run_with_buffer(func, data, *args)
+    
+    async def prepare_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Hook for agents that preprocess task inputs before the prompt is built."""
+        return task
+    
+    async def execute_stream(self, task: Dict[str, Any]) -> AsyncIterator[str]:
+        task = await self.prepare_task(task)
+        with stage("prompt_build"):
+            prompt, system_prompt = self.build_prompt(task)
+        async for token in self.stream_chat_with_llm(prompt, system_prompt):
+            yield token
+    
+    @traced("llm.chat")
+    async def chat_with_llm(self, message: str, system_prompt: str = None, use_cache: bool = True) -> str:
+        set_attributes({"agent.type": self.name, "llm.model": self.model})
+        # Inside a session the conversation so far is prepended and the exchange recorded
+        session = current_session()
+        request = message
+        if session is not None:
+            message = session.render(message)
+            set_attributes({"session.turns": len(session.turns)})
+        cache_key = None
+        if use_cache and self.response_cache is not None:
+            with stage("cache_lookup"):
+                cache_key = make_cache_key(self.name, self.model, system_prompt, message)
+                cached = await self.response_cache.get(cache_key)
+            CACHE_LOOKUPS.labels(self.name, "hit" if cached is not None else "miss").inc()
+            set_attributes({"llm.cache_hit": cached is not None})
+            if cached is not None:
+                if session is not None:
+                    session.add_turn(request, cached)
+                return cached
+        
+        payload = {
+            "message": message,
+            "model": self.model,
+            "system_prompt": system_prompt
+        }
+        PROMPT_SIZE.labels(self.name).observe(len(message) + len(system_prompt or ""))
+        PROMPT_TOKENS.labels(self.name).observe(self.prompt_tokens(message, system_prompt))
+        
+        # Raises LLMError once retries are exhausted; agents report it as a failed task
+        start = time.perf_counter()
+        status = "error"
+        try:
+            if session is not None:
+                # Session turns skip batching so they reach the endpoint holding their prefix
+                data = (await self.llm_router.post("/chat", payload, agent_name=self.name, affinity=session.key)).json()
+            elif self.llm_batcher is not None:
+                data = await self.llm_batcher.chat(payload, agent_name=self.name)
+            else:
+                data = (await self.llm_router.post("/chat", payload, agent_name=self.name)).json()
+            status = "ok"
+        finally:
+            elapsed = time.perf_counter() - start
+            LLM_LATENCY.labels(self.name, status).observe(elapsed)
+            record_timing("llm_call", elapsed)
+        
+        observe_token_usage(self.name, data)
+        set_attributes({"llm.prompt_tokens": self.prompt_tokens(message, system_prompt), "llm.response_chars": len(data.get("response") or "")})
+        result = data.get("response", "No response")
+        RESPONSE_SIZE.labels(self.name).observe(len(result))
+        if cache_key is not None and "response" in data:
+            await self.response_cache.set(cache_key, result)
+        if session is not None and "response" in data:
+            session.add_turn(request, result)
+        return result
+    
+    async def stream_chat_with_llm(self, message: str, system_prompt: str = None) -> AsyncIterator[str]:
+        """Streaming variant of ``chat_with_llm``; failures are raised, not returned."""
+        session = current_session()
+        request = message
+        if session is not None:
+            message = session.render(message)
+        payload = {
+            "message": message,
+            "model": self.model,
+            "system_prompt": system_prompt,
+            "stream": True
+        }
+        PROMPT_SIZE.labels(self.name).observe(len(message) + len(system_prompt or ""))
+        PROMPT_TOKENS.labels(self.name).observe(self.prompt_tokens(message, system_prompt))
+        
+        start = time.perf_counter()
+        first_token = True
+        status = "error"
+        tokens = []
         try:
-            async with httpx.AsyncClient(timeout=120.0) as client:
-                payload = {
-                    "message": message,
-                    "model": "llama3.2",
-                    "system_prompt": system_prompt
-                }
-                
-                response = await client.post(
-                    f"{self.llm_service_url}/chat",
-                    json=payload
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    return data.get("response", "No response")
-                else:
-                    return f"Error: HTTP {response.status_code}"
-                    
-        except Exception as e:
-            return f"Error: {str(e)}"
+            async with self.llm_router.stream(
+                "/chat", payload, agent_name=self.name, affinity=session.key if session is not None else None
+            ) as response:
+                async for token in iter_stream_tokens(response):
+                    if first_token:
+                        first_token = False
+                        ttft = time.perf_counter() - start
+                        TIME_TO_FIRST_TOKEN.labels(self.name).observe(ttft)
+                        record_timing("time_to_first_token", ttft)
+                    if session is not None:
+                        tokens.append(token)
+                    yield token
+            status = "ok"
+            if session is not None:
+                session.add_turn(request, "".join(tokens))
+        finally:
+            LLM_LATENCY.labels(self.name, status).observe(time.perf_counter() - start)
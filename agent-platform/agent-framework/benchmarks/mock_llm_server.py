@@ -0,0 +1,90 @@
+"""
+Mock LLM Server - Local stand-in for llm-service with configurable latency, streaming and errors
+
+Configured through environment variables so it can be started with uvicorn:
+
+    MOCK_LATENCY_MS=200 MOCK_LATENCY_DIST=lognormal MOCK_ERROR_RATE=0.01 \\
+        uvicorn mock_llm_server:app --port 8000
+"""
+
+import asyncio
+import json
+import math
+import os
+import random
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+LATENCY_MS = float(os.getenv("MOCK_LATENCY_MS", "50"))
+LATENCY_DIST = os.getenv("MOCK_LATENCY_DIST", "constant")  # constant | uniform | lognormal
+LATENCY_SPREAD = float(os.getenv("MOCK_LATENCY_SPREAD", "0.5"))
+ERROR_RATE = float(os.getenv("MOCK_ERROR_RATE", "0"))
+STREAM_TOKENS = int(os.getenv("MOCK_STREAM_TOKENS", "20"))
+TOKEN_INTERVAL_MS = float(os.getenv("MOCK_TOKEN_INTERVAL_MS", "5"))
+# Extra latency per additional prompt in a /chat/batch request
+BATCH_ITEM_MS = float(os.getenv("MOCK_BATCH_ITEM_MS", "2"))
+
+app = FastAPI(title="Mock LLM Service")
+stats = {"chat": 0, "batches": 0, "batched_prompts": 0}
+
+def sample_latency() -> float:
+    """Return one latency sample in seconds around ``LATENCY_MS``."""
+    mean = LATENCY_MS / 1000
+    if LATENCY_DIST == "uniform":
+        return random.uniform(mean * (1 - LATENCY_SPREAD), mean * (1 + LATENCY_SPREAD))
+    if LATENCY_DIST == "lognormal":
+        # Parameterised so the median is LATENCY_MS and LATENCY_SPREAD sets the tail
+        return random.lognormvariate(math.log(mean), LATENCY_SPREAD)
+    return mean
+
+def completion(message: str) -> dict:
+    return {
+        "response": f"Mock analysis of {len(message)} characters.",
+        "prompt_eval_count": max(1, len(message) // 4),
+        "eval_count": STREAM_TOKENS
+    }
+
+@app.post("/chat")
+async def chat(request: Request):
+    payload = await request.json()
+    stats["chat"] += 1
+    await asyncio.sleep(sample_latency())
+
+    if random.random() < ERROR_RATE:
+        return JSONResponse({"error": "mock failure"}, status_code=503)
+
+    if not payload.get("stream"):
+        return completion(payload.get("message", ""))
+
+    async def tokens():
+        for index in range(STREAM_TOKENS):
+            yield json.dumps({"response": f"tok{index} ", "done": False}) + "\n"
+            await asyncio.sleep(TOKEN_INTERVAL_MS / 1000)
+        yield json.dumps({"done": True}) + "\n"
+
+    return StreamingResponse(tokens(), media_type="application/x-ndjson")
+
+@app.post("/chat/batch")
+async def chat_batch(request: Request):
+    """Serve ``{"requests": [...]}`` in one pass, as a batching inference server would."""
+    payload = await request.json()
+    items = payload.get("requests", [])
+    await asyncio.sleep(sample_latency() + BATCH_ITEM_MS * max(0, len(items) - 1) / 1000)
+    stats["batches"] += 1
+    stats["batched_prompts"] += len(items)
+
+    responses = []
+    for item in items:
+        if random.random() < ERROR_RATE:
+            responses.append({"error": "mock failure"})
+        else:
+            responses.append(completion(item.get("message", "")))
+    return {"responses": responses}
+
+@app.get("/stats")
+async def get_stats():
+    return stats
+
+@app.get("/health")
+async def health():
+    return {"status": "healthy"}
@@ -0,0 +1,73 @@
+"""
+Mock Web Server - Local fixture site for the web automation agent's fetcher
+
+Serves a chain of linked HTML pages with ETag/Last-Modified validators, a
+robots.txt that disallows ``/private/`` and a page that is larger than the
+fetcher's byte limit:
+
+    MOCK_WEB_PAGES=50 MOCK_WEB_LATENCY_MS=20 uvicorn mock_web_server:app --port 8002
+"""
+
+import asyncio
+import hashlib
+import os
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+
+PAGES = int(os.getenv("MOCK_WEB_PAGES", "50"))
+LATENCY_MS = float(os.getenv("MOCK_WEB_LATENCY_MS", "20"))
+CRAWL_DELAY = os.getenv("MOCK_WEB_CRAWL_DELAY")
+LAST_MODIFIED = "Mon, 06 Jan 2025 09:00:00 GMT"
+
+app = FastAPI(title="Mock Web Site")
+hits = {"pages": 0, "not_modified": 0}
+
+def render_page(number: int) -> str:
+    links = "".join(f'<li><a href="/page/{n}">Page {n}</a></li>' for n in (number + 1, number + 2) if n < PAGES)
+    return f"""<!DOCTYPE html>
+<html><head><title>Fixture page {number}</title>
+<style>body {{ font-family: sans-serif; }}</style>
+<script>console.log("not content");</script></head>
+<body><h1>Quarterly report {number}</h1>
+<p>Revenue for region {number % 4} grew by {number}% &amp; costs were flat.</p>
+<ul>{links}</ul>
+<a href="/private/admin">Admin</a>
+</body></html>"""
+
+@app.get("/robots.txt", response_class=PlainTextResponse)
+async def robots():
+    rules = "User-agent: *\nDisallow: /private/\n"
+    if CRAWL_DELAY:
+        rules += f"Crawl-delay: {CRAWL_DELAY}\n"
+    return rules
+
+@app.get("/page/{number}")
+async def page(number: int, request: Request):
+    await asyncio.sleep(LATENCY_MS / 1000)
+    if number >= PAGES:
+        return Response(status_code=404)
+    body = render_page(number)
+    etag = '"' + hashlib.md5(body.encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Last-Modified": LAST_MODIFIED}
+    if request.headers.get("if-none-match") == etag:
+        hits["not_modified"] += 1
+        return Response(status_code=304, headers=headers)
+    hits["pages"] += 1
+    return Response(body, media_type="text/html; charset=utf-8", headers=headers)
+
+@app.get("/large")
+async def large():
+    async def chunks():
+        yield b"<html><body>"
+        for index in range(10_000):
+            yield f"<p>Row {index} of a very long listing</p>".encode() * 10
+        yield b"</body></html>"
+    return StreamingResponse(chunks(), media_type="text/html")
+
+@app.get("/private/{path:path}")
+async def private(path: str):
+    return PlainTextResponse("robots.txt should have kept you out", status_code=403)
+
+@app.get("/stats")
+async def stats():
+    return hits
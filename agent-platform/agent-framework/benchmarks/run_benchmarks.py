@@ -0,0 +1,276 @@
+"""
+Agent Service Benchmarks - Boots agent_service against the mock LLM and drives load scenarios
+
+    python benchmarks/run_benchmarks.py                          # run and print a report
+    python benchmarks/run_benchmarks.py --output results.json    # also save the results
+    python benchmarks/run_benchmarks.py --compare benchmarks/baselines/ci.json
+    python benchmarks/run_benchmarks.py --write-baseline benchmarks/baselines/ci.json
+
+``--compare`` exits non-zero when a scenario's throughput drops, or its p95
+latency or error rate rises, by more than ``--tolerance``.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Dict, Any, List, Optional
+import httpx
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FRAMEWORK_DIR = os.path.dirname(BENCH_DIR)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def start_server(module: str, cwd: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", f"{module}:app", "--port", str(port), "--log-level", "warning"],
+        cwd=cwd,
+        env={**os.environ, **env}
+    )
+
+def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1.0).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not become ready")
+
+def rss_mb(pid: int) -> Dict[str, Optional[float]]:
+    """Current and peak resident memory of a process (Linux only)."""
+    usage = {"rss_mb": None, "peak_rss_mb": None}
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    usage["rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+                elif line.startswith("VmHWM:"):
+                    usage["peak_rss_mb"] = round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return usage
+
+def percentile(samples: List[float], quantile: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * quantile))]
+
+# Small inline dataset so data_analysis requests exercise the summary path
+SAMPLE_ROWS = [{"day": day % 7, "region": ("north", "south", "east")[day % 3], "revenue": 100.0 + day} for day in range(100)]
+
+def agent_request(description: str) -> Dict[str, Any]:
+    agent_type = random.choice(["data_analysis", "web_automation", "task_management"])
+    return {"agent_type": agent_type, "task_description": description, "parameters": {"rows": SAMPLE_ROWS}}
+
+# Each scenario sends one request and returns (ok, time_to_first_byte or None)
+async def scenario_single(client: httpx.AsyncClient):
+    response = await client.post("/agents/execute", json=agent_request(uuid.uuid4().hex))
+    return response.status_code == 200 and response.json()["status"] == "completed", None
+
+async def scenario_cache_hit(client: httpx.AsyncClient):
+    response = await client.post("/agents/execute", json={
+        "agent_type": "data_analysis",
+        "task_description": "Summarise weekly revenue",
+        "parameters": {"rows": SAMPLE_ROWS}
+    })
+    return response.status_code == 200 and response.json()["status"] == "completed", None
+
+async def scenario_batch(client: httpx.AsyncClient, size: int = 20):
+    tasks = [agent_request(uuid.uuid4().hex) for _ in range(size)]
+    response = await client.post("/agents/execute/batch", json={"tasks": tasks})
+    ok = response.status_code == 200 and all(r["status"] == "completed" for r in response.json()["results"])
+    return ok, None
+
+async def scenario_streaming(client: httpx.AsyncClient):
+    start = time.perf_counter()
+    first_byte = None
+    ok = False
+    async with client.stream("POST", "/agents/execute/stream", json=agent_request(uuid.uuid4().hex)) as response:
+        async for line in response.aiter_lines():
+            if first_byte is None and line.startswith("event: token"):
+                first_byte = time.perf_counter() - start
+            if line.startswith("event: done"):
+                ok = True
+    return ok and response.status_code == 200, first_byte
+
+SCENARIOS = {
+    "single": scenario_single,
+    "cache_hit": scenario_cache_hit,
+    "batch": scenario_batch,
+    "streaming": scenario_streaming
+}
+
+async def run_one(client: httpx.AsyncClient, scenario, latencies: List[float], ttfbs: List[float], errors: List[int], scheduled: float = None):
+    # Open-loop latency counts from the scheduled send time, so queueing is not hidden
+    start = scheduled if scheduled is not None else time.perf_counter()
+    try:
+        ok, ttfb = await scenario(client)
+    except httpx.HTTPError:
+        ok, ttfb = False, None
+    latencies.append(time.perf_counter() - start)
+    if ttfb is not None:
+        ttfbs.append(ttfb)
+    if not ok:
+        errors.append(1)
+
+async def closed_loop(client: httpx.AsyncClient, scenario, concurrency: int, requests: int):
+    latencies, ttfbs, errors = [], [], []
+    remaining = iter(range(requests))
+
+    async def worker():
+        for _ in remaining:
+            await run_one(client, scenario, latencies, ttfbs, errors)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, ttfbs, errors, time.perf_counter() - start
+
+async def open_loop(client: httpx.AsyncClient, scenario, rate: float, requests: int):
+    latencies, ttfbs, errors = [], [], []
+    tasks = []
+    start = time.perf_counter()
+    next_send = start
+    for _ in range(requests):
+        # Poisson arrivals at the target rate, independent of response times
+        next_send += random.expovariate(rate)
+        await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+        tasks.append(asyncio.ensure_future(run_one(client, scenario, latencies, ttfbs, errors, next_send)))
+    await asyncio.gather(*tasks)
+    return latencies, ttfbs, errors, time.perf_counter() - start
+
+def summarize(latencies: List[float], ttfbs: List[float], errors: List[int], elapsed: float) -> Dict[str, Any]:
+    to_ms = lambda value: round(value * 1000, 2) if value is not None else None
+    return {
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+        "ttfb_p50_ms": to_ms(percentile(ttfbs, 0.50)),
+        "error_rate": round(len(errors) / len(latencies), 4) if latencies else None
+    }
+
+async def run_scenarios(base_url: str, service_pid: int, args) -> Dict[str, Any]:
+    results = {}
+    limits = httpx.Limits(max_connections=max(args.concurrency, 100))
+    async with httpx.AsyncClient(base_url=base_url, timeout=60.0, limits=limits) as client:
+        for name in args.scenarios:
+            scenario = SCENARIOS[name.replace("_open", "")]
+            requests = args.requests if not name.startswith("batch") else max(1, args.requests // 20)
+            # Warm up connections and, for cache_hit, the cache itself
+            await closed_loop(client, scenario, 2, 4)
+            if name.endswith("_open"):
+                latencies, ttfbs, errors, elapsed = await open_loop(client, scenario, args.rate, requests)
+            else:
+                latencies, ttfbs, errors, elapsed = await closed_loop(client, scenario, args.concurrency, requests)
+            results[name] = {**summarize(latencies, ttfbs, errors, elapsed), **rss_mb(service_pid)}
+            print(f"{name:>14}: " + ", ".join(f"{key}={value}" for key, value in results[name].items()))
+    return results
+
+# Absolute latency, throughput and RSS depend on the runner, so scenarios are
+# compared relative to this one from the same run
+REFERENCE_SCENARIO = "single"
+
+def relative(scenario: Dict[str, Any], reference: Dict[str, Any], key: str) -> Optional[float]:
+    if not scenario.get(key) or not reference.get(key):
+        return None
+    return scenario[key] / reference[key]
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    expected_scenarios = baseline.get("scenarios", {})
+    reference = results.get(REFERENCE_SCENARIO)
+    expected_reference = expected_scenarios.get(REFERENCE_SCENARIO)
+    for name, expected in expected_scenarios.items():
+        actual = results.get(name)
+        if actual is None:
+            continue
+        if actual["error_rate"] > expected["error_rate"] + tolerance / 10:
+            regressions.append(f"{name}: error rate {actual['error_rate']} > baseline {expected['error_rate']}")
+        if name == REFERENCE_SCENARIO or reference is None or expected_reference is None:
+            continue
+
+        actual_ratio = relative(actual, reference, "throughput_rps")
+        expected_ratio = relative(expected, expected_reference, "throughput_rps")
+        if actual_ratio is not None and expected_ratio is not None and actual_ratio < expected_ratio * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {actual_ratio:.2f}x {REFERENCE_SCENARIO} < baseline {expected_ratio:.2f}x"
+            )
+        actual_ratio = relative(actual, reference, "p95_ms")
+        expected_ratio = relative(expected, expected_reference, "p95_ms")
+        if actual_ratio is not None and expected_ratio is not None and actual_ratio > expected_ratio * (1 + tolerance):
+            regressions.append(
+                f"{name}: p95 {actual_ratio:.2f}x {REFERENCE_SCENARIO} > baseline {expected_ratio:.2f}x"
+            )
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark agent_service against a local mock LLM")
+    parser.add_argument("--scenarios", nargs="+", default=["single", "single_open", "batch", "streaming", "cache_hit"],
+                        choices=list(SCENARIOS) + [f"{name}_open" for name in SCENARIOS])
+    parser.add_argument("--requests", type=int, default=400, help="requests per scenario (batch sends requests/20 batches)")
+    parser.add_argument("--concurrency", type=int, default=16, help="closed-loop concurrent clients")
+    parser.add_argument("--rate", type=float, default=100.0, help="open-loop arrival rate (requests/s)")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--latency-dist", default="constant", choices=["constant", "uniform", "lognormal"])
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline JSON to compare against")
+    parser.add_argument("--write-baseline", help="write the results as a new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression")
+    args = parser.parse_args()
+
+    llm_port, service_port = free_port(), free_port()
+    mock_env = {
+        "MOCK_LATENCY_MS": str(args.latency_ms),
+        "MOCK_LATENCY_DIST": args.latency_dist,
+        "MOCK_ERROR_RATE": str(args.error_rate)
+    }
+    llm = start_server("mock_llm_server", BENCH_DIR, llm_port, mock_env)
+    service = start_server("agent_service", FRAMEWORK_DIR, service_port, {
+        "LLM_SERVICE_URL": f"http://127.0.0.1:{llm_port}",
+        "ADMISSION_MAX_LIMIT": "1000"
+    })
+    try:
+        wait_ready(f"http://127.0.0.1:{llm_port}/health")
+        wait_ready(f"http://127.0.0.1:{service_port}/")
+        results = asyncio.run(run_scenarios(f"http://127.0.0.1:{service_port}", service.pid, args))
+    finally:
+        for process in (service, llm):
+            process.terminate()
+            process.wait(timeout=10)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare", "write_baseline")},
+        "scenarios": results
+    }
+    for path in filter(None, (args.output, args.write_baseline)):
+        with open(path, "w") as handle:
+            json.dump(report, handle, indent=2)
+            handle.write("\n")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            regressions = compare(results, json.load(handle), args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+CPU Executor - Process pool for CPU-bound agent work, shared-memory buffer hand-off and event-loop lag monitoring
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, Any, Callable, Optional
+from metrics import CPU_TASK_DURATION, EVENT_LOOP_LAG
+
+logger = logging.getLogger("agent.cpu_executor")
+
+def available_cpus() -> int:
+    """CPUs this process may use: the cgroup CPU quota if set, else the affinity mask."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    try:
+        # cgroup v2; a container limited to "200000 100000" gets 2 CPUs
+        with open("/sys/fs/cgroup/cpu.max") as handle:
+            quota, period = handle.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cpus
+
+def _call_with_shared_memory(func: Callable, name: str, size: int, args: tuple) -> Any:
+    # Runs in the worker: attach to the parent's block and read it in place
+    # Workers share the parent's resource tracker, so attaching does not take ownership
+    block = SharedMemory(name=name)
+    view = block.buf[:size]
+    try:
+        return func(view, *args)
+    finally:
+        view.release()
+        block.close()
+
+class CPUExecutor:
+    """Runs CPU-bound callables in a process pool so they cannot stall the event loop.
+
+    Callables and arguments must be picklable (module-level functions).
+    ``run_with_buffer`` hands large byte payloads to the worker through a
+    shared-memory block instead of pickling them through the pool's pipe;
+    the worker receives a read-only ``memoryview`` of the data. Workers are
+    started with ``forkserver`` so they do not inherit the event loop's
+    threads and sockets.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        shared_memory_threshold: int = 1024 * 1024,
+        start_method: str = "forkserver"
+    ):
+        self.max_workers = max_workers or available_cpus()
+        self.shared_memory_threshold = shared_memory_threshold
+        if start_method not in multiprocessing.get_all_start_methods():
+            start_method = "spawn"
+        self.start_method = start_method
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+        self.tasks = 0
+        self.failures = 0
+        self.in_flight = 0
+        self.shared_memory_bytes = 0
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._pool
+
+    def warm(self):
+        """Start every worker now; spawning them lazily would block the event loop on first use."""
+        for future in [self.pool.submit(os.getpid) for _ in range(self.max_workers)]:
+            future.result()
+
+    async def run(self, func: Callable, *args) -> Any:
+        name = getattr(func, "__name__", "task")
+        self.tasks += 1
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.pool, func, *args)
+        except Exception:
+            self.failures += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            CPU_TASK_DURATION.labels(name).observe(time.perf_counter() - start)
+
+    async def run_with_buffer(self, func: Callable, data: bytes, *args) -> Any:
+        """Call ``func(buffer, *args)`` in a worker, passing ``data`` through shared memory when large."""
+        if len(data) < self.shared_memory_threshold:
+            return await self.run(func, data, *args)
+
+        block = SharedMemory(create=True, size=len(data))
+        try:
+            block.buf[:len(data)] = data
+            self.shared_memory_bytes += len(data)
+            return await self.run(_call_with_shared_memory, func, block.name, len(data), args)
+        finally:
+            block.close()
+            block.unlink()
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "mode": "process",
+            "max_workers": self.max_workers,
+            "started": self._pool is not None,
+            "tasks": self.tasks,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "shared_memory_bytes": self.shared_memory_bytes
+        }
+
+class LoopLagMonitor:
+    """Measures event-loop scheduling lag and reports what blocked it.
+
+    A coroutine sleeps for ``interval`` and records how late it wakes up in
+    ``agent_event_loop_lag_seconds``. A watchdog thread notices when that
+    heartbeat is overdue by more than ``threshold`` and logs the loop
+    thread's stack at that moment, which points at the blocking code.
+    """
+
+    def __init__(self, interval: float = 0.25, threshold: float = 0.1):
+        self.interval = interval
+        self.threshold = threshold
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+        self._beat = time.monotonic()
+        self._loop_thread_id: Optional[int] = None
+        self._reported_beat = None
+
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stalls = 0
+        self.last_stall_stack: Optional[str] = None
+
+    def start(self):
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._heartbeat())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-lag-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _heartbeat(self):
+        while True:
+            start = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self._beat = time.monotonic()
+            lag = max(0.0, self._beat - start - self.interval)
+            self.last_lag = lag
+            self.max_lag = max(self.max_lag, lag)
+            EVENT_LOOP_LAG.observe(lag)
+            if lag > self.threshold:
+                self.stalls += 1
+                logger.warning(f"Event loop lagged {lag * 1000:.0f} ms")
+
+    def _watch(self):
+        while not self._stopped.wait(self.threshold / 2):
+            beat = self._beat
+            overdue = time.monotonic() - beat - self.interval
+            if overdue > self.threshold and self._reported_beat != beat:
+                self._reported_beat = beat
+                frame = sys._current_frames().get(self._loop_thread_id)
+                if frame is not None:
+                    self.last_stall_stack = "".join(traceback.format_stack(frame))
+                    logger.warning(f"Event loop blocked for over {overdue * 1000:.0f} ms at:\n{self.last_stall_stack}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "interval_ms": self.interval * 1000,
+            "last_lag_ms": round(self.last_lag * 1000, 3),
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+            "stalls": self.stalls
+        }
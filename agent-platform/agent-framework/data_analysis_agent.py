@@ -2,45 +2,70 @@
 Data Analysis Agent - Specializes in data processing and analysis
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from base_agent import BaseAgent
-import json
+from resilience import is_overload
+from data_engine import DataEngine, summarize_dataset, summarize_csv_buffer
+from metrics import stage
+from tracing import traced
+
+ANALYSIS_PROMPT = """
+Data Analysis Task: {task_description}
+Parameters: {parameters}
+
+As a data analysis expert, provide:
+1. Analysis approach
+2. Key insights
+3. Recommendations
+4. Next steps
+"""
 
 class DataAnalysisAgent(BaseAgent):
-    def __init__(self, llm_service_url: str):
-        super().__init__("data_analysis", llm_service_url)
-        self.capabilities = ["csv_analysis", "statistical_analysis", "data_visualization"]
+    capabilities = ["csv_analysis", "parquet_analysis", "statistical_analysis", "data_visualization"]
+    
+    def __init__(self, llm_service_url: str, data_engine: DataEngine = None, **kwargs):
+        super().__init__("data_analysis", llm_service_url, **kwargs)
+        self.data_engine = data_engine or DataEngine()
+    
+    async def prepare_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Summarize an attached dataset so only the computed statistics reach the LLM."""
+        parameters = task.get("parameters") or {}
+        if not self.data_engine.has_dataset(parameters):
+            return task
+        with stage("data_summary"):
+            csv = parameters.get("csv")
+            if isinstance(csv, str) and self.executor is not None:
+                # Ship the text as one buffer rather than pickling the whole parameter dict
+                rest = {key: value for key, value in parameters.items() if key != "csv"}
+                summary = await self.run_cpu_buffer(summarize_csv_buffer, csv.encode("utf-8"), self.data_engine, rest)
+            else:
+                summary = await self.run_cpu(summarize_dataset, self.data_engine, parameters)
+            self.data_engine.record_summary(summary)
+        return {**task, "parameters": self.data_engine.prompt_parameters(parameters, summary)}
+    
+    def build_prompt(self, task: Dict[str, Any]) -> Tuple[str, str]:
+        return self.render_prompt(ANALYSIS_PROMPT, task, "You are a senior data analyst. Provide structured, actionable analysis.")
     
+    @traced("data_analysis.execute")
     async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        task_description = task.get("task_description", "")
-        parameters = task.get("parameters", {})
-        
-        analysis_prompt = f"""
-        Data Analysis Task: {task_description}
-        Parameters: {json.dumps(parameters, indent=2)}
-        
-        As a data analysis expert, provide:
-        1. Analysis approach
-        2. Key insights
-        3. Recommendations
-        4. Next steps
-        """
-        
         try:
-            response = await self.chat_with_llm(
-                analysis_prompt,
-                "You are a senior data analyst. Provide structured, actionable analysis."
-            )
+            task = await self.prepare_task(task)
+            with stage("prompt_build"):
+                prompt, system_prompt = self.build_prompt(task)
+            response = await self.chat_with_llm(prompt, system_prompt, use_cache=task.get("use_cache", True))
             
             return {
                 "status": "completed",
                 "agent_type": "data_analysis",
                 "response": response,
+                "prompt_tokens": self.prompt_tokens(prompt, system_prompt),
+                "data_summary": task["parameters"].get("data_summary"),
                 "capabilities": self.capabilities
             }
         except Exception as e:
             return {
                 "status": "error",
                 "agent_type": "data_analysis",
-                "error": str(e)
+                "error": str(e),
+                "overloaded": is_overload(e)
             }
@@ -0,0 +1,435 @@
+"""
+Data Engine - Chunked CSV/Parquet reader computing compact statistical summaries for the LLM
+"""
+
+import io
+import math
+import os
+import re
+import uuid
+from collections import Counter
+from typing import Dict, Any, Optional, List, Iterator, AsyncIterator, Tuple
+import numpy as np
+import pandas as pd
+
+# Task parameters that carry a dataset rather than plain instructions
+DATA_SOURCE_KEYS = ("dataset_id", "data_path", "csv", "rows")
+DATASET_ID = re.compile(r"^[0-9a-f]{32}$")
+FORMATS = ("csv", "parquet")
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+class DatasetError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def compact_number(value: Any) -> Any:
+    """Round to 4 significant digits so summaries stay short; NaN/inf become None."""
+    if value is None:
+        return None
+    value = float(value)
+    if not math.isfinite(value):
+        return None
+    if value.is_integer() and abs(value) < 1e15:
+        return int(value)
+    return float(f"{value:.4g}")
+
+class _SummaryAccumulator:
+    """Mergeable statistics over a stream of DataFrame chunks.
+
+    Means and variances are combined per column with Chan's parallel update
+    and correlations from a merged co-moment matrix, so results are exact
+    whatever the chunking. Quantiles come from a uniform sample of
+    ``sample_size`` rows (bottom-k random keys), exact for smaller inputs.
+    Category counts and group-bys are bounded; when a bound is hit the
+    affected figures are flagged approximate.
+    """
+
+    def __init__(self, engine: "DataEngine", group_by: List[str], metrics: Optional[List[str]]):
+        self.engine = engine
+        self.group_by = group_by
+        self.metrics = metrics
+        self.rng = np.random.default_rng()
+        self.rows = 0
+        self.dtypes: Dict[str, str] = {}
+        self.nulls: Counter = Counter()
+        # column -> [count, mean, m2, min, max]
+        self.numeric: Dict[str, List[float]] = {}
+        self.categories: Dict[str, Counter] = {}
+        self.categories_pruned = set()
+        self.sample: Optional[pd.DataFrame] = None
+        self.sample_keys: Optional[np.ndarray] = None
+        self.corr_columns: Optional[List[str]] = None
+        self.corr_n = 0
+        self.corr_mean = None
+        self.corr_m2 = None
+        self.groups: Optional[pd.DataFrame] = None
+        self.groups_pruned = False
+
+    def add(self, chunk: pd.DataFrame):
+        if chunk.empty:
+            return
+        self.rows += len(chunk)
+        for column, dtype in chunk.dtypes.items():
+            self.dtypes.setdefault(str(column), str(dtype))
+        self.nulls.update({str(column): int(count) for column, count in chunk.isna().sum().items() if count})
+
+        numeric = chunk.select_dtypes(include="number")
+        self._add_numeric(numeric)
+        self._add_categories(chunk.drop(columns=numeric.columns))
+        self._add_sample(numeric)
+        self._add_correlations(chunk, numeric)
+        if self.group_by:
+            self._add_groups(chunk, numeric)
+
+    def _add_numeric(self, numeric: pd.DataFrame):
+        counts = numeric.count()
+        means = numeric.mean()
+        m2s = numeric.var(ddof=0) * counts
+        mins = numeric.min()
+        maxs = numeric.max()
+        for column in numeric.columns:
+            count = int(counts[column])
+            if not count:
+                continue
+            stats = self.numeric.get(str(column))
+            if stats is None:
+                self.numeric[str(column)] = [count, means[column], m2s[column], mins[column], maxs[column]]
+                continue
+            total = stats[0] + count
+            delta = means[column] - stats[1]
+            stats[1] += delta * count / total
+            stats[2] += m2s[column] + delta * delta * stats[0] * count / total
+            stats[0] = total
+            stats[3] = min(stats[3], mins[column])
+            stats[4] = max(stats[4], maxs[column])
+
+    def _add_categories(self, other: pd.DataFrame):
+        limit = self.engine.max_categories
+        for column in other.columns:
+            counter = self.categories.setdefault(str(column), Counter())
+            counter.update(other[column].dropna().astype(str).value_counts().to_dict())
+            if len(counter) > limit * 50:
+                # Keep the heavy hitters; counts for the tail become approximate
+                self.categories[str(column)] = Counter(dict(counter.most_common(limit * 10)))
+                self.categories_pruned.add(str(column))
+
+    def _add_sample(self, numeric: pd.DataFrame):
+        keys = self.rng.random(len(numeric))
+        frame = numeric.reset_index(drop=True)
+        if self.sample is not None:
+            frame = pd.concat([self.sample, frame], ignore_index=True)
+            keys = np.concatenate([self.sample_keys, keys])
+        if len(keys) > self.engine.sample_size:
+            keep = np.argpartition(keys, self.engine.sample_size)[:self.engine.sample_size]
+            frame = frame.iloc[keep].reset_index(drop=True)
+            keys = keys[keep]
+        self.sample, self.sample_keys = frame, keys
+
+    def _add_correlations(self, chunk: pd.DataFrame, numeric: pd.DataFrame):
+        if self.corr_columns is None:
+            self.corr_columns = [str(column) for column in numeric.columns[:self.engine.max_corr_columns]]
+        if len(self.corr_columns) < 2:
+            return
+        frame = chunk.reindex(columns=self.corr_columns).apply(pd.to_numeric, errors="coerce").dropna()
+        if frame.empty:
+            return
+        values = frame.to_numpy(dtype=float)
+        count = len(values)
+        mean = values.mean(axis=0)
+        centered = values - mean
+        m2 = centered.T @ centered
+        if self.corr_n == 0:
+            self.corr_n, self.corr_mean, self.corr_m2 = count, mean, m2
+            return
+        total = self.corr_n + count
+        delta = mean - self.corr_mean
+        self.corr_m2 = self.corr_m2 + m2 + np.outer(delta, delta) * self.corr_n * count / total
+        self.corr_mean = self.corr_mean + delta * count / total
+        self.corr_n = total
+
+    def _add_groups(self, chunk: pd.DataFrame, numeric: pd.DataFrame):
+        missing = [column for column in self.group_by if column not in chunk.columns]
+        if missing:
+            raise DatasetError(f"group_by columns not found: {', '.join(missing)}")
+        if self.metrics is None:
+            self.metrics = [str(column) for column in numeric.columns if column not in self.group_by][:self.engine.max_group_metrics]
+        else:
+            unknown = [column for column in self.metrics if column not in numeric.columns]
+            if unknown:
+                raise DatasetError(f"metrics must be numeric columns: {', '.join(unknown)}")
+
+        grouped = chunk.groupby(self.group_by, dropna=False, observed=True)
+        part = grouped[self.metrics].sum(numeric_only=True) if self.metrics else pd.DataFrame(index=grouped.size().index)
+        part["__count__"] = grouped.size()
+        self.groups = part if self.groups is None else self.groups.add(part, fill_value=0)
+        if len(self.groups) > self.engine.max_groups:
+            self.groups = self.groups.nlargest(self.engine.max_groups, "__count__")
+            self.groups_pruned = True
+
+    def summary(self) -> Dict[str, Any]:
+        max_columns = self.engine.max_columns
+        summary: Dict[str, Any] = {
+            "rows": self.rows,
+            "columns": dict(list(self.dtypes.items())[:max_columns])
+        }
+        if len(self.dtypes) > max_columns:
+            summary["columns_omitted"] = len(self.dtypes) - max_columns
+
+        numeric = {}
+        for column, (count, mean, m2, minimum, maximum) in list(self.numeric.items())[:max_columns]:
+            stats = {
+                "count": count,
+                "nulls": self.nulls.get(column, 0),
+                "mean": compact_number(mean),
+                "std": compact_number(math.sqrt(m2 / (count - 1))) if count > 1 else None,
+                "min": compact_number(minimum),
+                "max": compact_number(maximum)
+            }
+            if self.sample is not None and column in self.sample:
+                values = self.sample[column].to_numpy(dtype=float)
+                values = values[~np.isnan(values)]
+                if len(values):
+                    for quantile, value in zip(QUANTILES, np.quantile(values, QUANTILES)):
+                        stats[f"p{int(quantile * 100):02d}"] = compact_number(value)
+            numeric[column] = stats
+        if numeric:
+            summary["numeric"] = numeric
+            summary["quantiles_approximate"] = self.rows > self.engine.sample_size
+
+        categorical = {}
+        for column, counter in list(self.categories.items())[:max_columns]:
+            if column in self.numeric:
+                continue
+            stats = {
+                "nulls": self.nulls.get(column, 0),
+                "distinct": len(counter),
+                "top": dict(counter.most_common(self.engine.max_categories))
+            }
+            if column in self.categories_pruned:
+                stats["approximate"] = True
+            categorical[column] = stats
+        if categorical:
+            summary["categorical"] = categorical
+
+        correlations = self._correlations()
+        if correlations:
+            summary["top_correlations"] = correlations
+
+        if self.groups is not None:
+            summary["group_by"] = self._group_summary()
+        return summary
+
+    def _correlations(self) -> List[Dict[str, Any]]:
+        if self.corr_n < 3:
+            return []
+        std = np.sqrt(np.diag(self.corr_m2))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            matrix = self.corr_m2 / np.outer(std, std)
+        pairs = []
+        for i in range(len(self.corr_columns)):
+            for j in range(i + 1, len(self.corr_columns)):
+                if math.isfinite(matrix[i, j]):
+                    pairs.append((abs(matrix[i, j]), self.corr_columns[i], self.corr_columns[j], matrix[i, j]))
+        pairs.sort(reverse=True)
+        return [
+            {"columns": [left, right], "r": compact_number(r)}
+            for _, left, right, r in pairs[:self.engine.max_correlations]
+        ]
+
+    def _group_summary(self) -> Dict[str, Any]:
+        top = self.groups.nlargest(self.engine.max_group_rows, "__count__")
+        rows = []
+        for key, values in top.iterrows():
+            count = values["__count__"]
+            row = {"key": key if isinstance(key, tuple) else [key], "count": compact_number(count)}
+            for metric in self.metrics:
+                row[f"{metric}_sum"] = compact_number(values[metric])
+                row[f"{metric}_mean"] = compact_number(values[metric] / count) if count else None
+            row["key"] = [None if pd.isna(part) else str(part) for part in row["key"]]
+            rows.append(row)
+        result = {"keys": self.group_by, "groups": len(self.groups), "top": rows}
+        if self.groups_pruned:
+            result["approximate"] = True
+        return result
+
+class DataEngine:
+    """Loads task datasets in chunks and reduces them to a compact summary.
+
+    Datasets come from an uploaded ``dataset_id``, a ``data_path`` under
+    ``data_dir``, inline ``csv`` text or a list of ``rows``. CSV is read with
+    pandas in ``chunk_size`` row chunks and Parquet batch by batch through
+    pyarrow, so memory stays bounded for files larger than RAM. The
+    summary (descriptive statistics, quantiles, top categories,
+    correlations and optional group-bys) replaces the raw data in the prompt.
+    """
+
+    def __init__(
+        self,
+        data_dir: str = "/tmp/agent-data",
+        chunk_size: int = 100_000,
+        sample_size: int = 10_000,
+        max_upload_bytes: int = 1024 * 1024 * 1024,
+        max_columns: int = 50,
+        max_categories: int = 10,
+        max_corr_columns: int = 20,
+        max_correlations: int = 10,
+        max_groups: int = 10_000,
+        max_group_rows: int = 20,
+        max_group_metrics: int = 5
+    ):
+        self.data_dir = os.path.realpath(data_dir)
+        self.chunk_size = chunk_size
+        self.sample_size = sample_size
+        self.max_upload_bytes = max_upload_bytes
+        self.max_columns = max_columns
+        self.max_categories = max_categories
+        self.max_corr_columns = max_corr_columns
+        self.max_correlations = max_correlations
+        self.max_groups = max_groups
+        self.max_group_rows = max_group_rows
+        self.max_group_metrics = max_group_metrics
+
+        self.summaries = 0
+        self.rows_processed = 0
+        self.uploads = 0
+        self.bytes_uploaded = 0
+
+    @staticmethod
+    def has_dataset(parameters: Dict[str, Any]) -> bool:
+        return any(key in parameters for key in DATA_SOURCE_KEYS)
+
+    def resolve_path(self, path: str) -> str:
+        """Resolve ``path`` relative to ``data_dir``, refusing anything outside it."""
+        resolved = os.path.realpath(os.path.join(self.data_dir, path))
+        if not resolved.startswith(self.data_dir + os.sep):
+            raise DatasetError("data_path must point inside the data directory")
+        if not os.path.isfile(resolved):
+            raise DatasetError(f"Dataset not found: {path}", 404)
+        return resolved
+
+    def dataset_path(self, dataset_id: str) -> str:
+        if not DATASET_ID.match(dataset_id or ""):
+            raise DatasetError("Invalid dataset_id")
+        for fmt in FORMATS:
+            path = os.path.join(self.data_dir, f"{dataset_id}.{fmt}")
+            if os.path.isfile(path):
+                return path
+        raise DatasetError(f"Dataset not found: {dataset_id}", 404)
+
+    async def save_upload(self, chunks: AsyncIterator[bytes], fmt: str = "csv") -> Dict[str, Any]:
+        """Stream an uploaded file to ``data_dir`` and return its ``dataset_id``."""
+        if fmt not in FORMATS:
+            raise DatasetError(f"Unsupported format: {fmt}")
+        os.makedirs(self.data_dir, exist_ok=True)
+        dataset_id = uuid.uuid4().hex
+        path = os.path.join(self.data_dir, f"{dataset_id}.{fmt}")
+        partial = f"{path}.part"
+        size = 0
+        try:
+            with open(partial, "wb") as handle:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise DatasetError(f"Upload exceeds {self.max_upload_bytes} bytes", 413)
+                    handle.write(chunk)
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+        self.uploads += 1
+        self.bytes_uploaded += size
+        return {"dataset_id": dataset_id, "format": fmt, "bytes": size}
+
+    def _open(self, parameters: Dict[str, Any]) -> Tuple[str, Iterator[pd.DataFrame]]:
+        if "rows" in parameters:
+            rows = parameters["rows"]
+            if not isinstance(rows, list):
+                raise DatasetError("rows must be a list of records")
+            return "rows", (
+                pd.DataFrame.from_records(rows[start:start + self.chunk_size])
+                for start in range(0, len(rows), self.chunk_size)
+            )
+
+        separator = parameters.get("delimiter", ",")
+        if "csv" in parameters:
+            data = parameters["csv"]
+            # Bytes or a shared-memory view when summarized in a worker process
+            handle = io.StringIO(data) if isinstance(data, str) else io.BytesIO(data)
+            return "inline_csv", pd.read_csv(handle, sep=separator, chunksize=self.chunk_size)
+
+        if "dataset_id" in parameters:
+            path = self.dataset_path(parameters["dataset_id"])
+        else:
+            path = self.resolve_path(parameters["data_path"])
+        fmt = parameters.get("format") or ("parquet" if path.endswith((".parquet", ".pq")) else "csv")
+        source = os.path.basename(path)
+
+        if fmt == "parquet":
+            return source, self._iter_parquet(path)
+        return source, pd.read_csv(path, sep=separator, chunksize=self.chunk_size)
+
+    def _iter_parquet(self, path: str) -> Iterator[pd.DataFrame]:
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise DatasetError("Parquet input requires pyarrow")
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=self.chunk_size):
+            yield batch.to_pandas()
+
+    def record_summary(self, summary: Dict[str, Any]) -> Dict[str, Any]:
+        # Counted by the caller, since the summary may have been computed in another process
+        self.summaries += 1
+        self.rows_processed += summary.get("rows", 0)
+        return summary
+
+    def compute_summary(self, parameters: Dict[str, Any]) -> Dict[str, Any]:
+        group_by = parameters.get("group_by") or []
+        if isinstance(group_by, str):
+            group_by = [group_by]
+        metrics = parameters.get("metrics")
+        if isinstance(metrics, str):
+            metrics = [metrics]
+
+        accumulator = _SummaryAccumulator(self, group_by, metrics)
+        try:
+            # read_csv parses the header while opening, so opening can fail like reading
+            source, chunks = self._open(parameters)
+            for chunk in chunks:
+                accumulator.add(chunk)
+        except (pd.errors.ParserError, pd.errors.EmptyDataError, UnicodeDecodeError) as e:
+            raise DatasetError(f"Could not parse dataset: {str(e)}")
+        except FileNotFoundError as e:
+            raise DatasetError(f"Dataset not found: {os.path.basename(e.filename or '')}", 404)
+        except OSError as e:
+            raise DatasetError(f"Could not read dataset: {e.strerror or str(e)}")
+        return {"source": source, **accumulator.summary()}
+
+    @staticmethod
+    def prompt_parameters(parameters: Dict[str, Any], summary: Dict[str, Any]) -> Dict[str, Any]:
+        """Replace the raw dataset in task parameters with its summary."""
+        remaining = {key: value for key, value in parameters.items() if key not in ("csv", "rows")}
+        remaining["data_summary"] = summary
+        return remaining
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "data_dir": self.data_dir,
+            "chunk_size": self.chunk_size,
+            "sample_size": self.sample_size,
+            "summaries": self.summaries,
+            "rows_processed": self.rows_processed,
+            "uploads": self.uploads,
+            "bytes_uploaded": self.bytes_uploaded
+        }
+
+# Picklable entry points for summarizing in a worker process
+
+def summarize_dataset(engine: DataEngine, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    return engine.compute_summary(parameters)
+
+def summarize_csv_buffer(buffer, engine: DataEngine, parameters: Dict[str, Any]) -> Dict[str, Any]:
+    """Summarize inline CSV handed over as bytes or a shared-memory view."""
+    return engine.compute_summary({**parameters, "csv": buffer})
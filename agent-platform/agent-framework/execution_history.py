@@ -0,0 +1,453 @@
+"""
+Execution History - Buffered, batched persistence of agent executions to Postgres or SQLite
+"""
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional, List, Tuple
+from prompt_builder import compact_json, shrink_value
+from metrics import HISTORY_FLUSH_DURATION, HISTORY_DROPPED
+
+logger = logging.getLogger("agent.execution_history")
+
+TABLE = "agent_executions"
+
+COLUMNS = (
+    "id", "created_at", "tenant", "agent_type", "status", "session_id", "task_description",
+    "parameters", "response", "error", "prompt_tokens", "response_tokens", "duration_ms", "timings"
+)
+JSON_COLUMNS = ("parameters", "timings")
+
+POSTGRES_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id TEXT PRIMARY KEY,
+    created_at TIMESTAMPTZ NOT NULL,
+    tenant TEXT NOT NULL,
+    agent_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    session_id TEXT,
+    task_description TEXT,
+    parameters JSONB,
+    response TEXT,
+    error TEXT,
+    prompt_tokens INTEGER,
+    response_tokens INTEGER,
+    duration_ms DOUBLE PRECISION,
+    timings JSONB
+);
+CREATE INDEX IF NOT EXISTS {TABLE}_tenant_created ON {TABLE} (tenant, created_at DESC);
+"""
+
+SQLITE_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS {TABLE} (
+    id TEXT PRIMARY KEY,
+    created_at TEXT NOT NULL,
+    tenant TEXT NOT NULL,
+    agent_type TEXT NOT NULL,
+    status TEXT NOT NULL,
+    session_id TEXT,
+    task_description TEXT,
+    parameters TEXT,
+    response TEXT,
+    error TEXT,
+    prompt_tokens INTEGER,
+    response_tokens INTEGER,
+    duration_ms REAL,
+    timings TEXT
+);
+CREATE INDEX IF NOT EXISTS {TABLE}_tenant_created ON {TABLE} (tenant, created_at DESC);
+"""
+
+def build_query(
+    placeholder,
+    tenant: str,
+    agent_type: Optional[str] = None,
+    status: Optional[str] = None,
+    session_id: Optional[str] = None,
+    since: Optional[datetime] = None,
+    before: Optional[datetime] = None,
+    limit: int = 50
+) -> Tuple[str, List[Any]]:
+    """SELECT for one tenant's executions, newest first; ``placeholder(n)`` renders the n-th parameter."""
+    conditions, args = [], []
+    for column, operator, value in (
+        ("tenant", "=", tenant),
+        ("agent_type", "=", agent_type),
+        ("status", "=", status),
+        ("session_id", "=", session_id),
+        ("created_at", ">=", since),
+        ("created_at", "<", before)
+    ):
+        if value is not None:
+            args.append(value)
+            conditions.append(f"{column} {operator} {placeholder(len(args))}")
+    args.append(limit)
+    sql = (
+        f"SELECT {', '.join(COLUMNS)} FROM {TABLE} WHERE {' AND '.join(conditions)} "
+        f"ORDER BY created_at DESC LIMIT {placeholder(len(args))}"
+    )
+    return sql, args
+
+class ExecutionDataError(Exception):
+    """The database rejected a row's contents; retrying the same row cannot succeed."""
+    pass
+
+def strip_nul(value: Any) -> Any:
+    # Postgres accepts no NUL characters in TEXT or JSONB values
+    if isinstance(value, str):
+        return value.replace("\x00", "")
+    if isinstance(value, dict):
+        return {strip_nul(key): strip_nul(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [strip_nul(item) for item in value]
+    return value
+
+def encode_row(entry: Dict[str, Any], timestamp=lambda value: value) -> tuple:
+    """Column values for one entry: JSON columns serialized, NULs removed, ``created_at`` passed through ``timestamp``."""
+    return tuple(
+        compact_json(strip_nul(entry[column])) if column in JSON_COLUMNS
+        else timestamp(entry[column]) if column == "created_at"
+        else strip_nul(entry[column])
+        for column in COLUMNS
+    )
+
+def decode_row(row) -> Dict[str, Any]:
+    record = dict(zip(COLUMNS, row))
+    for column in JSON_COLUMNS:
+        if isinstance(record[column], str):
+            record[column] = json.loads(record[column])
+    if isinstance(record["created_at"], datetime):
+        record["created_at"] = record["created_at"].isoformat()
+    return record
+
+class PostgresExecutionStore:
+    """Executions in Postgres, written with COPY over a small asyncpg connection pool.
+
+    The pool and table are created on first use, so the service starts even
+    while the database is unreachable.
+    """
+
+    def __init__(self, dsn: str, min_connections: int = 1, max_connections: int = 4):
+        import asyncpg
+        self._asyncpg = asyncpg
+        self.dsn = dsn
+        self.min_connections = min_connections
+        self.max_connections = max_connections
+        self._pool = None
+        self._start_lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._start_lock:
+            if self._pool is not None:
+                return
+            pool = await self._asyncpg.create_pool(
+                self.dsn,
+                min_size=self.min_connections,
+                max_size=self.max_connections,
+                command_timeout=30
+            )
+            async with pool.acquire() as connection:
+                await connection.execute(POSTGRES_SCHEMA)
+            self._pool = pool
+
+    async def insert_many(self, entries: List[Dict[str, Any]]):
+        await self.start()
+        records = [encode_row(entry) for entry in entries]
+        try:
+            async with self._pool.acquire() as connection:
+                await connection.copy_records_to_table(TABLE, records=records, columns=list(COLUMNS))
+        except (self._asyncpg.DataError, self._asyncpg.IntegrityConstraintViolationError) as e:
+            raise ExecutionDataError(str(e)) from e
+
+    async def query(self, tenant: str, **filters) -> List[Dict[str, Any]]:
+        await self.start()
+        sql, args = build_query(lambda n: f"${n}", tenant, **filters)
+        async with self._pool.acquire() as connection:
+            rows = await connection.fetch(sql, *args)
+        return [decode_row(tuple(row)) for row in rows]
+
+    async def get(self, tenant: str, execution_id: str) -> Optional[Dict[str, Any]]:
+        await self.start()
+        async with self._pool.acquire() as connection:
+            row = await connection.fetchrow(
+                f"SELECT {', '.join(COLUMNS)} FROM {TABLE} WHERE id = $1 AND tenant = $2",
+                execution_id,
+                tenant
+            )
+        return decode_row(tuple(row)) if row is not None else None
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "postgres",
+            "connected": self._pool is not None,
+            "pool_size": self._pool.get_size() if self._pool is not None else 0,
+            "max_connections": self.max_connections
+        }
+
+class SQLiteExecutionStore:
+    """Local stand-in for ``PostgresExecutionStore`` with the same interface.
+
+    Uses the standard library driver on a worker thread with one connection;
+    timestamps are stored as ISO-8601 text so they sort chronologically.
+    """
+
+    def __init__(self, path: str = "/tmp/agent-history.db"):
+        self.path = path
+        self._connection: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            connection = sqlite3.connect(self.path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SQLITE_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    async def start(self):
+        await asyncio.to_thread(self._locked, self._connect)
+
+    def _locked(self, func, *args):
+        with self._lock:
+            return func(*args)
+
+    def _insert_many(self, entries: List[Dict[str, Any]]):
+        rows = [encode_row(entry, datetime.isoformat) for entry in entries]
+        connection = self._connect()
+        try:
+            with connection:
+                connection.executemany(
+                    f"INSERT INTO {TABLE} ({', '.join(COLUMNS)}) VALUES ({', '.join('?' for _ in COLUMNS)})",
+                    rows
+                )
+        except (sqlite3.DataError, sqlite3.IntegrityError) as e:
+            raise ExecutionDataError(str(e)) from e
+
+    async def insert_many(self, entries: List[Dict[str, Any]]):
+        await asyncio.to_thread(self._locked, self._insert_many, entries)
+
+    def _fetch(self, sql: str, args: List[Any]) -> List[tuple]:
+        return self._connect().execute(sql, args).fetchall()
+
+    async def query(self, tenant: str, **filters) -> List[Dict[str, Any]]:
+        for bound in ("since", "before"):
+            if filters.get(bound) is not None:
+                filters[bound] = filters[bound].astimezone(timezone.utc).isoformat()
+        sql, args = build_query(lambda n: "?", tenant, **filters)
+        rows = await asyncio.to_thread(self._locked, self._fetch, sql, args)
+        return [decode_row(row) for row in rows]
+
+    async def get(self, tenant: str, execution_id: str) -> Optional[Dict[str, Any]]:
+        rows = await asyncio.to_thread(
+            self._locked,
+            self._fetch,
+            f"SELECT {', '.join(COLUMNS)} FROM {TABLE} WHERE id = ? AND tenant = ?",
+            [execution_id, tenant]
+        )
+        return decode_row(rows[0]) if rows else None
+
+    async def close(self):
+        if self._connection is not None:
+            await asyncio.to_thread(self._locked, self._connection.close)
+            self._connection = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "sqlite", "path": self.path}
+
+class ExecutionRecorder:
+    """Records executions off the request path.
+
+    ``record`` only appends to an in-process buffer of ``max_buffer``
+    entries. A background task writes the buffer in batches of up to
+    ``batch_size``, every ``flush_interval`` seconds or as soon as a full
+    batch is waiting. When the database is slow or down the buffer fills
+    and entries are dropped: ``drop_newest`` rejects new entries,
+    ``drop_oldest`` evicts the oldest buffered ones. A failed batch goes back
+    to the front of the buffer and is retried with exponential backoff, and
+    is dropped after ``max_attempts`` failed writes. A batch the database
+    rejects for its contents is written again one entry at a time, so only
+    the offending entries are dropped. Large parameters and
+    responses are trimmed before buffering so history cannot hold whole
+    datasets in memory.
+    """
+
+    def __init__(
+        self,
+        store,
+        max_buffer: int = 10000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        drop_policy: str = "drop_newest",
+        max_attempts: int = 5,
+        max_backoff: float = 30.0,
+        max_response_chars: int = 20000,
+        max_parameter_chars: int = 2000
+    ):
+        if drop_policy not in ("drop_newest", "drop_oldest"):
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.store = store
+        self.max_buffer = max_buffer
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drop_policy = drop_policy
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.max_response_chars = max_response_chars
+        self.max_parameter_chars = max_parameter_chars
+        self._buffer: deque = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._attempts = 0
+        self._backoff = 0.0
+
+        self.recorded = 0
+        self.written = 0
+        self.dropped = 0
+        self.flushes = 0
+        self.flush_failures = 0
+        self.last_flush_ms: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def record(self, entry: Dict[str, Any]) -> Optional[str]:
+        """Buffer one execution and return its id, or None if it was dropped; never waits on the database."""
+        self.recorded += 1
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            HISTORY_DROPPED.labels("buffer_full").inc()
+            if self.drop_policy == "drop_newest":
+                return None
+            self._buffer.popleft()
+
+        entry["parameters"] = shrink_value(entry.get("parameters") or {}, 50, self.max_parameter_chars)
+        if entry.get("response"):
+            entry["response"] = shrink_value(entry["response"], 1, self.max_response_chars)
+        self._buffer.append(entry)
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return entry["id"]
+
+    async def start(self):
+        try:
+            await self.store.start()
+        except Exception as e:
+            # Writes retry the connection; history must not keep the service from starting
+            logger.warning(f"Execution history store unavailable at startup: {str(e)}")
+        self._task = asyncio.ensure_future(self._run())
+
+    async def stop(self, timeout: float = 5.0):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Execution history: {len(self._buffer)} entries not written at shutdown")
+        await self.store.close()
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not await self.flush():
+                await asyncio.sleep(self._backoff)
+
+    async def flush(self) -> bool:
+        """Write everything buffered; returns False if a write failed."""
+        while self._buffer:
+            batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+            start = time.perf_counter()
+            try:
+                await self.store.insert_many(batch)
+                self.written += len(batch)
+            except asyncio.CancelledError:
+                # Shutdown interrupted the write; the final flush picks the batch up again
+                self._buffer.extendleft(reversed(batch))
+                raise
+            except ExecutionDataError as e:
+                logger.warning(f"Execution history batch rejected, writing its {len(batch)} entries one at a time: {str(e)}")
+                if not await self._insert_each(batch):
+                    return False
+            except Exception as e:
+                self._write_failed(batch, e)
+                return False
+            elapsed = time.perf_counter() - start
+            HISTORY_FLUSH_DURATION.observe(elapsed)
+            self.last_flush_ms = round(elapsed * 1000, 3)
+            self.flushes += 1
+            self._attempts = 0
+            self._backoff = 0.0
+        return True
+
+    async def _insert_each(self, batch: List[Dict[str, Any]]) -> bool:
+        for index, entry in enumerate(batch):
+            try:
+                await self.store.insert_many([entry])
+            except asyncio.CancelledError:
+                self._buffer.extendleft(reversed(batch[index:]))
+                raise
+            except ExecutionDataError as e:
+                logger.error(f"Execution history: dropping execution {entry['id']} the database rejected: {str(e)}")
+                self.dropped += 1
+                HISTORY_DROPPED.labels("rejected").inc()
+            except Exception as e:
+                # Connection trouble rather than bad data; the rest of the batch is retried as usual
+                self._write_failed(batch[index:], e)
+                return False
+            else:
+                self.written += 1
+        return True
+
+    def _write_failed(self, batch: List[Dict[str, Any]], error: Exception):
+        self.flush_failures += 1
+        self._attempts += 1
+        self.last_error = str(error)
+        self._backoff = min(self.max_backoff, max(self.flush_interval, self._backoff * 2))
+        if self._attempts >= self.max_attempts:
+            logger.error(f"Execution history: dropping {len(batch)} entries after {self._attempts} failed writes: {str(error)}")
+            self._attempts = 0
+            self.dropped += len(batch)
+            HISTORY_DROPPED.labels("write_failed").inc(len(batch))
+            return
+        logger.warning(f"Execution history write failed, retrying in {self._backoff:.1f}s: {str(error)}")
+        # Newer entries that arrived meanwhile keep their place; the buffer limit still applies
+        requeue = batch[:max(0, self.max_buffer - len(self._buffer))]
+        self._buffer.extendleft(reversed(requeue))
+        if len(requeue) < len(batch):
+            self.dropped += len(batch) - len(requeue)
+            HISTORY_DROPPED.labels("buffer_full").inc(len(batch) - len(requeue))
+
+    async def query(self, tenant: str, **filters) -> List[Dict[str, Any]]:
+        return await self.store.query(tenant, **filters)
+
+    async def get(self, tenant: str, execution_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(tenant, execution_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": self.store.stats(),
+            "buffered": len(self._buffer),
+            "max_buffer": self.max_buffer,
+            "drop_policy": self.drop_policy,
+            "recorded": self.recorded,
+            "written": self.written,
+            "dropped": self.dropped,
+            "flushes": self.flushes,
+            "flush_failures": self.flush_failures,
+            "last_flush_ms": self.last_flush_ms,
+            "last_error": self.last_error
+        }
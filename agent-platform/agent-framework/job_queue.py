@@ -0,0 +1,241 @@
+"""
+Job Queue - Asynchronous job mode for long-running agent tasks
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Callable, Awaitable
+import httpx
+from metrics import QUEUE_WAIT
+from tenancy import current_tenant, set_tenant, reset_tenant, DEFAULT_TENANT
+from web_fetcher import PublicAddressTransport
+
+logger = logging.getLogger("agent.job_queue")
+
+class QueueFullError(Exception):
+    pass
+
+class InMemoryJobStore:
+    """Single-replica job store: an asyncio queue plus a bounded record map."""
+
+    def __init__(self, max_records: int = 10000):
+        self.max_records = max_records
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._jobs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+    async def enqueue(self, job: Dict[str, Any]):
+        self._jobs[job["id"]] = job
+        while len(self._jobs) > self.max_records:
+            self._jobs.popitem(last=False)
+        self._queue.put_nowait(job["id"])
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = self._jobs.get(job_id)
+        return dict(job) if job is not None else None
+
+    async def update(self, job_id: str, **fields):
+        if job_id in self._jobs:
+            self._jobs[job_id].update(fields)
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+    async def close(self):
+        pass
+
+class RedisJobStore:
+    """Job store shared by every replica: a Redis list as the queue, one key per job record."""
+
+    def __init__(self, redis_url: str, key_prefix: str = "agent-jobs:", result_ttl: int = 3600):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(redis_url, decode_responses=True)
+        self.queue_key = f"{key_prefix}queue"
+        self.job_prefix = f"{key_prefix}job:"
+        self.result_ttl = result_ttl
+
+    async def enqueue(self, job: Dict[str, Any]):
+        await self._redis.set(self.job_prefix + job["id"], json.dumps(job, default=str), ex=self.result_ttl)
+        await self._redis.rpush(self.queue_key, job["id"])
+
+    async def dequeue(self, timeout: float) -> Optional[str]:
+        item = await self._redis.blpop(self.queue_key, timeout=max(1, int(timeout)))
+        return item[1] if item else None
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        data = await self._redis.get(self.job_prefix + job_id)
+        return json.loads(data) if data else None
+
+    async def update(self, job_id: str, **fields):
+        job = await self.get(job_id)
+        if job is not None:
+            job.update(fields)
+            await self._redis.set(self.job_prefix + job_id, json.dumps(job, default=str), ex=self.result_ttl)
+
+    async def depth(self) -> int:
+        return await self._redis.llen(self.queue_key)
+
+    async def close(self):
+        await self._redis.close()
+
+class JobWorkerPool:
+    """Fixed pool of asyncio workers draining a job store.
+
+    ``handler(agent_type, task)`` runs each job under the tenant that
+    submitted it; when a job carries a ``callback_url`` the finished job
+    record is POSTed to it. Callback URLs come from clients, so unless
+    ``block_private_callbacks`` is off they may only reach public addresses
+    and redirects are not followed.
+    """
+
+    def __init__(
+        self,
+        store,
+        handler: Callable[[str, Dict[str, Any]], Awaitable[Dict[str, Any]]],
+        workers: int = 4,
+        max_queue: int = 1000,
+        callback_timeout: float = 10.0,
+        block_private_callbacks: bool = True
+    ):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.max_queue = max_queue
+        self.callback_timeout = callback_timeout
+        self.block_private_callbacks = block_private_callbacks
+        self._tasks = []
+        self._callback_client: Optional[httpx.AsyncClient] = None
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.running = 0
+        self._wait_times = deque(maxlen=1000)
+
+    async def start(self):
+        transport = PublicAddressTransport(httpx.AsyncHTTPTransport()) if self.block_private_callbacks else None
+        self._callback_client = httpx.AsyncClient(timeout=self.callback_timeout, transport=transport, follow_redirects=False)
+        self._tasks = [asyncio.ensure_future(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._callback_client is not None:
+            await self._callback_client.aclose()
+            self._callback_client = None
+        await self.store.close()
+
+    async def submit(self, agent_type: str, task: Dict[str, Any], callback_url: Optional[str] = None) -> Dict[str, Any]:
+        if await self.store.depth() >= self.max_queue:
+            self.rejected += 1
+            raise QueueFullError(f"Job queue is full ({self.max_queue} jobs waiting)")
+
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "agent_type": agent_type,
+            "tenant": current_tenant(),
+            "task": task,
+            "callback_url": callback_url,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None
+        }
+        await self.store.enqueue(job)
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.store.get(job_id)
+
+    async def _worker(self):
+        while True:
+            try:
+                job_id = await self.store.dequeue(timeout=1.0)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job dequeue failed: {str(e)}")
+                await asyncio.sleep(1.0)
+                continue
+
+            if job_id is None:
+                continue
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job {job_id} could not be processed: {str(e)}")
+
+    async def _run(self, job_id: str):
+        job = await self.store.get(job_id)
+        if job is None:
+            return
+
+        started_at = time.time()
+        self._wait_times.append(started_at - job["created_at"])
+        QUEUE_WAIT.labels("jobs").observe(max(0.0, started_at - job["created_at"]))
+        await self.store.update(job_id, status="running", started_at=started_at)
+
+        self.running += 1
+        # Workers run outside any request, so restore the submitter's tenant for quotas and sessions
+        token = set_tenant(job.get("tenant") or DEFAULT_TENANT)
+        try:
+            result = await self.handler(job["agent_type"], job["task"])
+            status = "completed" if result.get("status") != "error" else "failed"
+        except Exception as e:
+            result = {"status": "error", "agent_type": job["agent_type"], "error": str(e)}
+            status = "failed"
+        finally:
+            reset_tenant(token)
+            self.running -= 1
+
+        if status == "completed":
+            self.completed += 1
+        else:
+            self.failed += 1
+
+        await self.store.update(job_id, status=status, finished_at=time.time(), result=result)
+
+        if job.get("callback_url"):
+            await self._send_callback(job_id, job["callback_url"])
+
+    async def _send_callback(self, job_id: str, callback_url: str):
+        job = await self.store.get(job_id)
+        try:
+            response = await self._callback_client.post(callback_url, json=job)
+            callback_status = response.status_code
+        except Exception as e:
+            logger.warning(f"Callback for job {job_id} failed: {str(e)}")
+            callback_status = f"error: {str(e)}"
+        await self.store.update(job_id, callback_status=callback_status)
+
+    async def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._wait_times)
+        return {
+            "queue_depth": await self.store.depth(),
+            "max_queue": self.max_queue,
+            "workers": self.workers,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "wait_ms_p50": round(waits[len(waits) // 2] * 1000, 2) if waits else None,
+            "wait_ms_p95": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else None,
+            "wait_ms_max": round(waits[-1] * 1000, 2) if waits else None
+        }
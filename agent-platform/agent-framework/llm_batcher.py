@@ -0,0 +1,184 @@
+"""
+LLM Batcher - Dynamic micro-batching of concurrent chat prompts into batched backend calls
+"""
+
+import asyncio
+import logging
+import time
+from typing import Dict, Any, List, Optional, Set, Tuple
+from llm_router import LLMRouter
+from resilience import LLMError
+from metrics import LLM_BATCH_SIZE, LLM_BATCH_WAIT
+from tracing import set_attributes
+
+logger = logging.getLogger("agent.llm_batcher")
+
+class _Pending:
+    __slots__ = ("payload", "agent_name", "future", "queued_at")
+
+    def __init__(self, payload: Dict[str, Any], agent_name: Optional[str]):
+        self.payload = payload
+        self.agent_name = agent_name
+        self.future = asyncio.get_running_loop().create_future()
+        self.queued_at = time.perf_counter()
+
+class MicroBatcher:
+    """Collects concurrent chat prompts per model and agent and sends them as one batch request."""
+
+    def __init__(
+        self,
+        llm_router: LLMRouter,
+        max_batch_size: int = 16,
+        max_wait_ms: float = 5.0,
+        batch_path: str = "/chat/batch"
+    ):
+        self.llm_router = llm_router
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.batch_path = batch_path
+        self.supported = True
+
+        self._queues: Dict[Tuple[str, Optional[str]], List[_Pending]] = {}
+        self._timers: Dict[Tuple[str, Optional[str]], asyncio.TimerHandle] = {}
+        self._in_flight: Dict[Tuple[str, Optional[str]], int] = {}
+        self._dispatches: Set[asyncio.Task] = set()
+
+        self.prompts = 0
+        self.direct = 0
+        self.batches = 0
+        self.batched_prompts = 0
+        self.batch_failures = 0
+        self.total_wait = 0.0
+
+    async def chat(self, payload: Dict[str, Any], agent_name: Optional[str] = None) -> Dict[str, Any]:
+        """Return the decoded ``/chat`` response for ``payload``; raises ``LLMError``."""
+        self.prompts += 1
+        key = (payload.get("model", ""), agent_name)
+        # Nothing to batch with: send straight away so an idle service adds no latency
+        if not self.supported or (not self._queues.get(key) and not self._in_flight.get(key)):
+            self.direct += 1
+            return await self._send_one(key, payload)
+
+        pending = _Pending(payload, agent_name)
+        queue = self._queues.setdefault(key, [])
+        queue.append(pending)
+        if len(queue) >= self.max_batch_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = asyncio.get_running_loop().call_later(self.max_wait, self._flush, key)
+        # A cancelled caller's prompt is skipped when its batch is dispatched
+        return await pending.future
+
+    async def _send_one(self, key: Tuple[str, Optional[str]], payload: Dict[str, Any]) -> Dict[str, Any]:
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            response = await self.llm_router.post("/chat", payload, agent_name=key[1])
+            return response.json()
+        finally:
+            self._in_flight[key] -= 1
+
+    def _flush(self, key: Tuple[str, Optional[str]]):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = [pending for pending in self._queues.pop(key, []) if not pending.future.done()]
+        if batch:
+            task = asyncio.ensure_future(self._dispatch(key, batch))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+
+    async def _dispatch(self, key: Tuple[str, Optional[str]], batch: List[_Pending]):
+        now = time.perf_counter()
+        for pending in batch:
+            waited = now - pending.queued_at
+            self.total_wait += waited
+            LLM_BATCH_WAIT.observe(waited)
+        LLM_BATCH_SIZE.observe(len(batch))
+        self.batches += 1
+        self.batched_prompts += len(batch)
+
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            if len(batch) == 1:
+                results = [await self._send_single(batch[0])]
+            else:
+                results = await self._send_batch(key, batch)
+        except asyncio.CancelledError:
+            for pending in batch:
+                if not pending.future.done():
+                    pending.future.set_exception(LLMError("Batched LLM request was cancelled at shutdown", "connection"))
+            raise
+        except Exception as e:
+            self.batch_failures += 1
+            results = [e] * len(batch)
+        finally:
+            self._in_flight[key] -= 1
+
+        for pending, result in zip(batch, results):
+            if pending.future.done():
+                continue
+            if isinstance(result, Exception):
+                pending.future.set_exception(result)
+            else:
+                pending.future.set_result(result)
+
+    async def _send_single(self, pending: _Pending) -> Any:
+        try:
+            response = await self.llm_router.post("/chat", pending.payload, agent_name=pending.agent_name)
+            return response.json()
+        except Exception as e:
+            return e
+
+    async def _send_batch(self, key: Tuple[str, Optional[str]], batch: List[_Pending]) -> List[Any]:
+        # The backend answers {"responses": [...]} in request order, each a /chat response or an "error"
+        payload = {
+            "model": key[0],
+            "requests": [
+                {key: value for key, value in pending.payload.items() if key != "model"}
+                for pending in batch
+            ]
+        }
+        set_attributes({"llm.batch_size": len(batch)})
+        try:
+            response = await self.llm_router.post(self.batch_path, payload, agent_name=key[1])
+        except LLMError as e:
+            if e.status_code not in (404, 405):
+                raise
+            logger.warning(f"LLM backend has no {self.batch_path} endpoint; sending prompts individually")
+            self.supported = False
+            return await asyncio.gather(*(self._send_single(pending) for pending in batch))
+
+        responses = response.json().get("responses") or []
+        if len(responses) != len(batch):
+            raise LLMError(f"Batch response has {len(responses)} results for {len(batch)} prompts", "http")
+        return [
+            LLMError(f"Batched LLM request failed: {item['error']}", "http") if "error" in item else item
+            for item in responses
+        ]
+
+    async def close(self, timeout: float = 10.0):
+        """Send whatever is still queued and wait for in-flight batches; cancel them after ``timeout``."""
+        for key in list(self._queues):
+            self._flush(key)
+        if not self._dispatches:
+            return
+        _, pending = await asyncio.wait(set(self._dispatches), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.supported,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "prompts": self.prompts,
+            "direct": self.direct,
+            "batches": self.batches,
+            "batched_prompts": self.batched_prompts,
+            "batch_failures": self.batch_failures,
+            "queued": sum(len(queue) for queue in self._queues.values()),
+            "avg_batch_size": round(self.batched_prompts / self.batches, 2) if self.batches else None,
+            "avg_fill": round(self.batched_prompts / (self.batches * self.max_batch_size), 3) if self.batches else None,
+            "avg_wait_ms": round(self.total_wait / self.batched_prompts * 1000, 3) if self.batched_prompts else None
+        }
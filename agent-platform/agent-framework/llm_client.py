@@ -0,0 +1,168 @@
+"""
+LLM Client Pool - Shared, lifecycle-managed HTTP connection pool for LLM calls
+"""
+
+import json
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Any, Optional, AsyncIterator
+import httpx
+from tracing import span, inject_headers, CLIENT
+
+logger = logging.getLogger("agent.llm_client")
+
+class LLMClientPool:
+    """Process-wide httpx client shared by every agent.
+
+    The underlying ``httpx.AsyncClient`` is created by ``start()`` (or lazily
+    on first use) and must be closed with ``close()`` on shutdown.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
+        default_timeout: float = 120.0,
+        connect_timeout: float = 10.0,
+        agent_timeouts: Optional[Dict[str, float]] = None
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2
+        self.default_timeout = default_timeout
+        self.connect_timeout = connect_timeout
+        self.agent_timeouts = dict(agent_timeouts or {})
+        self._client: Optional[httpx.AsyncClient] = None
+
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.total_requests = 0
+        self.total_errors = 0
+
+    async def start(self):
+        if self._client is None:
+            self._client = self._build_client()
+
+    async def close(self):
+        if self._client is not None:
+            client, self._client = self._client, None
+            await client.aclose()
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def _build_client(self) -> httpx.AsyncClient:
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("HTTP/2 requested but the 'h2' package is not installed; using HTTP/1.1")
+                http2 = False
+
+        limits = httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry
+        )
+        return httpx.AsyncClient(
+            limits=limits,
+            http2=http2,
+            timeout=httpx.Timeout(self.default_timeout, connect=self.connect_timeout)
+        )
+
+    def timeout_for(self, agent_name: Optional[str] = None) -> httpx.Timeout:
+        timeout = self.agent_timeouts.get(agent_name, self.default_timeout)
+        return httpx.Timeout(timeout, connect=min(self.connect_timeout, timeout))
+
+    async def post(self, url: str, json: Dict[str, Any], agent_name: Optional[str] = None) -> httpx.Response:
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            # One client span per attempt, so retries and hedges show up separately
+            with span("llm.http", {"http.method": "POST", "http.url": url}, kind=CLIENT) as current:
+                response = await self.client.post(url, json=json, headers=inject_headers(), timeout=self.timeout_for(agent_name))
+                if current is not None:
+                    current.set_attribute("http.status_code", response.status_code)
+                return response
+        except Exception:
+            self.total_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    @asynccontextmanager
+    async def stream(self, url: str, json: Dict[str, Any], agent_name: Optional[str] = None) -> AsyncIterator[httpx.Response]:
+        self.in_flight += 1
+        self.total_requests += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            async with self.client.stream("POST", url, json=json, headers=inject_headers(), timeout=self.timeout_for(agent_name)) as response:
+                yield response
+        except Exception:
+            self.total_errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        open_connections = idle_connections = None
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = getattr(pool, "connections", None)
+        if connections is not None:
+            open_connections = len(connections)
+            idle_connections = sum(1 for conn in connections if conn.is_idle())
+
+        return {
+            "started": self._client is not None,
+            "http2": self.http2,
+            "max_connections": self.max_connections,
+            "max_keepalive_connections": self.max_keepalive_connections,
+            "keepalive_expiry": self.keepalive_expiry,
+            "open_connections": open_connections,
+            "idle_connections": idle_connections,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "utilization": round(self.in_flight / self.max_connections, 3) if self.max_connections else None,
+            "total_requests": self.total_requests,
+            "total_errors": self.total_errors,
+            "default_timeout": self.default_timeout,
+            "agent_timeouts": self.agent_timeouts
+        }
+
+def parse_stream_line(line: str) -> Optional[str]:
+    """Extract the token text from one line of an NDJSON or SSE LLM stream.
+
+    Returns ``None`` for keep-alives, SSE comments and end-of-stream markers.
+    """
+    line = line.strip()
+    if not line or line.startswith(":") or line.startswith("event:"):
+        return None
+    if line.startswith("data:"):
+        line = line[5:].strip()
+    if line == "[DONE]":
+        return None
+    try:
+        data = json.loads(line)
+    except ValueError:
+        return line
+    if not isinstance(data, dict):
+        return str(data)
+    for key in ("response", "token", "content"):
+        if data.get(key):
+            return data[key]
+    return None
+
+async def iter_stream_tokens(response: httpx.Response) -> AsyncIterator[str]:
+    """Yield tokens from a streaming LLM response as they arrive."""
+    async for line in response.aiter_lines():
+        token = parse_stream_line(line)
+        if token:
+            yield token
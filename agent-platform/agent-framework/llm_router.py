@@ -0,0 +1,298 @@
+"""
+LLM Router - Load balancing and health-aware endpoint selection across LLM replicas
+"""
+
+import asyncio
+import hashlib
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, Set, AsyncIterator
+import httpx
+from llm_client import LLMClientPool
+from resilience import LLMError, ResiliencePolicy, CircuitBreaker, RETRYABLE_STATUS_CODES
+
+logger = logging.getLogger("agent.llm_router")
+
+DEFAULT_MODEL = "llama3.2"
+
+def affinity_score(key: str, url: str) -> int:
+    # Rendezvous hashing: each key prefers the endpoint with the highest score, and
+    # only keys that preferred a removed endpoint move when the pool changes
+    return int.from_bytes(hashlib.blake2b(f"{key}|{url}".encode("utf-8"), digest_size=8).digest(), "big")
+
+class LLMEndpoint:
+    def __init__(self, url: str, breaker: CircuitBreaker):
+        self.url = url.rstrip("/")
+        self.breaker = breaker
+        self.outstanding = 0
+        self.ewma_latency: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "url": self.url,
+            "healthy": self.breaker.available(),
+            "circuit": self.breaker.stats(),
+            "outstanding": self.outstanding,
+            "ewma_latency_ms": round(self.ewma_latency * 1000, 2) if self.ewma_latency is not None else None,
+            "requests": self.requests,
+            "failures": self.failures
+        }
+
+class LLMRouter:
+    """Spreads LLM calls over endpoints by load, with per-endpoint circuit breakers, retries and hedging."""
+
+    def __init__(
+        self,
+        endpoints: List[str],
+        llm_client: LLMClientPool,
+        strategy: str = "least_outstanding",
+        failure_threshold: int = 3,
+        ejection_time: float = 30.0,
+        max_ejection_time: float = 300.0,
+        default_model: str = DEFAULT_MODEL,
+        agent_models: Optional[Dict[str, str]] = None,
+        default_policy: Optional[ResiliencePolicy] = None,
+        agent_policies: Optional[Dict[str, ResiliencePolicy]] = None
+    ):
+        if not endpoints:
+            raise ValueError("LLMRouter needs at least one endpoint")
+        if strategy not in ("least_outstanding", "ewma"):
+            raise ValueError(f"Unknown routing strategy: {strategy}")
+
+        self.endpoints = [
+            LLMEndpoint(url, CircuitBreaker(failure_threshold, ejection_time, max_ejection_time))
+            for url in endpoints
+        ]
+        self.llm_client = llm_client
+        self.strategy = strategy
+        self.default_model = default_model
+        self.agent_models = dict(agent_models or {})
+        self.default_policy = default_policy or ResiliencePolicy()
+        self.agent_policies = dict(agent_policies or {})
+        self._latencies: Dict[Optional[str], deque] = {}
+        self._next = 0
+
+        self.retries = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.fast_failures = 0
+        self.affinity_routed = 0
+
+    def model_for(self, agent_name: str) -> str:
+        return self.agent_models.get(agent_name, self.default_model)
+
+    def policy_for(self, agent_name: Optional[str]) -> ResiliencePolicy:
+        return self.agent_policies.get(agent_name, self.default_policy)
+
+    def select(self, exclude: Optional[Set[str]] = None, affinity: Optional[str] = None) -> LLMEndpoint:
+        now = time.monotonic()
+        candidates = [endpoint for endpoint in self.endpoints if endpoint.breaker.available(now)]
+        if exclude:
+            # Prefer endpoints this call has not tried yet, but reuse one rather than give up
+            candidates = [endpoint for endpoint in candidates if endpoint.url not in exclude] or candidates
+        if not candidates:
+            self.fast_failures += 1
+            raise LLMError("All LLM endpoints are unavailable (circuit open)", "circuit_open", retryable=False)
+        if affinity is not None:
+            self.affinity_routed += 1
+            return max(candidates, key=lambda endpoint: affinity_score(affinity, endpoint.url))
+
+        # Rotate the starting point so ties are spread instead of always hitting the first endpoint
+        self._next = (self._next + 1) % len(candidates)
+        candidates = candidates[self._next:] + candidates[:self._next]
+
+        if self.strategy == "ewma":
+            # Unmeasured endpoints look as fast as the fastest one so they get traffic
+            known = [endpoint.ewma_latency for endpoint in candidates if endpoint.ewma_latency is not None]
+            fallback = min(known) if known else 1.0
+            return min(
+                candidates,
+                key=lambda endpoint: (endpoint.ewma_latency or fallback) * (endpoint.outstanding + 1)
+            )
+        return min(candidates, key=lambda endpoint: endpoint.outstanding)
+
+    def record(self, endpoint: LLMEndpoint, latency: Optional[float], ok: bool, agent_name: Optional[str] = None):
+        endpoint.requests += 1
+        if ok:
+            endpoint.breaker.record_success()
+            if latency is not None:
+                endpoint.ewma_latency = latency if endpoint.ewma_latency is None else 0.8 * endpoint.ewma_latency + 0.2 * latency
+                self._latencies.setdefault(agent_name, deque(maxlen=200)).append(latency)
+            return
+
+        endpoint.failures += 1
+        if endpoint.breaker.record_failure():
+            logger.warning(f"Circuit opened for LLM endpoint {endpoint.url} for {endpoint.breaker.reset_timeout:.0f}s")
+
+    def hedge_delay(self, agent_name: Optional[str], policy: ResiliencePolicy) -> Optional[float]:
+        samples = self._latencies.get(agent_name)
+        if not samples or len(samples) < policy.hedge_min_samples:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * policy.hedge_quantile))]
+
+    async def post(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        agent_name: Optional[str] = None,
+        affinity: Optional[str] = None
+    ) -> httpx.Response:
+        """POST to the best endpoint, retrying and hedging per the agent's policy; raises ``LLMError``."""
+        policy = self.policy_for(agent_name)
+        tried: Set[str] = set()
+        attempt = 0
+        while True:
+            try:
+                if policy.hedge:
+                    return await self._hedged_attempt(path, payload, agent_name, policy, tried, affinity)
+                return await self._attempt(path, payload, agent_name, tried, affinity)
+            except LLMError as e:
+                if not policy.should_retry(e, attempt):
+                    raise
+                self.retries += 1
+                await asyncio.sleep(policy.backoff(attempt))
+                attempt += 1
+
+    async def _attempt(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        agent_name: Optional[str],
+        tried: Set[str],
+        affinity: Optional[str] = None
+    ) -> httpx.Response:
+        endpoint = self.select(tried, affinity)
+        tried.add(endpoint.url)
+        endpoint.breaker.on_dispatch()
+        endpoint.outstanding += 1
+        start = time.monotonic()
+        recorded = False
+        try:
+            response = await self.llm_client.post(f"{endpoint.url}{path}", json=payload, agent_name=agent_name)
+        except httpx.TimeoutException as e:
+            self.record(endpoint, None, False, agent_name)
+            recorded = True
+            raise LLMError(f"LLM request to {endpoint.url} timed out", "timeout", True, endpoint=endpoint.url) from e
+        except httpx.TransportError as e:
+            self.record(endpoint, None, False, agent_name)
+            recorded = True
+            raise LLMError(f"LLM connection to {endpoint.url} failed: {str(e)}", "connection", True, endpoint=endpoint.url) from e
+        else:
+            self.record(endpoint, time.monotonic() - start, response.status_code < 500, agent_name)
+            recorded = True
+        finally:
+            endpoint.outstanding -= 1
+            if not recorded:
+                # Cancelled hedge losers and other errors say nothing about the endpoint's
+                # health, but must still free a half-open probe slot
+                endpoint.breaker.on_cancel()
+
+        if response.status_code >= 400:
+            raise LLMError(
+                f"LLM endpoint {endpoint.url} returned HTTP {response.status_code}",
+                "http",
+                response.status_code in RETRYABLE_STATUS_CODES,
+                status_code=response.status_code,
+                endpoint=endpoint.url
+            )
+        return response
+
+    async def _hedged_attempt(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        agent_name: Optional[str],
+        policy: ResiliencePolicy,
+        tried: Set[str],
+        affinity: Optional[str] = None
+    ) -> httpx.Response:
+        primary = asyncio.ensure_future(self._attempt(path, payload, agent_name, tried, affinity))
+        delay = self.hedge_delay(agent_name, policy)
+        if delay is None:
+            return await primary
+
+        pending = {primary}
+        hedge = None
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            # The hedge goes to the affinity key's next-preferred endpoint
+            hedge = asyncio.ensure_future(self._attempt(path, payload, agent_name, tried, affinity))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    @asynccontextmanager
+    async def stream(
+        self,
+        path: str,
+        payload: Dict[str, Any],
+        agent_name: Optional[str] = None,
+        affinity: Optional[str] = None
+    ) -> AsyncIterator[httpx.Response]:
+        """Open a streaming call; endpoint selection and failures follow ``post``, without retries."""
+        endpoint = self.select(affinity=affinity)
+        endpoint.breaker.on_dispatch()
+        endpoint.outstanding += 1
+        start = time.monotonic()
+        recorded = False
+        try:
+            async with self.llm_client.stream(f"{endpoint.url}{path}", json=payload, agent_name=agent_name) as response:
+                # Time to first byte is the latency signal for streams
+                self.record(endpoint, time.monotonic() - start, response.status_code < 500, agent_name)
+                recorded = True
+                if response.status_code >= 400:
+                    raise LLMError(
+                        f"LLM endpoint {endpoint.url} returned HTTP {response.status_code}",
+                        "http",
+                        response.status_code in RETRYABLE_STATUS_CODES,
+                        status_code=response.status_code,
+                        endpoint=endpoint.url
+                    )
+                yield response
+        except httpx.TimeoutException as e:
+            if not recorded:
+                self.record(endpoint, None, False, agent_name)
+            raise LLMError(f"LLM request to {endpoint.url} timed out", "timeout", True, endpoint=endpoint.url) from e
+        except httpx.TransportError as e:
+            if not recorded:
+                self.record(endpoint, None, False, agent_name)
+            raise LLMError(f"LLM connection to {endpoint.url} failed: {str(e)}", "connection", True, endpoint=endpoint.url) from e
+        finally:
+            endpoint.outstanding -= 1
+            if not recorded:
+                endpoint.breaker.on_cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "default_model": self.default_model,
+            "agent_models": self.agent_models,
+            "default_policy": self.default_policy.stats(),
+            "agent_policies": {name: policy.stats() for name, policy in self.agent_policies.items()},
+            "retries": self.retries,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "fast_failures": self.fast_failures,
+            "affinity_routed": self.affinity_routed,
+            "endpoints": [endpoint.stats() for endpoint in self.endpoints]
+        }
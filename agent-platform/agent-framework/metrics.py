@@ -0,0 +1,178 @@
+"""
+Metrics - Prometheus instrumentation and per-stage request timings
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Iterator
+from prometheus_client import Counter, Gauge, Histogram
+
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+BATCH_WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1)
+LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+REQUEST_LATENCY = Histogram(
+    "agent_request_duration_seconds",
+    "End-to-end agent request latency",
+    ["agent_type", "mode", "status"],
+    buckets=LATENCY_BUCKETS
+)
+LLM_LATENCY = Histogram(
+    "agent_llm_call_duration_seconds",
+    "LLM call latency including retries",
+    ["agent_type", "status"],
+    buckets=LATENCY_BUCKETS
+)
+TIME_TO_FIRST_TOKEN = Histogram(
+    "agent_llm_time_to_first_token_seconds",
+    "Time until the first streamed token arrives",
+    ["agent_type"],
+    buckets=LATENCY_BUCKETS
+)
+QUEUE_WAIT = Histogram(
+    "agent_queue_wait_seconds",
+    "Time spent waiting for admission or a job worker",
+    ["queue"],
+    buckets=LATENCY_BUCKETS
+)
+PROMPT_SIZE = Histogram(
+    "agent_prompt_bytes",
+    "Size of prompts sent to the LLM",
+    ["agent_type"],
+    buckets=SIZE_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    "agent_response_bytes",
+    "Size of LLM responses",
+    ["agent_type"],
+    buckets=SIZE_BUCKETS
+)
+LLM_TOKENS = Histogram(
+    "agent_llm_tokens",
+    "Token counts reported by the LLM service",
+    ["agent_type", "kind"],
+    buckets=TOKEN_BUCKETS
+)
+PROMPT_TOKENS = Histogram(
+    "agent_prompt_estimated_tokens",
+    "Estimated token count of prompts sent to the LLM",
+    ["agent_type"],
+    buckets=TOKEN_BUCKETS
+)
+PROMPT_TRUNCATIONS = Counter(
+    "agent_prompt_truncations_total",
+    "Prompts whose inputs were sampled or truncated to fit the token budget",
+    ["agent_type"]
+)
+LLM_BATCH_SIZE = Histogram(
+    "agent_llm_batch_size",
+    "Prompts per micro-batched LLM request",
+    buckets=BATCH_SIZE_BUCKETS
+)
+LLM_BATCH_WAIT = Histogram(
+    "agent_llm_batch_wait_seconds",
+    "Time a prompt waited for its micro-batch to be dispatched",
+    buckets=BATCH_WAIT_BUCKETS
+)
+SESSION_HISTORY_TOKENS = Histogram(
+    "agent_session_history_tokens",
+    "Estimated tokens of conversation history carried into a session request",
+    buckets=TOKEN_BUCKETS
+)
+SESSION_COMPACTIONS = Counter(
+    "agent_session_compactions_total",
+    "Times older session turns were folded into the session summary"
+)
+CACHE_LOOKUPS = Counter(
+    "agent_cache_lookups_total",
+    "Response cache lookups",
+    ["agent_type", "result"]
+)
+TENANT_LATENCY = Histogram(
+    "agent_tenant_request_duration_seconds",
+    "End-to-end request latency per tenant",
+    ["tenant", "mode", "status"],
+    buckets=LATENCY_BUCKETS
+)
+TENANT_REJECTIONS = Counter(
+    "agent_tenant_rejections_total",
+    "Requests rejected by tenant rate limits, quotas or admission control",
+    ["tenant", "reason"]
+)
+CPU_TASK_DURATION = Histogram(
+    "agent_cpu_task_duration_seconds",
+    "Duration of CPU-bound work offloaded to the process pool, including hand-off",
+    ["function"],
+    buckets=LATENCY_BUCKETS
+)
+EVENT_LOOP_LAG = Histogram(
+    "agent_event_loop_lag_seconds",
+    "How late the event loop ran a timer; sustained lag means something is blocking it",
+    buckets=LAG_BUCKETS
+)
+HISTORY_FLUSH_DURATION = Histogram(
+    "agent_history_flush_duration_seconds",
+    "Time to write one batch of execution history to the database",
+    buckets=LATENCY_BUCKETS
+)
+HISTORY_DROPPED = Counter(
+    "agent_history_dropped_total",
+    "Execution history entries dropped instead of written",
+    ["reason"]
+)
+SERVICE_STATE = Gauge(
+    "agent_service_state",
+    "Point-in-time service state refreshed on each scrape",
+    ["component", "field"],
+    # With PROMETHEUS_MULTIPROC_DIR, one series per live worker (pid label);
+    # exited workers drop out instead of reporting their last value forever
+    multiprocess_mode="liveall"
+)
+
+# Per-request stage timings, only collected when a caller asked for them
+_stage_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def start_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _stage_timings.set(timings)
+    return timings
+
+def current_timings() -> Optional[Dict[str, float]]:
+    timings = _stage_timings.get()
+    return dict(timings) if timings is not None else None
+
+def record_timing(name: str, seconds: float):
+    timings = _stage_timings.get()
+    if timings is not None:
+        timings[name] = round(timings.get(name, 0.0) + seconds * 1000, 3)
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time a block into the current request's stage timings (milliseconds)."""
+    if _stage_timings.get() is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_timing(name, time.perf_counter() - start)
+
+def observe_token_usage(agent_type: str, data: Dict[str, Any]):
+    """Record token counts from an LLM response in either OpenAI or Ollama shape."""
+    usage = data.get("usage") or {}
+    prompt_tokens = usage.get("prompt_tokens", data.get("prompt_eval_count"))
+    completion_tokens = usage.get("completion_tokens", data.get("eval_count"))
+    if prompt_tokens is not None:
+        LLM_TOKENS.labels(agent_type, "prompt").observe(prompt_tokens)
+    if completion_tokens is not None:
+        LLM_TOKENS.labels(agent_type, "completion").observe(completion_tokens)
+
+def set_service_state(component: str, stats: Dict[str, Any]):
+    for field, value in stats.items():
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            SERVICE_STATE.labels(component, field).set(value)
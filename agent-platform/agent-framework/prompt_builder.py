@@ -0,0 +1,132 @@
+"""
+Prompt Builder - Token-budgeted prompt rendering with compact parameter serialization
+"""
+
+import json
+import math
+import textwrap
+from typing import Dict, Any, Optional, Tuple
+from metrics import PROMPT_TRUNCATIONS
+
+# Parameters always get at least this many tokens, however long the rest of the prompt is
+MIN_PARAMETER_TOKENS = 64
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+def shrink_value(value: Any, max_items: int, max_chars: int) -> Any:
+    """Bound a JSON-like value: long strings are cut, long lists evenly sampled, wide dicts trimmed.
+
+    Every cut leaves a marker saying how much was omitted so the model knows
+    it is looking at a sample.
+    """
+    if isinstance(value, str):
+        if len(value) <= max_chars:
+            return value
+        # Cut multi-line text (e.g. CSV) at a line boundary so rows stay intact
+        cut = value.rfind("\n", 0, max_chars)
+        if cut < max_chars // 2:
+            cut = max_chars
+        omitted_lines = value.count("\n", cut)
+        marker = f"[{omitted_lines} more lines omitted]" if omitted_lines else f"[{len(value) - cut} more chars omitted]"
+        return value[:cut] + "..." + marker
+
+    if isinstance(value, dict):
+        items = list(value.items())
+        shrunk = {str(key): shrink_value(item, max_items, max_chars) for key, item in items[:max_items]}
+        if len(items) > max_items:
+            shrunk["..."] = f"{len(items) - max_items} more keys omitted"
+        return shrunk
+
+    if isinstance(value, (list, tuple)):
+        if len(value) <= max_items:
+            return [shrink_value(item, max_items, max_chars) for item in value]
+        # Evenly spaced sample keeps the first and last items and the spread in between
+        if max_items > 1:
+            indices = sorted({round(i * (len(value) - 1) / (max_items - 1)) for i in range(max_items)})
+        else:
+            indices = [0]
+        sampled = [shrink_value(value[i], max_items, max_chars) for i in indices]
+        sampled.append(f"... {len(value) - len(indices)} of {len(value)} items omitted (evenly sampled)")
+        return sampled
+
+    return value
+
+class PromptBuilder:
+    """Renders agent prompts within a per-agent token budget.
+
+    Token counts are estimated from character length (``chars_per_token``),
+    which is close enough for budgeting without a tokenizer dependency.
+    Parameters are serialized as compact JSON; when the prompt would exceed
+    the agent's budget the task description is capped at half of it and
+    parameters are progressively sampled and truncated until they fit.
+    """
+
+    def __init__(
+        self,
+        default_budget: int = 4096,
+        agent_budgets: Optional[Dict[str, int]] = None,
+        chars_per_token: float = 4.0
+    ):
+        self.default_budget = default_budget
+        self.agent_budgets = dict(agent_budgets or {})
+        self.chars_per_token = chars_per_token
+
+        self.prompts_built = 0
+        self.truncated = 0
+
+    def budget_for(self, agent_name: str) -> int:
+        return self.agent_budgets.get(agent_name, self.default_budget)
+
+    def estimate_tokens(self, text: Optional[str]) -> int:
+        return math.ceil(len(text or "") / self.chars_per_token)
+
+    def truncate_text(self, text: str, max_tokens: int) -> Tuple[str, bool]:
+        if self.estimate_tokens(text) <= max_tokens:
+            return text, False
+        return shrink_value(text, len(text), int(max_tokens * self.chars_per_token)), True
+
+    def format_parameters(self, parameters: Any, max_tokens: int) -> Tuple[str, bool]:
+        """Serialize parameters compactly, shrinking them until they fit ``max_tokens``."""
+        text = compact_json(parameters)
+        if self.estimate_tokens(text) <= max_tokens:
+            return text, False
+
+        max_items, max_chars = 1024, 4096
+        while True:
+            text = compact_json(shrink_value(parameters, max_items, max_chars))
+            if self.estimate_tokens(text) <= max_tokens:
+                return text, True
+            if max_items == 1 and max_chars == 32:
+                break
+            max_items, max_chars = max(1, max_items // 2), max(32, max_chars // 2)
+
+        # Still too large (e.g. very deep nesting): hard cut the serialized form
+        return shrink_value(text, len(text), int(max_tokens * self.chars_per_token)), True
+
+    def build(self, agent_name: str, template: str, task: Dict[str, Any], system_prompt: str = "") -> str:
+        """Render ``template`` with ``{task_description}`` and ``{parameters}`` filled in within budget."""
+        template = textwrap.dedent(template).strip() + "\n"
+        budget = self.budget_for(agent_name)
+
+        task_description, description_cut = self.truncate_text(task.get("task_description", ""), budget // 2)
+        overhead = self.estimate_tokens(template) + self.estimate_tokens(system_prompt) + self.estimate_tokens(task_description)
+        parameters, parameters_cut = self.format_parameters(
+            task.get("parameters", {}),
+            max(MIN_PARAMETER_TOKENS, budget - overhead)
+        )
+
+        self.prompts_built += 1
+        if description_cut or parameters_cut:
+            self.truncated += 1
+            PROMPT_TRUNCATIONS.labels(agent_name).inc()
+        return template.format(task_description=task_description, parameters=parameters)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "default_budget": self.default_budget,
+            "agent_budgets": self.agent_budgets,
+            "chars_per_token": self.chars_per_token,
+            "prompts_built": self.prompts_built,
+            "truncated": self.truncated
+        }
@@ -0,0 +1,153 @@
+"""
+Resilience - Structured LLM errors, retry/hedging policies and circuit breakers
+"""
+
+import random
+import time
+from typing import Dict, Any, Optional
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+class LLMError(Exception):
+    """A failed LLM call.
+
+    ``kind`` is one of ``timeout``, ``connection``, ``http`` or
+    ``circuit_open``; ``retryable`` says whether another attempt may succeed.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        kind: str,
+        retryable: bool = False,
+        status_code: Optional[int] = None,
+        endpoint: Optional[str] = None
+    ):
+        super().__init__(message)
+        self.kind = kind
+        self.retryable = retryable
+        self.status_code = status_code
+        self.endpoint = endpoint
+
+def is_overload(error: BaseException) -> bool:
+    """True for failures that signal a slow or saturated LLM backend rather than a bad request."""
+    if not isinstance(error, LLMError):
+        return False
+    if error.kind == "http":
+        return error.status_code is not None and (error.status_code >= 500 or error.status_code == 429)
+    return error.kind in ("timeout", "connection", "circuit_open")
+
+class ResiliencePolicy:
+    """Per-agent retry and hedging settings.
+
+    Retries use full jitter: the n-th back-off is uniform in
+    ``[0, min(max_delay, base_delay * 2**n)]``. Timeouts are only retried when
+    ``retry_on_timeout`` is set, since each attempt can already take the full
+    LLM timeout. With ``hedge`` enabled a second attempt is sent to another
+    endpoint once the first has taken longer than the ``hedge_quantile``
+    latency of recent calls.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 0.2,
+        max_delay: float = 2.0,
+        retry_on_timeout: bool = False,
+        hedge: bool = False,
+        hedge_quantile: float = 0.95,
+        hedge_min_samples: int = 20
+    ):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.retry_on_timeout = retry_on_timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+
+    def should_retry(self, error: LLMError, attempt: int) -> bool:
+        if attempt + 1 >= self.max_attempts:
+            return False
+        if error.kind == "timeout":
+            return self.retry_on_timeout
+        return error.retryable
+
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_attempts": self.max_attempts,
+            "retry_on_timeout": self.retry_on_timeout,
+            "hedge": self.hedge,
+            "hedge_quantile": self.hedge_quantile
+        }
+
+class CircuitBreaker:
+    """Closed / open / half-open breaker for one endpoint.
+
+    ``failure_threshold`` consecutive failures open the circuit for
+    ``reset_timeout`` seconds. After that a single probe request is let
+    through (half-open); success closes the circuit, failure re-opens it with
+    the timeout doubled up to ``max_reset_timeout``.
+    """
+
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, max_reset_timeout: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.base_reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.opened_until = 0.0
+        self.probe_in_flight = False
+        self.opens = 0
+
+    def available(self, now: Optional[float] = None) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic() if now is None else now
+        return self.opened_until <= now and not self.probe_in_flight
+
+    def on_dispatch(self):
+        if self.state != "closed":
+            self.state = "half_open"
+            self.probe_in_flight = True
+
+    def on_cancel(self):
+        self.probe_in_flight = False
+
+    def record_success(self):
+        self.state = "closed"
+        self.consecutive_failures = 0
+        self.reset_timeout = self.base_reset_timeout
+        self.probe_in_flight = False
+
+    def record_failure(self) -> bool:
+        """Record a failure; returns True when this failure opened the circuit."""
+        self.probe_in_flight = False
+        if self.state == "half_open":
+            self.reset_timeout = min(self.max_reset_timeout, self.reset_timeout * 2)
+            self._open()
+            return True
+
+        self.consecutive_failures += 1
+        if self.state == "closed" and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+            return True
+        return False
+
+    def _open(self):
+        self.state = "open"
+        self.opens += 1
+        self.consecutive_failures = 0
+        self.opened_until = time.monotonic() + self.reset_timeout
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "opens": self.opens,
+            "retry_in_s": max(0.0, round(self.opened_until - time.monotonic(), 1)) if self.state != "closed" else None
+        }
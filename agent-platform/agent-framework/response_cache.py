@@ -0,0 +1,125 @@
+"""
+Response Cache - Two-tier (in-process LRU + optional Redis) cache for LLM responses
+"""
+
+import hashlib
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger("agent.response_cache")
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapse whitespace so indentation changes in prompt templates do not miss the cache."""
+    return " ".join((prompt or "").split())
+
+def make_cache_key(agent_name: str, model: str, system_prompt: Optional[str], prompt: str) -> str:
+    canonical = json.dumps(
+        [agent_name, model, normalize_prompt(system_prompt), normalize_prompt(prompt)],
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """LRU cache with TTL in front of the LLM, optionally backed by Redis.
+
+    Lookups try the local tier first, then Redis; Redis hits are copied into the
+    local tier. Redis failures are logged and treated as misses so the cache
+    can never fail a request.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 300.0,
+        redis_url: Optional[str] = None,
+        key_prefix: str = "agent-cache:"
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.key_prefix = key_prefix
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._redis = None
+
+        if redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self._redis = redis_asyncio.from_url(redis_url, decode_responses=True)
+            except ImportError:
+                logger.warning("REDIS_URL is set but the 'redis' package is not installed; using the local cache only")
+
+        self.hits = 0
+        self.redis_hits = 0
+        self.misses = 0
+        self.sets = 0
+        self.evictions = 0
+        self.errors = 0
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+
+        if self._redis is not None:
+            try:
+                value = await self._redis.get(self.key_prefix + key)
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis cache read failed: {str(e)}")
+                value = None
+            if value is not None:
+                self._store_local(key, value)
+                self.hits += 1
+                self.redis_hits += 1
+                return value
+
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, value: str):
+        self._store_local(key, value)
+        self.sets += 1
+
+        if self._redis is not None:
+            try:
+                await self._redis.set(self.key_prefix + key, value, ex=max(1, int(self.ttl)))
+            except Exception as e:
+                self.errors += 1
+                logger.warning(f"Redis cache write failed: {str(e)}")
+
+    def _store_local(self, key: str, value: str):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def close(self):
+        if self._redis is not None:
+            await self._redis.close()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "ttl": self.ttl,
+            "redis_enabled": self._redis is not None,
+            "hits": self.hits,
+            "redis_hits": self.redis_hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else None,
+            "sets": self.sets,
+            "evictions": self.evictions,
+            "errors": self.errors
+        }
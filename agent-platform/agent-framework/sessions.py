@@ -0,0 +1,274 @@
+"""
+Sessions - Conversation history with token-budgeted windowing, compact storage and stable prompt prefixes
+"""
+
+import asyncio
+import json
+import logging
+import re
+import time
+import weakref
+import zlib
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable, AsyncIterator
+from prompt_builder import PromptBuilder, shrink_value
+from llm_router import LLMRouter
+from tenancy import current_tenant
+from metrics import SESSION_HISTORY_TOKENS, SESSION_COMPACTIONS
+
+logger = logging.getLogger("agent.sessions")
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9._:-]{1,128}$")
+
+Turn = Tuple[str, str]
+
+class Session:
+    """One conversation: a summary of compacted turns plus the recent turns verbatim.
+
+    ``render`` lays the conversation out oldest first and only ever appends,
+    so each request's prompt starts with the previous request's prompt and
+    response. Backends with prefix (KV) caching then only compute the new
+    turn. The prefix changes only when older turns are compacted.
+    """
+
+    def __init__(self, key: str, summary: str = "", turns: Optional[List[Turn]] = None):
+        self.key = key
+        self.summary = summary
+        self.turns: List[Turn] = [tuple(turn) for turn in turns or []]
+        self.added = 0
+
+    def render(self, message: str) -> str:
+        parts = []
+        if self.summary:
+            parts.append(f"Earlier in this conversation (summarized):\n{self.summary}")
+        for prompt, response in self.turns:
+            parts.append(f"User:\n{prompt}\n\nAssistant:\n{response}")
+        parts.append(f"User:\n{message}")
+        return "\n\n".join(parts)
+
+    def add_turn(self, prompt: str, response: str):
+        self.turns.append((prompt, response))
+        self.added += 1
+
+    def encode(self) -> bytes:
+        data = json.dumps({"summary": self.summary, "turns": self.turns}, separators=(",", ":"), ensure_ascii=False)
+        return zlib.compress(data.encode("utf-8"))
+
+    @classmethod
+    def decode(cls, key: str, blob: bytes) -> "Session":
+        data = json.loads(zlib.decompress(blob))
+        return cls(key, data.get("summary", ""), data.get("turns"))
+
+# Set while a request runs inside ``SessionManager.open``; agents read it when calling the LLM
+_current_session: ContextVar[Optional[Session]] = ContextVar("current_session", default=None)
+
+def current_session() -> Optional[Session]:
+    return _current_session.get()
+
+class InMemorySessionStore:
+    """Single-replica store: compressed session records in an LRU map with an idle TTL."""
+
+    def __init__(self, max_sessions: int = 10000, ttl: float = 3600.0):
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._records: "OrderedDict[str, tuple]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._records.get(key)
+        if entry is None:
+            return None
+        expires_at, blob = entry
+        if expires_at <= time.monotonic():
+            del self._records[key]
+            return None
+        self._records.move_to_end(key)
+        return blob
+
+    async def set(self, key: str, blob: bytes):
+        self._records[key] = (time.monotonic() + self.ttl, blob)
+        self._records.move_to_end(key)
+        while len(self._records) > self.max_sessions:
+            self._records.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str) -> bool:
+        return self._records.pop(key, None) is not None
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._records),
+            "max_sessions": self.max_sessions,
+            "bytes": sum(len(blob) for _, blob in self._records.values()),
+            "evictions": self.evictions
+        }
+
+class RedisSessionStore:
+    """Session records shared by every replica, one compressed value per session with an idle TTL."""
+
+    def __init__(self, redis_url: str, key_prefix: str = "agent-session:", ttl: float = 3600.0):
+        import redis.asyncio as redis_asyncio
+        self._redis = redis_asyncio.from_url(redis_url)
+        self.key_prefix = key_prefix
+        self.ttl = ttl
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._redis.get(self.key_prefix + key)
+
+    async def set(self, key: str, blob: bytes):
+        await self._redis.set(self.key_prefix + key, blob, ex=max(1, int(self.ttl)))
+
+    async def delete(self, key: str) -> bool:
+        return bool(await self._redis.delete(self.key_prefix + key))
+
+    async def close(self):
+        await self._redis.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": "redis", "ttl": self.ttl}
+
+Summarizer = Callable[[str, List[Turn]], Awaitable[str]]
+
+async def summarize_turns(summary: str, turns: List[Turn], max_chars: int = 240) -> str:
+    """Extractive summary: the first line of each request and the start of its answer."""
+    lines = summary.splitlines() if summary else []
+    for prompt, response in turns:
+        request = next((line.strip() for line in prompt.splitlines() if line.strip()), "")
+        lines.append(f"- {shrink_value(request, 1, max_chars)} => {shrink_value(' '.join(response.split()), 1, max_chars)}")
+    return "\n".join(lines)
+
+def llm_summarizer(llm_router: LLMRouter, model: Optional[str] = None) -> Summarizer:
+    """Summarize compacted turns with the LLM, falling back to ``summarize_turns`` if it fails."""
+    async def summarize(summary: str, turns: List[Turn]) -> str:
+        conversation = Session("", summary, turns).render("Summarize the conversation above.")
+        payload = {
+            "message": conversation,
+            "model": model or llm_router.default_model,
+            "system_prompt": "Summarize conversations as short bullet points that keep every fact, figure and decision."
+        }
+        try:
+            response = await llm_router.post("/chat", payload, agent_name="session_summary")
+            text = response.json().get("response")
+            if text and isinstance(text, str):
+                return text
+        except Exception as e:
+            # Runs after the turn has succeeded, so a bad reply must not fail the request
+            logger.warning(f"LLM session summary failed, using extractive summary: {str(e)}")
+        return await summarize_turns(summary, turns)
+    return summarize
+
+class SessionManager:
+    """Loads, windows and saves conversation history around agent requests.
+
+    Sessions are keyed by tenant and session id, so tenants cannot read each
+    other's conversations. Requests in the same session run one at a time in
+    this process. Once the history passes ``history_budget`` tokens, the
+    oldest turns are folded into the summary until the history is under half
+    the budget. Compacting in large steps keeps the prompt prefix stable for
+    many turns between compactions.
+    """
+
+    def __init__(
+        self,
+        store=None,
+        prompt_builder: PromptBuilder = None,
+        history_budget: int = 2048,
+        summarizer: Optional[Summarizer] = None
+    ):
+        self.store = store or InMemorySessionStore()
+        self.prompt_builder = prompt_builder or PromptBuilder()
+        self.history_budget = history_budget
+        self.summarizer = summarizer or summarize_turns
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+        self.requests = 0
+        self.new_sessions = 0
+        self.turns = 0
+        self.compactions = 0
+
+    def key(self, session_id: str) -> str:
+        return f"{current_tenant()}:{session_id}"
+
+    def history_tokens(self, session: Session) -> int:
+        estimate = self.prompt_builder.estimate_tokens
+        return estimate(session.summary) + sum(estimate(prompt) + estimate(response) for prompt, response in session.turns)
+
+    async def load(self, session_id: str) -> Optional[Session]:
+        key = self.key(session_id)
+        blob = await self.store.get(key)
+        return Session.decode(key, blob) if blob is not None else None
+
+    @asynccontextmanager
+    async def open(self, session_id: str) -> AsyncIterator[Session]:
+        """Make the session current for the enclosed request, saving any new turns afterwards."""
+        key = self.key(session_id)
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        async with lock:
+            blob = await self.store.get(key)
+            if blob is None:
+                self.new_sessions += 1
+                session = Session(key)
+            else:
+                session = Session.decode(key, blob)
+            self.requests += 1
+            SESSION_HISTORY_TOKENS.observe(self.history_tokens(session))
+
+            token = _current_session.set(session)
+            try:
+                yield session
+            finally:
+                try:
+                    _current_session.reset(token)
+                except ValueError:
+                    # Closed from another context (e.g. an abandoned stream); nothing to restore
+                    pass
+
+            if session.added:
+                self.turns += session.added
+                await self.compact(session)
+                await self.store.set(key, session.encode())
+
+    async def compact(self, session: Session):
+        if self.history_tokens(session) <= self.history_budget:
+            return
+        keep, used = 0, 0
+        estimate = self.prompt_builder.estimate_tokens
+        for prompt, response in reversed(session.turns):
+            used += estimate(prompt) + estimate(response)
+            if used > self.history_budget // 2:
+                break
+            keep += 1
+        folded = session.turns[:len(session.turns) - keep]
+        summary = await self.summarizer(session.summary, folded)
+        # Oldest summary lines go first when the summary outgrows its share of the budget
+        while estimate(summary) > self.history_budget // 4 and "\n" in summary:
+            summary = summary.split("\n", 1)[1]
+        session.summary, _ = self.prompt_builder.truncate_text(summary, self.history_budget // 4)
+        session.turns = session.turns[len(folded):]
+        self.compactions += 1
+        SESSION_COMPACTIONS.inc()
+
+    async def delete(self, session_id: str) -> bool:
+        return await self.store.delete(self.key(session_id))
+
+    async def close(self):
+        await self.store.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "history_budget": self.history_budget,
+            "requests": self.requests,
+            "new_sessions": self.new_sessions,
+            "turns": self.turns,
+            "compactions": self.compactions,
+            "active": len(self._locks),
+            "store": self.store.stats()
+        }
@@ -0,0 +1,61 @@
+"""
+Single Flight - Coalesces concurrent identical calls into one shared execution
+"""
+
+import asyncio
+from typing import Dict, Any, Awaitable, Callable
+
+class SingleFlight:
+    """Run at most one call per key at a time; concurrent callers share its result.
+
+    The shared call runs in its own task and every caller awaits it through
+    ``asyncio.shield``, so a caller that is cancelled (e.g. a disconnected
+    client) only stops waiting. The call itself is cancelled only once every
+    caller has gone away. Exceptions are re-raised to all callers.
+    """
+
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[str, int] = {}
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self._waiters[key] = 0
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        self._waiters[key] += 1
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if self._calls.get(key) is task and self._waiters[key] == 1:
+                # Last caller gone: drop the key first so new callers start afresh
+                del self._calls[key]
+                del self._waiters[key]
+                task.cancel()
+            raise
+        finally:
+            if self._calls.get(key) is task:
+                self._waiters[key] -= 1
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            del self._waiters[key]
+        if not task.cancelled():
+            # Mark the exception as retrieved even when every caller was cancelled
+            task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "followers": self.followers
+        }
@@ -2,47 +2,52 @@
 Task Management Agent - Specializes in project management and scheduling
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from base_agent import BaseAgent
-import json
+from resilience import is_overload
+from metrics import stage
+from tracing import traced
+
+MANAGEMENT_PROMPT = """
+Task Management Request: {task_description}
+Parameters: {parameters}
+
+As a project management expert, provide:
+1. Project breakdown
+2. Task prioritization
+3. Timeline estimation
+4. Resource requirements
+5. Risk assessment
+"""
 from datetime import datetime
 
 class TaskManagementAgent(BaseAgent):
-    def __init__(self, llm_service_url: str):
-        super().__init__("task_management", llm_service_url)
-        self.capabilities = ["project_planning", "task_scheduling", "progress_tracking"]
+    capabilities = ["project_planning", "task_scheduling", "progress_tracking"]
+    
+    def __init__(self, llm_service_url: str, **kwargs):
+        super().__init__("task_management", llm_service_url, **kwargs)
+    
+    def build_prompt(self, task: Dict[str, Any]) -> Tuple[str, str]:
+        return self.render_prompt(MANAGEMENT_PROMPT, task, "You are a senior project manager. Create comprehensive, actionable plans.")
     
+    @traced("task_management.execute")
     async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        task_description = task.get("task_description", "")
-        parameters = task.get("parameters", {})
-        
-        management_prompt = f"""
-        Task Management Request: {task_description}
-        Parameters: {json.dumps(parameters, indent=2)}
-        
-        As a project management expert, provide:
-        1. Project breakdown
-        2. Task prioritization
-        3. Timeline estimation
-        4. Resource requirements
-        5. Risk assessment
-        """
-        
         try:
-            response = await self.chat_with_llm(
-                management_prompt,
-                "You are a senior project manager. Create comprehensive, actionable plans."
-            )
+            with stage("prompt_build"):
+                prompt, system_prompt = self.build_prompt(task)
+            response = await self.chat_with_llm(prompt, system_prompt, use_cache=task.get("use_cache", True))
             
             return {
                 "status": "completed",
                 "agent_type": "task_management",
                 "response": response,
+                "prompt_tokens": self.prompt_tokens(prompt, system_prompt),
                 "capabilities": self.capabilities
             }
         except Exception as e:
             return {
                 "status": "error", 
                 "agent_type": "task_management",
-                "error": str(e)
+                "error": str(e),
+                "overloaded": is_overload(e)
             }
@@ -0,0 +1,241 @@
+"""
+Tenancy - Tenant identity and per-tenant rate limits and concurrency quotas
+"""
+
+import logging
+import math
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar, Token
+from typing import Dict, Any, Optional, Tuple
+from admission import AdmissionRejected
+
+logger = logging.getLogger("agent.tenancy")
+
+DEFAULT_TENANT = "default"
+TENANT_ID = re.compile(r"^[A-Za-z0-9._-]{1,64}$")
+
+# Set per request by the service; tasks spawned for batches and workflows inherit it
+_current_tenant: ContextVar[str] = ContextVar("current_tenant", default=DEFAULT_TENANT)
+
+def set_tenant(tenant: str) -> Token:
+    return _current_tenant.set(tenant)
+
+def reset_tenant(token: Token):
+    _current_tenant.reset(token)
+
+def current_tenant() -> str:
+    return _current_tenant.get()
+
+class TenantPolicy:
+    def __init__(
+        self,
+        weight: float = 1.0,
+        rate: Optional[float] = None,
+        burst: Optional[float] = None,
+        max_concurrency: Optional[int] = None
+    ):
+        self.weight = weight
+        # Requests per second; None means unlimited
+        self.rate = rate
+        self.burst = burst if burst is not None else (max(1.0, rate) if rate else None)
+        self.max_concurrency = max_concurrency
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "weight": self.weight,
+            "rate": self.rate,
+            "burst": self.burst,
+            "max_concurrency": self.max_concurrency
+        }
+
+class TokenBucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, cost: float = 1.0) -> float:
+        """Take ``cost`` tokens and return 0, or return the seconds until they would be available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # A batch costlier than the burst is admitted from a full bucket and leaves it in debt
+        needed = min(cost, self.burst)
+        if self.tokens >= needed:
+            self.tokens -= cost
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+# Same algorithm as TokenBucket, atomically in Redis using the server clock
+_REDIS_TOKEN_BUCKET = """
+local rate = tonumber(ARGV[1])
+local burst = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or burst
+local ts = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+local needed = math.min(cost, burst)
+local wait = 0
+if tokens >= needed then
+    tokens = tokens - cost
+else
+    wait = (needed - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 60)
+return tostring(wait)
+"""
+
+class TenantLimiter:
+    """Per-tenant rate limits and concurrency quotas, in process or shared through Redis."""
+
+    def __init__(
+        self,
+        policies: Optional[Dict[str, TenantPolicy]] = None,
+        default_policy: Optional[TenantPolicy] = None,
+        redis_url: Optional[str] = None,
+        key_prefix: str = "agent-tenant:",
+        max_metric_tenants: int = 100,
+        max_tracked_tenants: int = 10000
+    ):
+        self.policies = dict(policies or {})
+        self.default_policy = default_policy or TenantPolicy()
+        self.key_prefix = key_prefix
+        self.max_metric_tenants = max_metric_tenants
+        self.max_tracked_tenants = max_tracked_tenants
+        self._buckets: Dict[str, TokenBucket] = {}
+        self.in_flight: Counter = Counter()
+        self._labels = set(self.policies)
+        self.redis = None
+        self._bucket_script = None
+
+        if redis_url:
+            try:
+                import redis.asyncio as redis_asyncio
+                self.redis = redis_asyncio.from_url(redis_url)
+                self._bucket_script = self.redis.register_script(_REDIS_TOKEN_BUCKET)
+            except ImportError:
+                logger.warning("redis package not installed; tenant limits are per replica")
+
+        self.admitted: Counter = Counter()
+        self.rejected: Counter = Counter()
+        self.redis_errors = 0
+
+    def policy_for(self, tenant: str) -> TenantPolicy:
+        return self.policies.get(tenant, self.default_policy)
+
+    def weight_for(self, tenant: str) -> float:
+        return self.policy_for(tenant).weight
+
+    def label(self, tenant: str) -> str:
+        # Bound metric label cardinality: configured tenants plus the first few others seen
+        if tenant in self._labels:
+            return tenant
+        if len(self._labels) < self.max_metric_tenants:
+            self._labels.add(tenant)
+            return tenant
+        return "other"
+
+    def _reject(self, reason: str, message: str, retry_after: float):
+        self.rejected[reason] += 1
+        raise AdmissionRejected(message, 429, max(1, math.ceil(retry_after)), reason)
+
+    async def _take_tokens(self, tenant: str, policy: TenantPolicy, cost: float) -> float:
+        if self._bucket_script is not None:
+            try:
+                wait = await self._bucket_script(
+                    keys=[f"{self.key_prefix}bucket:{tenant}"],
+                    args=[policy.rate, policy.burst, cost]
+                )
+                return float(wait)
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis rate limit check failed, using local bucket: {str(e)}")
+
+        bucket = self._buckets.get(tenant)
+        if bucket is None:
+            if len(self._buckets) >= self.max_tracked_tenants:
+                # Full buckets carry no state worth keeping
+                for name in [name for name, idle in self._buckets.items() if idle.take(0) == 0 and idle.tokens >= idle.burst]:
+                    del self._buckets[name]
+            bucket = self._buckets[tenant] = TokenBucket(policy.rate, policy.burst)
+        return bucket.take(cost)
+
+    async def _enter(self, tenant: str, limit: int) -> Tuple[bool, bool]:
+        """Check the concurrency quota; returns ``(allowed, counted_in_redis)``."""
+        if self.redis is not None:
+            try:
+                key = f"{self.key_prefix}inflight:{tenant}"
+                count = await self.redis.incr(key)
+                # Safety net so a crashed replica's slots expire
+                await self.redis.expire(key, 600)
+                if count > limit:
+                    await self.redis.decr(key)
+                    return False, False
+                return True, True
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis concurrency check failed, using local count: {str(e)}")
+        return self.in_flight[tenant] < limit, False
+
+    async def acquire(self, tenant: str, cost: float = 1.0, hold: bool = True) -> bool:
+        """Charge the rate limit and, if ``hold``, take a slot; returns ``counted_in_redis`` for ``release``."""
+        policy = self.policy_for(tenant)
+        counted_in_redis = False
+        if hold and policy.max_concurrency is not None:
+            allowed, counted_in_redis = await self._enter(tenant, policy.max_concurrency)
+            if not allowed:
+                self._reject("concurrency", f"Tenant {tenant} is at its concurrency quota", 1)
+        if hold:
+            # Counted before the rate check awaits, so concurrent acquires see this slot
+            self.in_flight[tenant] += 1
+
+        if policy.rate:
+            try:
+                wait = await self._take_tokens(tenant, policy, cost)
+            except BaseException:
+                if hold:
+                    await self.release(tenant, counted_in_redis)
+                raise
+            if wait > 0:
+                # Give back only the slot this call took, not one held by another request
+                if hold:
+                    await self.release(tenant, counted_in_redis)
+                self._reject("rate_limited", f"Tenant {tenant} exceeded its rate limit", wait)
+
+        self.admitted[tenant if tenant in self.policies else "other"] += 1
+        return counted_in_redis
+
+    async def release(self, tenant: str, counted_in_redis: bool):
+        """Give back a held slot; ``counted_in_redis`` is what ``acquire`` returned for it."""
+        if self.in_flight[tenant] > 0:
+            self.in_flight[tenant] -= 1
+            if not self.in_flight[tenant]:
+                del self.in_flight[tenant]
+        if counted_in_redis:
+            try:
+                await self.redis.decr(f"{self.key_prefix}inflight:{tenant}")
+            except Exception as e:
+                self.redis_errors += 1
+                logger.warning(f"Redis concurrency release failed: {str(e)}")
+
+    async def close(self):
+        if self.redis is not None:
+            await self.redis.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "redis" if self.redis is not None else "memory",
+            "default_policy": self.default_policy.stats(),
+            "policies": {tenant: policy.stats() for tenant, policy in self.policies.items()},
+            "in_flight": dict(self.in_flight),
+            "admitted": dict(self.admitted),
+            "rejected": dict(self.rejected),
+            "redis_errors": self.redis_errors
+        }
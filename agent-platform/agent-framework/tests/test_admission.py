@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from admission import AdaptiveLimiter, AdmissionRejected, FairScheduler, WeightedFairQueue
+
+def test_limit_grows_additively_while_latency_is_steady():
+    limiter = AdaptiveLimiter(initial_limit=4, max_limit=5)
+    for _ in range(4):
+        limiter.in_flight += 1
+        limiter.release(0.1)
+    # About one more slot per window of ``limit`` requests
+    assert limiter.limit == pytest.approx(4.92, abs=0.01)
+    for _ in range(50):
+        limiter.in_flight += 1
+        limiter.release(0.1)
+    assert limiter.limit == 5
+
+def test_latency_rise_and_failures_shrink_the_limit_to_the_floor():
+    limiter = AdaptiveLimiter(initial_limit=10, min_limit=2, tolerance=2.0, backoff=0.5)
+    limiter.in_flight += 1
+    limiter.release(0.1)
+    limiter.in_flight += 1
+    # One slow request lifts the fast average well above twice the baseline
+    limiter.release(5.0)
+    assert limiter.limit == pytest.approx(5.05, abs=0.01)
+    for _ in range(5):
+        limiter.in_flight += 1
+        limiter.release(None, failed=True)
+    assert limiter.limit == 2
+
+def test_release_without_outcome_leaves_the_limit_alone():
+    limiter = AdaptiveLimiter(initial_limit=10)
+    limiter.in_flight += 1
+    limiter.release(None)
+    assert limiter.limit == 10
+
+def test_waiters_get_freed_slots_and_full_or_expired_queues_are_rejected():
+    async def scenario():
+        limiter = AdaptiveLimiter(initial_limit=1, min_limit=1, max_queue=1, queue_timeout=0.05)
+        await limiter.acquire()
+        waiter = asyncio.ensure_future(limiter.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejected) as full:
+            await limiter.acquire()
+        limiter.release(None)
+        await waiter
+        with pytest.raises(AdmissionRejected) as expired:
+            await limiter.acquire()
+        return limiter, full.value, expired.value
+
+    limiter, full, expired = asyncio.run(scenario())
+    assert (full.status_code, full.reason) == (429, "queue_full")
+    assert (expired.status_code, expired.reason) == (503, "queue_timeout")
+    assert limiter.in_flight == 1
+    assert limiter.admitted == 2
+
+def test_fair_queue_serves_tenants_in_proportion_to_weight():
+    queue = WeightedFairQueue({"gold": 3.0, "free": 1.0}.get)
+    # The free tenant's backlog arrives first and is still not served ahead of gold
+    for index in range(8):
+        queue.push("free", f"free-{index}")
+    for index in range(8):
+        queue.push("gold", f"gold-{index}")
+    served = [queue.pop() for _ in range(8)]
+    assert sum(item.startswith("gold") for item in served) == 6
+    assert queue.queued == {"free": 6, "gold": 2}
+
+def test_scheduler_hands_freed_slots_out_by_weight():
+    async def scenario():
+        scheduler = FairScheduler(1, {"gold": 2.0, "free": 1.0}.get)
+        order = []
+
+        async def work(tenant):
+            async with scheduler.slot(tenant):
+                order.append(tenant)
+                await asyncio.sleep(0)
+
+        await asyncio.gather(*(work(tenant) for tenant in ["free"] * 4 + ["gold"] * 4))
+        return scheduler, order
+
+    scheduler, order = asyncio.run(scenario())
+    # The first free request takes the idle slot; queued work then runs about two gold per free
+    assert order[0] == "free"
+    assert order[1:6].count("gold") == 3
+    assert order[-2:] == ["gold", "free"]
+    assert scheduler.stats()["in_flight"] == 0
+
+def test_cancelled_scheduler_waiter_gives_up_its_place():
+    async def scenario():
+        scheduler = FairScheduler(1)
+        async with scheduler.slot("a"):
+            waiter = asyncio.ensure_future(scheduler.slot("b").__aenter__())
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            queued = scheduler.stats()["queued"]
+        return scheduler, queued
+
+    scheduler, queued = asyncio.run(scenario())
+    assert queued == 0
+    assert scheduler.in_flight == 0
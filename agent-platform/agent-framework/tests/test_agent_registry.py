@@ -0,0 +1,15 @@
+
+import agent_registry
+from agent_registry import AgentRegistry, BUILTIN_AGENTS, BUILTIN_CAPABILITIES, load_object
+
+def test_listing_capabilities_imports_no_agent(monkeypatch):
+    def fail(target):
+        raise AssertionError(f"imported {target}")
+
+    monkeypatch.setattr(agent_registry, "load_object", fail)
+    registry = AgentRegistry("http://llm", {**BUILTIN_AGENTS, "legal": "legal_agents:LegalAgent"})
+    assert {name: registry.capabilities(name) for name in registry} == {**BUILTIN_CAPABILITIES, "legal": None}
+
+def test_builtin_capabilities_match_agent_classes():
+    for name, target in BUILTIN_AGENTS.items():
+        assert load_object(target).capabilities == BUILTIN_CAPABILITIES[name]
@@ -0,0 +1,26 @@
+import os
+
+import pytest
+
+from data_engine import DataEngine, DatasetError
+
+@pytest.fixture
+def engine(tmp_path):
+    return DataEngine(data_dir=str(tmp_path))
+
+def test_summarizes_inline_csv(engine):
+    summary = engine.compute_summary({"csv": "region,revenue\nnorth,1\nsouth,3\n"})
+    assert summary["source"] == "inline_csv"
+    assert summary["rows"] == 2
+
+@pytest.mark.parametrize("parameters", [{"csv": ""}, {"rows": 100}])
+def test_invalid_input_raises_dataset_error(engine, parameters):
+    with pytest.raises(DatasetError) as error:
+        engine.compute_summary(parameters)
+    assert error.value.status_code == 400
+
+def test_file_removed_after_lookup_is_not_found(engine, tmp_path, monkeypatch):
+    monkeypatch.setattr(engine, "resolve_path", lambda path: os.path.join(str(tmp_path), "gone.csv"))
+    with pytest.raises(DatasetError) as error:
+        engine.compute_summary({"data_path": "gone.csv"})
+    assert error.value.status_code == 404
@@ -0,0 +1,172 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from execution_history import ExecutionRecorder, SQLiteExecutionStore
+
+def make_entry(tenant="acme", **fields):
+    entry = {
+        "id": uuid.uuid4().hex,
+        "created_at": datetime.now(timezone.utc),
+        "tenant": tenant,
+        "agent_type": "research",
+        "status": "completed",
+        "session_id": None,
+        "task_description": "Summarise weekly revenue",
+        "parameters": {"region": "north"},
+        "response": "Revenue was flat.",
+        "error": None,
+        "prompt_tokens": 12,
+        "response_tokens": 4,
+        "duration_ms": 5.0,
+        "timings": {"llm": 4.2}
+    }
+    entry.update(fields)
+    return entry
+
+class FlakyStore:
+    """Fails the first ``failures`` writes with a connection error, then delegates."""
+
+    def __init__(self, store, failures):
+        self.store = store
+        self.failures = failures
+
+    async def start(self):
+        await self.store.start()
+
+    async def insert_many(self, entries):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("database unavailable")
+        await self.store.insert_many(entries)
+
+    async def query(self, tenant, **filters):
+        return await self.store.query(tenant, **filters)
+
+    async def close(self):
+        await self.store.close()
+
+    def stats(self):
+        return self.store.stats()
+
+@pytest.fixture
+def store(tmp_path):
+    return SQLiteExecutionStore(str(tmp_path / "history.db"))
+
+def test_record_buffers_until_flush(store):
+    async def scenario():
+        recorder = ExecutionRecorder(store, batch_size=2)
+        entries = [make_entry() for _ in range(5)]
+        ids = [recorder.record(entry) for entry in entries]
+        assert recorder.stats()["buffered"] == 5
+        assert await recorder.flush()
+        rows = await recorder.query("acme", limit=10)
+        await store.close()
+        return recorder, ids, rows
+
+    recorder, ids, rows = asyncio.run(scenario())
+    assert sorted(row["id"] for row in rows) == sorted(ids)
+    assert recorder.written == 5
+    assert recorder.flushes == 3
+    assert recorder.stats()["buffered"] == 0
+    assert rows[0]["parameters"] == {"region": "north"}
+
+def test_query_is_tenant_scoped_and_newest_first(store):
+    async def scenario():
+        recorder = ExecutionRecorder(store)
+        now = datetime.now(timezone.utc)
+        older = make_entry(created_at=now - timedelta(minutes=5))
+        newer = make_entry(created_at=now)
+        recorder.record(older)
+        recorder.record(newer)
+        recorder.record(make_entry(tenant="other"))
+        await recorder.flush()
+        rows = await recorder.query("acme")
+        await store.close()
+        return [row["id"] for row in rows], [older["id"], newer["id"]]
+
+    ids, (older, newer) = asyncio.run(scenario())
+    assert ids == [newer, older]
+
+def test_failed_batch_is_requeued_and_retried(store):
+    async def scenario():
+        recorder = ExecutionRecorder(FlakyStore(store, failures=1), flush_interval=0.01)
+        recorder.record(make_entry())
+        assert not await recorder.flush()
+        assert recorder.stats()["buffered"] == 1
+        assert await recorder.flush()
+        rows = await recorder.query("acme")
+        await store.close()
+        return recorder, rows
+
+    recorder, rows = asyncio.run(scenario())
+    assert len(rows) == 1
+    assert recorder.flush_failures == 1
+    assert recorder.written == 1
+    assert recorder.dropped == 0
+
+def test_batch_dropped_after_max_attempts(store):
+    async def scenario():
+        recorder = ExecutionRecorder(FlakyStore(store, failures=2), max_attempts=2)
+        recorder.record(make_entry())
+        assert not await recorder.flush()
+        assert not await recorder.flush()
+        assert await recorder.flush()
+        await store.close()
+        return recorder
+
+    recorder = asyncio.run(scenario())
+    assert recorder.dropped == 1
+    assert recorder.written == 0
+    assert recorder.stats()["buffered"] == 0
+
+def test_full_buffer_drops_newest(store):
+    recorder = ExecutionRecorder(store, max_buffer=2)
+    assert recorder.record(make_entry()) is not None
+    assert recorder.record(make_entry()) is not None
+    assert recorder.record(make_entry()) is None
+    assert recorder.dropped == 1
+
+def test_full_buffer_drops_oldest(store):
+    recorder = ExecutionRecorder(store, max_buffer=2, drop_policy="drop_oldest")
+    first = recorder.record(make_entry())
+    recorder.record(make_entry())
+    recorder.record(make_entry())
+    assert first not in [entry["id"] for entry in recorder._buffer]
+    assert recorder.dropped == 1
+
+def test_nul_characters_are_stripped(store):
+    async def scenario():
+        recorder = ExecutionRecorder(store)
+        entry = make_entry(task_description="bad\x00input", parameters={"text": "a\x00b"})
+        recorder.record(entry)
+        await recorder.flush()
+        row = (await recorder.query("acme"))[0]
+        await store.close()
+        return row
+
+    row = asyncio.run(scenario())
+    assert row["task_description"] == "badinput"
+    assert row["parameters"] == {"text": "ab"}
+
+def test_rejected_entry_is_dropped_alone(store):
+    async def scenario():
+        recorder = ExecutionRecorder(store)
+        good = [make_entry() for _ in range(3)]
+        # NOT NULL violation fails the whole batch insert
+        recorder.record(good[0])
+        recorder.record(make_entry(agent_type=None))
+        recorder.record(good[1])
+        recorder.record(good[2])
+        assert await recorder.flush()
+        rows = await recorder.query("acme")
+        await store.close()
+        return recorder, rows, good
+
+    recorder, rows, good = asyncio.run(scenario())
+    assert sorted(row["id"] for row in rows) == sorted(entry["id"] for entry in good)
+    assert recorder.written == 3
+    assert recorder.dropped == 1
+    assert recorder.flush_failures == 0
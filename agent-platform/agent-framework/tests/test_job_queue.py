@@ -0,0 +1,39 @@
+import asyncio
+
+from job_queue import JobWorkerPool, InMemoryJobStore
+from tenancy import current_tenant, set_tenant, reset_tenant
+
+async def run_job(pool: JobWorkerPool, callback_url=None, tenant="default"):
+    await pool.start()
+    token = set_tenant(tenant)
+    try:
+        job = await pool.submit("research", {"description": "x"}, callback_url)
+    finally:
+        reset_tenant(token)
+    for _ in range(100):
+        record = await pool.get(job["id"])
+        if record["status"] in ("completed", "failed") and (not callback_url or "callback_status" in record):
+            break
+        await asyncio.sleep(0.01)
+    await pool.stop()
+    return record
+
+def test_job_runs_under_submitting_tenant():
+    seen = []
+
+    async def handler(agent_type, task):
+        seen.append(current_tenant())
+        return {"status": "success"}
+
+    record = asyncio.run(run_job(JobWorkerPool(InMemoryJobStore(), handler, workers=1), tenant="acme"))
+    assert record["tenant"] == "acme"
+    assert record["status"] == "completed"
+    assert seen == ["acme"]
+
+def test_callback_to_private_address_is_refused():
+    async def handler(agent_type, task):
+        return {"status": "success"}
+
+    pool = JobWorkerPool(InMemoryJobStore(), handler, workers=1)
+    record = asyncio.run(run_job(pool, "http://169.254.169.254/latest/meta-data"))
+    assert record["callback_status"].startswith("error: Refusing to fetch 169.254.169.254")
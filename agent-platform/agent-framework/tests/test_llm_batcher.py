@@ -0,0 +1,101 @@
+import asyncio
+
+from llm_batcher import MicroBatcher
+from resilience import LLMError
+
+class FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+class FakeRouter:
+    """Answers each prompt with its own text after ``delay``; records every call."""
+
+    def __init__(self, delay=0.02, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.calls = []
+
+    async def post(self, path, payload, agent_name=None):
+        self.calls.append((path, agent_name, payload))
+        await asyncio.sleep(self.delay)
+        if path == "/chat":
+            return FakeResponse({"response": payload["prompt"]})
+        return FakeResponse({"responses": [
+            {"error": "bad prompt"} if item["prompt"] in self.failing else {"response": item["prompt"]}
+            for item in payload["requests"]
+        ]})
+
+def batch_calls(router):
+    return [call for call in router.calls if call[0] == "/chat/batch"]
+
+def test_batched_results_reach_their_callers():
+    async def scenario():
+        router = FakeRouter(failing={"p3"})
+        batcher = MicroBatcher(router, max_batch_size=8, max_wait_ms=5)
+        results = await asyncio.gather(
+            *(batcher.chat({"model": "m", "prompt": f"p{i}"}, agent_name="research") for i in range(6)),
+            return_exceptions=True
+        )
+        return router, batcher, results
+
+    router, batcher, results = asyncio.run(scenario())
+    # The first prompt goes straight to /chat; the rest wait for it and share a batch
+    assert batcher.direct == 1
+    assert len(batch_calls(router)) == 1
+    for i, result in enumerate(results):
+        if i == 3:
+            assert isinstance(result, LLMError)
+        else:
+            assert result == {"response": f"p{i}"}
+
+def test_batches_are_grouped_by_agent():
+    async def scenario():
+        router = FakeRouter()
+        batcher = MicroBatcher(router, max_batch_size=8, max_wait_ms=5)
+        calls = []
+        for agent in ("research", "data_analysis"):
+            calls += [batcher.chat({"model": "m", "prompt": f"{agent}-{i}"}, agent_name=agent) for i in range(3)]
+        results = await asyncio.gather(*calls)
+        return router, results
+
+    router, results = asyncio.run(scenario())
+    assert [result["response"] for result in results] == [
+        f"{agent}-{i}" for agent in ("research", "data_analysis") for i in range(3)
+    ]
+    for _, agent_name, payload in batch_calls(router):
+        assert all(item["prompt"].startswith(agent_name) for item in payload["requests"])
+    assert sorted(agent for _, agent, _ in batch_calls(router)) == ["data_analysis", "research"]
+
+def test_close_sends_queued_prompts():
+    async def scenario():
+        router = FakeRouter()
+        batcher = MicroBatcher(router, max_batch_size=8, max_wait_ms=10_000)
+        leader = asyncio.ensure_future(batcher.chat({"model": "m", "prompt": "a"}))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(batcher.chat({"model": "m", "prompt": p})) for p in ("b", "c")]
+        await asyncio.sleep(0)
+        await batcher.close()
+        assert all(future.done() for future in followers)
+        return await asyncio.gather(leader, *followers), batcher
+
+    results, batcher = asyncio.run(scenario())
+    assert [result["response"] for result in results] == ["a", "b", "c"]
+    assert batcher.stats()["queued"] == 0
+
+def test_close_cancels_stuck_batches():
+    async def scenario():
+        router = FakeRouter(delay=10)
+        batcher = MicroBatcher(router, max_batch_size=2, max_wait_ms=10_000)
+        leader = asyncio.ensure_future(batcher.chat({"model": "m", "prompt": "a"}))
+        await asyncio.sleep(0)
+        followers = [asyncio.ensure_future(batcher.chat({"model": "m", "prompt": p})) for p in ("b", "c")]
+        await asyncio.sleep(0)
+        await batcher.close(timeout=0.05)
+        leader.cancel()
+        return await asyncio.gather(*followers, return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, LLMError) for result in results)
@@ -0,0 +1,32 @@
+import asyncio
+
+import pytest
+
+from llm_router import LLMRouter
+
+class FailingClient:
+    def __init__(self, error):
+        self.error = error
+
+    async def post(self, url, json, agent_name=None):
+        raise self.error
+
+def half_open_router(error) -> LLMRouter:
+    router = LLMRouter(["http://llm"], FailingClient(error), failure_threshold=1, ejection_time=0)
+    breaker = router.endpoints[0].breaker
+    breaker.record_failure()
+    assert breaker.state == "open"
+    return router
+
+@pytest.mark.parametrize("error", [ValueError("bad payload"), asyncio.CancelledError()])
+def test_unexpected_error_frees_half_open_probe(error):
+    router = half_open_router(error)
+    breaker = router.endpoints[0].breaker
+
+    with pytest.raises(type(error)):
+        asyncio.run(router._attempt("/chat", {}, None, set()))
+
+    assert breaker.state == "half_open"
+    assert not breaker.probe_in_flight
+    assert breaker.available()
+    assert router.endpoints[0].outstanding == 0
@@ -0,0 +1,40 @@
+from prompt_builder import PromptBuilder, shrink_value
+
+TEMPLATE = """
+Task: {task_description}
+Parameters: {parameters}
+"""
+
+def test_small_prompts_are_rendered_untouched():
+    builder = PromptBuilder()
+    prompt = builder.build("research", TEMPLATE, {"task_description": "Summarise", "parameters": {"region": "north"}})
+    assert prompt == 'Task: Summarise\nParameters: {"region":"north"}\n'
+    assert builder.truncated == 0
+
+def test_oversized_parameters_are_sampled_to_fit_the_budget():
+    builder = PromptBuilder(default_budget=256)
+    rows = [{"id": index, "note": "x" * 40} for index in range(500)]
+    prompt = builder.build("data_analysis", TEMPLATE, {"task_description": "Analyse", "parameters": {"rows": rows}})
+    assert builder.estimate_tokens(prompt) <= 256
+    assert "items omitted (evenly sampled)" in prompt
+    assert '"id":0' in prompt and '"id":499' in prompt
+    assert builder.truncated == 1
+
+def test_long_description_is_capped_at_half_the_budget():
+    builder = PromptBuilder(default_budget=200)
+    prompt = builder.build("research", TEMPLATE, {"task_description": "word " * 1000, "parameters": {}})
+    description = prompt.split("\nParameters:")[0]
+    assert builder.estimate_tokens(description) <= 100 + 10
+    assert "more chars omitted" in description
+
+def test_agent_budget_overrides_default():
+    builder = PromptBuilder(default_budget=4096, agent_budgets={"research": 128})
+    task = {"task_description": "Summarise", "parameters": {"text": "y" * 10_000}}
+    assert builder.estimate_tokens(builder.build("research", TEMPLATE, task)) <= 128
+    assert builder.estimate_tokens(builder.build("other", TEMPLATE, task)) > 2000
+
+def test_shrink_value_cuts_text_at_line_boundaries():
+    text = "\n".join(f"row {index}" for index in range(100))
+    shrunk = shrink_value(text, 10, 50)
+    assert shrunk.endswith("more lines omitted]")
+    assert all(line.startswith("row ") for line in shrunk.split("...")[0].splitlines())
@@ -0,0 +1,16 @@
+import pytest
+
+from resilience import LLMError, is_overload
+
+@pytest.mark.parametrize("error, expected", [
+    (LLMError("timed out", "timeout", True), True),
+    (LLMError("refused", "connection", True), True),
+    (LLMError("open", "circuit_open"), True),
+    (LLMError("busy", "http", True, status_code=503), True),
+    (LLMError("throttled", "http", True, status_code=429), True),
+    (LLMError("bad request", "http", status_code=400), False),
+    (ValueError("rows must be a list of records"), False),
+    (KeyError("Unknown agent type"), False)
+])
+def test_only_backend_failures_count_as_overload(error, expected):
+    assert is_overload(error) is expected
@@ -0,0 +1,53 @@
+import asyncio
+
+from prompt_builder import PromptBuilder
+from sessions import SessionManager, llm_summarizer, summarize_turns, current_session
+
+class BrokenReply:
+    def json(self):
+        raise ValueError("not JSON")
+
+class FakeRouter:
+    default_model = "test"
+
+    async def post(self, path, payload, agent_name=None):
+        return BrokenReply()
+
+def add_turns(manager, session_id, count, size=200):
+    async def scenario():
+        for turn in range(count):
+            async with manager.open(session_id):
+                current_session().add_turn(f"question {turn}", "x" * size)
+        return await manager.load(session_id)
+    return asyncio.run(scenario())
+
+def test_turns_are_saved_and_reloaded():
+    manager = SessionManager(history_budget=10000)
+    session = add_turns(manager, "s1", 2)
+    assert [prompt for prompt, _ in session.turns] == ["question 0", "question 1"]
+    assert manager.new_sessions == 1
+    assert manager.compactions == 0
+
+def test_history_over_budget_is_compacted_into_summary():
+    manager = SessionManager(prompt_builder=PromptBuilder(), history_budget=200)
+    session = add_turns(manager, "s1", 10)
+    assert manager.compactions >= 1
+    assert "question" in session.summary
+    assert manager.history_tokens(session) <= manager.history_budget
+    assert session.turns[-1][0] == "question 9"
+
+def test_sessions_are_keyed_by_tenant():
+    manager = SessionManager()
+    assert manager.key("s1") == "default:s1"
+
+def test_llm_summarizer_falls_back_on_malformed_reply():
+    turns = [("What was revenue?", "Flat at 1.2M.")]
+    summary = asyncio.run(llm_summarizer(FakeRouter())("", turns))
+    assert summary == asyncio.run(summarize_turns("", turns))
+
+def test_compaction_failure_does_not_fail_the_turn():
+    manager = SessionManager(history_budget=50, summarizer=llm_summarizer(FakeRouter()))
+    session = add_turns(manager, "s1", 5)
+    assert manager.turns == 5
+    assert manager.compactions >= 1
+    assert "question 4" in session.summary
@@ -0,0 +1,77 @@
+import asyncio
+
+from singleflight import SingleFlight
+
+def test_concurrent_callers_share_one_call():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return {"answer": 42}
+
+    async def scenario():
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert results == [{"answer": 42}] * 5
+    assert flight.stats() == {"in_flight": 0, "leaders": 1, "followers": 4}
+
+def test_cancelling_the_leader_does_not_cancel_followers():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def scenario():
+        flight = SingleFlight()
+        leader = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(flight.do("k", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        return leader, result
+
+    leader, result = asyncio.run(scenario())
+    assert leader.cancelled()
+    assert result == "done"
+
+def test_call_is_cancelled_when_every_caller_leaves():
+    started = []
+    finished = []
+
+    async def work():
+        started.append(1)
+        await asyncio.sleep(1)
+        finished.append(1)
+
+    async def scenario():
+        flight = SingleFlight()
+        callers = [asyncio.ensure_future(flight.do("k", work)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        # The key is free again, so a new caller starts a fresh call
+        await asyncio.wait_for(flight.do("k", lambda: asyncio.sleep(0, "again")), 1)
+        return flight
+
+    flight = asyncio.run(scenario())
+    assert started == [1] and finished == []
+    assert flight.leaders == 2
+
+def test_errors_reach_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("backend down")
+
+    async def scenario():
+        flight = SingleFlight()
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) and str(result) == "backend down" for result in results)
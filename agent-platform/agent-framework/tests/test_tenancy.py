@@ -0,0 +1,89 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionRejected
+from tenancy import TenantLimiter, TenantPolicy, TokenBucket
+
+class FakeRedis:
+    def __init__(self, fail_incr=False):
+        self.fail_incr = fail_incr
+        self.values = {}
+
+    async def incr(self, key):
+        if self.fail_incr:
+            raise ConnectionError("redis down")
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    async def decr(self, key):
+        self.values[key] = self.values.get(key, 0) - 1
+        return self.values[key]
+
+    async def expire(self, key, seconds):
+        pass
+
+def test_token_bucket_allows_burst_then_reports_wait():
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.take() == 0
+    assert bucket.take() == 0
+    assert bucket.take() == pytest.approx(0.5, abs=0.01)
+
+def test_token_bucket_refills_over_time_up_to_burst():
+    bucket = TokenBucket(rate=2, burst=2)
+    bucket.take()
+    bucket.take()
+    bucket.updated -= 10
+    assert bucket.take() == 0
+    assert bucket.tokens == pytest.approx(1, abs=0.01)
+
+def test_token_bucket_admits_oversized_cost_into_debt():
+    bucket = TokenBucket(rate=2, burst=2)
+    assert bucket.take(5) == 0
+    # Three tokens in debt plus one more for the next request, at two per second
+    assert bucket.take() == pytest.approx(2.0, abs=0.01)
+
+def redis_limiter(redis, **policy) -> TenantLimiter:
+    limiter = TenantLimiter({"t": TenantPolicy(**policy)})
+    limiter.redis = redis
+    return limiter
+
+def test_rate_limited_acquire_keeps_other_requests_slots():
+    async def scenario():
+        limiter = TenantLimiter({"t": TenantPolicy(rate=1, burst=1, max_concurrency=5)})
+        await limiter.acquire("t")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await limiter.acquire("t")
+        return limiter, rejected.value
+
+    limiter, rejected = asyncio.run(scenario())
+    assert rejected.reason == "rate_limited"
+    assert dict(limiter.in_flight) == {"t": 1}
+
+def test_redis_slot_released_in_redis():
+    async def scenario():
+        redis = FakeRedis()
+        limiter = redis_limiter(redis, max_concurrency=2)
+        counted = await limiter.acquire("t")
+        assert counted
+        assert redis.values["agent-tenant:inflight:t"] == 1
+        await limiter.release("t", counted)
+        return limiter, redis
+
+    limiter, redis = asyncio.run(scenario())
+    assert redis.values["agent-tenant:inflight:t"] == 0
+    assert not limiter.in_flight
+
+def test_local_fallback_slot_does_not_decrement_redis():
+    async def scenario():
+        redis = FakeRedis(fail_incr=True)
+        limiter = redis_limiter(redis, max_concurrency=2)
+        counted = await limiter.acquire("t")
+        assert not counted
+        await limiter.release("t", counted)
+        return limiter, redis
+
+    limiter, redis = asyncio.run(scenario())
+    assert redis.values == {}
+    assert limiter.redis_errors == 1
+    assert not limiter.in_flight
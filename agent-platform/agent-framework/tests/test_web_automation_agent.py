@@ -0,0 +1,29 @@
+import asyncio
+
+import pytest
+
+from web_automation_agent import WebAutomationAgent
+
+class FakeFetcher:
+    def __init__(self):
+        self.fetched = []
+
+    async def fetch_many(self, urls):
+        self.fetched.append(urls)
+        return [{"url": url, "status": 200, "title": None, "text": "page"} for url in urls]
+
+def make_agent():
+    return WebAutomationAgent("http://llm.test", web_fetcher=FakeFetcher())
+
+def test_single_url_string_is_fetched_whole():
+    agent = make_agent()
+    task = asyncio.run(agent.prepare_task({"parameters": {"urls": "https://example.com/a"}}))
+    assert agent.web_fetcher.fetched == [["https://example.com/a"]]
+    assert [page["url"] for page in task["parameters"]["pages"]] == ["https://example.com/a"]
+
+@pytest.mark.parametrize("urls", [{"url": "https://example.com"}, ["https://example.com", 3], 42])
+def test_urls_must_be_strings(urls):
+    agent = make_agent()
+    with pytest.raises(ValueError):
+        asyncio.run(agent.prepare_task({"parameters": {"urls": urls}}))
+    assert agent.web_fetcher.fetched == []
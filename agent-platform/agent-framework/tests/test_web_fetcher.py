@@ -0,0 +1,192 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import web_fetcher
+from web_fetcher import WebFetcher, PublicAddressTransport, resolve_public_address
+
+PUBLIC_IP = "93.184.216.34"
+
+def make_fetcher(handler, tmp_path=None, **kwargs) -> WebFetcher:
+    kwargs.setdefault("per_host_delay", 0)
+    fetcher = WebFetcher(cache_dir=str(tmp_path) if tmp_path else None, **kwargs)
+    fetcher._client = httpx.AsyncClient(
+        transport=PublicAddressTransport(httpx.MockTransport(handler)),
+        follow_redirects=False
+    )
+    return fetcher
+
+def site(pages, robots="User-agent: *\nAllow: /\n", requests=None):
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requests is not None:
+            requests.append(request)
+        if request.url.path == "/robots.txt":
+            return robots(request) if callable(robots) else httpx.Response(200, text=robots)
+        page = pages.get(request.url.path)
+        if page is None:
+            return httpx.Response(404)
+        return page(request) if callable(page) else page
+    return handler
+
+@pytest.mark.parametrize("address", ["127.0.0.1", "10.1.2.3", "192.168.0.1", "169.254.169.254", "::1", "0.0.0.0", "fc00::1"])
+def test_check_address_refuses_non_public_addresses(address):
+    with pytest.raises(ValueError):
+        asyncio.run(WebFetcher(cache_dir=None)._check_address(address))
+
+def test_check_address_refuses_names_resolving_to_loopback():
+    with pytest.raises(ValueError):
+        asyncio.run(WebFetcher(cache_dir=None)._check_address("localhost"))
+
+def test_check_address_allows_public_addresses_and_can_be_disabled():
+    asyncio.run(WebFetcher(cache_dir=None)._check_address(PUBLIC_IP))
+    asyncio.run(WebFetcher(cache_dir=None, block_private_networks=False)._check_address("127.0.0.1"))
+
+def test_transport_connects_to_the_checked_address(monkeypatch):
+    async def resolve(host):
+        return PUBLIC_IP
+    monkeypatch.setattr(web_fetcher, "resolve_public_address", resolve)
+    seen = []
+
+    def handler(request):
+        seen.append(request)
+        return httpx.Response(200, text="ok")
+
+    async def run():
+        async with httpx.AsyncClient(transport=PublicAddressTransport(httpx.MockTransport(handler))) as client:
+            return await client.get("https://example.test/page")
+
+    response = asyncio.run(run())
+    assert seen[0].url.host == PUBLIC_IP
+    assert seen[0].headers["host"] == "example.test"
+    assert seen[0].extensions["sni_hostname"] == "example.test"
+    assert response.url.host == "example.test"
+
+def test_redirect_to_private_address_is_refused():
+    requests = []
+    handler = site({"/start": httpx.Response(302, headers={"location": "http://169.254.169.254/latest/meta-data"})}, requests=requests)
+    page = asyncio.run(make_fetcher(handler).fetch(f"http://{PUBLIC_IP}/start"))
+    assert page["status"] is None
+    assert "non-public" in page["error"]
+    assert all(request.url.host == PUBLIC_IP for request in requests)
+
+def test_redirects_are_followed_and_each_hop_checked_against_robots():
+    handler = site(
+        {
+            "/old": httpx.Response(301, headers={"location": "/new"}),
+            "/new": httpx.Response(200, html="<p>moved here</p>"),
+            "/sneaky": httpx.Response(302, headers={"location": "/private/data"})
+        },
+        robots="User-agent: *\nDisallow: /private\n"
+    )
+    fetcher = make_fetcher(handler)
+    page = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/old"))
+    assert page["url"] == f"http://{PUBLIC_IP}/new"
+    assert page["text"] == "moved here"
+    assert fetcher.redirects == 1
+
+    page = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/sneaky"))
+    assert page["error"] == "Disallowed by robots.txt"
+
+def test_redirect_loops_stop_at_the_hop_limit():
+    handler = site({"/loop": httpx.Response(302, headers={"location": "/loop"})})
+    page = asyncio.run(make_fetcher(handler, max_redirects=3).fetch(f"http://{PUBLIC_IP}/loop"))
+    assert page["error"] == "More than 3 redirects"
+
+def test_robots_disallow_blocks_without_fetching_the_page():
+    requests = []
+    handler = site({"/admin": httpx.Response(200, text="secret")}, robots="User-agent: *\nDisallow: /admin\n", requests=requests)
+    fetcher = make_fetcher(handler)
+    page = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/admin"))
+    assert page["error"] == "Disallowed by robots.txt"
+    assert fetcher.robots_blocked == 1
+    assert [request.url.path for request in requests] == ["/robots.txt"]
+
+def test_robots_server_error_disallows_everything_but_404_allows():
+    page = asyncio.run(make_fetcher(site({"/": httpx.Response(200, text="x")}, robots=lambda r: httpx.Response(503))).fetch(f"http://{PUBLIC_IP}/"))
+    assert page["error"] == "Disallowed by robots.txt"
+    page = asyncio.run(make_fetcher(site({"/": httpx.Response(200, text="x")}, robots=lambda r: httpx.Response(404))).fetch(f"http://{PUBLIC_IP}/"))
+    assert page["text"] == "x"
+
+def test_crawl_delay_is_capped():
+    fetcher = make_fetcher(site({}, robots="User-agent: *\nCrawl-delay: 86400\n"), max_crawl_delay=10)
+    asyncio.run(fetcher._robots(f"http://{PUBLIC_IP}"))
+    assert fetcher._hosts[f"http://{PUBLIC_IP}"].delay == 10
+
+def test_page_errors_are_reported_not_raised():
+    page = asyncio.run(make_fetcher(site({"/down": httpx.Response(500)})).fetch(f"http://{PUBLIC_IP}/down"))
+    assert page == {"url": f"http://{PUBLIC_IP}/down", "status": 500, "error": "HTTP 500"}
+
+def test_stale_cache_entries_are_revalidated_with_etag(tmp_path):
+    served = []
+
+    def page(request):
+        served.append(request.headers.get("if-none-match"))
+        if request.headers.get("if-none-match") == '"v1"':
+            return httpx.Response(304)
+        return httpx.Response(200, html="<title>T</title><p>body</p>", headers={"etag": '"v1"'})
+
+    fetcher = make_fetcher(site({"/doc": page}), tmp_path, fresh_ttl=0)
+    first = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/doc"))
+    second = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/doc"))
+    assert served == [None, '"v1"']
+    assert first["cached"] is False and second["cached"] is True
+    assert second["text"] == "body" and second["title"] == "T"
+    assert fetcher.revalidated == 1
+
+def test_fresh_cache_entries_skip_the_request(tmp_path):
+    requests = []
+    fetcher = make_fetcher(site({"/doc": httpx.Response(200, text="hello")}, requests=requests), tmp_path, fresh_ttl=300)
+    asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/doc"))
+    page = asyncio.run(fetcher.fetch(f"http://{PUBLIC_IP}/doc"))
+    assert page["cached"] is True
+    assert [request.url.path for request in requests].count("/doc") == 1
+
+def test_idle_hosts_are_evicted():
+    async def run():
+        fetcher = WebFetcher(cache_dir=None, max_hosts=3)
+        for index in range(10):
+            fetcher._host(f"http://host{index}.test")
+        return list(fetcher._hosts)
+
+    assert asyncio.run(run()) == ["http://host7.test", "http://host8.test", "http://host9.test"]
+
+def test_robots_fetches_share_the_request_limits():
+    active = []
+    peak = []
+
+    async def handler(request):
+        active.append(request)
+        peak.append(len(active))
+        await asyncio.sleep(0.01)
+        active.remove(request)
+        if request.url.path == "/robots.txt":
+            return httpx.Response(404)
+        return httpx.Response(200, text="x")
+
+    fetcher = make_fetcher(handler, max_concurrency=1)
+    urls = [f"http://{PUBLIC_IP}:{8000 + index}/" for index in range(4)]
+    pages = asyncio.run(fetcher.fetch_many(urls))
+    assert [page["text"] for page in pages] == ["x"] * 4
+    assert max(peak) == 1
+    assert fetcher.requests == 8
+
+def test_cache_prunes_expired_and_oldest_entries(tmp_path):
+    fetcher = WebFetcher(cache_dir=str(tmp_path), cache_max_entries=3, cache_max_age=3600)
+    now = time.time()
+    for index in range(3):
+        fetcher._cache_store(f"http://example.test/{index}", {"url": str(index), "fetched_at": now})
+        os.utime(fetcher._cache_path(f"http://example.test/{index}"), (now - 10 + index, now - 10 + index))
+    expired = fetcher._cache_path("http://example.test/0")
+    os.utime(expired, (now - 7200, now - 7200))
+
+    fetcher._cache_store("http://example.test/3", {"url": "3", "fetched_at": now})
+    fetcher._cache_store("http://example.test/4", {"url": "4", "fetched_at": now})
+    fetcher._cache_prune()
+    names = sorted(os.listdir(tmp_path))
+    assert len(names) == 3
+    assert not os.path.exists(expired)
+    assert not os.path.exists(fetcher._cache_path("http://example.test/1"))
+    assert fetcher.cache_evictions == 2
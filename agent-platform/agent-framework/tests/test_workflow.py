@@ -0,0 +1,81 @@
+import asyncio
+
+import pytest
+
+from agent_orchestrator import AgentOrchestrator
+from tenancy import set_tenant, reset_tenant
+from workflow import WorkflowEngine, WorkflowError
+
+class FakeOrchestrator:
+    agents = {"research", "writer"}
+    _request_key = staticmethod(AgentOrchestrator._request_key)
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.calls = []
+
+    async def _execute_limited(self, index, item, mode="batch"):
+        task = item["task"]
+        self.calls.append((task["task_description"], task["use_cache"]))
+        if task["task_description"] in self.fail:
+            return index, {"status": "error", "error": "boom"}
+        return index, {"status": "completed", "response": f"{task['task_description']} #{len(self.calls)}"}
+
+def step(step_id, depends_on=(), agent_type="research"):
+    return {"id": step_id, "agent_type": agent_type, "task_description": step_id, "depends_on": list(depends_on)}
+
+def run(coroutine, tenant="acme"):
+    async def scenario():
+        token = set_tenant(tenant)
+        try:
+            return await coroutine
+        finally:
+            reset_tenant(token)
+    return asyncio.run(scenario())
+
+def test_cycle_is_rejected():
+    engine = WorkflowEngine(FakeOrchestrator())
+    with pytest.raises(WorkflowError, match="cycle"):
+        run(engine.run([step("a", ["b"]), step("b", ["a"])]))
+
+def test_dependents_of_failed_step_are_skipped():
+    orchestrator = FakeOrchestrator(fail={"a"})
+    record = run(WorkflowEngine(orchestrator).run([step("a"), step("b", ["a"]), step("c")]))
+    assert record["status"] == "failed"
+    assert record["results"]["b"]["status"] == "skipped"
+    assert record["results"]["c"]["status"] == "completed"
+    assert [call[0] for call in orchestrator.calls] == ["a", "c"]
+
+def test_dependency_output_is_passed_as_input():
+    orchestrator = FakeOrchestrator()
+    seen = []
+    execute = orchestrator._execute_limited
+
+    async def spy(index, item, mode="batch"):
+        seen.append(item["task"]["parameters"])
+        return await execute(index, item, mode)
+
+    orchestrator._execute_limited = spy
+    run(WorkflowEngine(orchestrator).run([step("a"), step("b", ["a"])]))
+    assert seen[1]["inputs"] == {"a": {"response": "a #1"}}
+
+def test_forced_rerun_bypasses_step_and_response_caches():
+    orchestrator = FakeOrchestrator()
+    engine = WorkflowEngine(orchestrator)
+    record = run(engine.run([step("a"), step("b", ["a"])]))
+    first = record["results"]["a"]["response"]
+
+    run(engine.rerun(record["id"], ["a"]))
+    assert record["results"]["a"]["response"] != first
+    assert orchestrator.calls[2] == ("a", False)
+    assert record["results"]["b"]["status"] == "completed"
+
+def test_step_cache_is_per_tenant():
+    orchestrator = FakeOrchestrator()
+    engine = WorkflowEngine(orchestrator)
+    run(engine.run([step("a")]), tenant="acme")
+    repeat = run(engine.run([step("a")]), tenant="acme")
+    other = run(engine.run([step("a")]), tenant="globex")
+    assert repeat["results"]["a"].get("cached") is True
+    assert "cached" not in other["results"]["a"]
+    assert len(orchestrator.calls) == 2
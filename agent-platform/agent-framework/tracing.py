@@ -0,0 +1,190 @@
+"""
+Tracing - Optional OpenTelemetry spans with sampling and W3C trace-context propagation
+"""
+
+import functools
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Iterator
+
+logger = logging.getLogger("agent.tracing")
+
+try:
+    from opentelemetry import trace, propagate
+    from opentelemetry.trace import SpanKind, Status, StatusCode
+    CLIENT = SpanKind.CLIENT
+except ImportError:
+    trace = None
+    CLIENT = None
+
+# Set by ``setup_tracing``; while None every helper below is a no-op
+_tracer = None
+_provider = None
+
+EXPORTERS = ("none", "console", "file", "otlp")
+
+def setup_tracing(
+    service_name: str = "agent-service",
+    exporter: str = "none",
+    sample_ratio: float = 0.05,
+    file_path: str = "/tmp/agent-traces.jsonl"
+) -> bool:
+    """Install a tracer provider; returns whether tracing is active.
+
+    Sampling is parent-based: a request that arrives with a sampled
+    ``traceparent`` is always traced, others are traced with probability
+    ``sample_ratio``. Spans are exported in the background in batches.
+    ``file`` writes one JSON span per line, for local collectors and tests.
+    """
+    global _tracer, _provider
+    if exporter not in EXPORTERS:
+        raise ValueError(f"Unknown trace exporter {exporter!r}; expected one of {', '.join(EXPORTERS)}")
+    if exporter == "none":
+        return False
+    if trace is None:
+        logger.warning("Tracing requested but the 'opentelemetry-sdk' package is not installed; tracing is off")
+        return False
+
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+
+    if exporter == "otlp":
+        try:
+            # Endpoint and headers come from the standard OTEL_EXPORTER_OTLP_* variables
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            logger.warning("TRACE_EXPORTER=otlp needs 'opentelemetry-exporter-otlp-proto-http'; tracing is off")
+            return False
+        span_exporter = OTLPSpanExporter()
+    elif exporter == "file":
+        span_exporter = ConsoleSpanExporter(
+            out=open(file_path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + "\n"
+        )
+    else:
+        span_exporter = ConsoleSpanExporter()
+
+    _provider = TracerProvider(
+        resource=Resource.create({"service.name": service_name}),
+        sampler=ParentBased(TraceIdRatioBased(sample_ratio))
+    )
+    _provider.add_span_processor(BatchSpanProcessor(span_exporter))
+    _tracer = _provider.get_tracer("agent-platform")
+    logger.info(f"Tracing to {exporter} with sample ratio {sample_ratio}")
+    return True
+
+def shutdown_tracing():
+    global _tracer, _provider
+    if _provider is not None:
+        # Flushes spans still waiting in the batch processor
+        _provider.shutdown()
+    _tracer = _provider = None
+
+@contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind=None) -> Iterator[Any]:
+    """Run a block as a child span of the current one; exceptions mark the span as failed."""
+    if _tracer is None:
+        yield None
+        return
+    with _tracer.start_as_current_span(
+        name,
+        kind=kind if kind is not None else SpanKind.INTERNAL,
+        attributes={key: value for key, value in (attributes or {}).items() if value is not None}
+    ) as current:
+        yield current
+
+def traced(name: str):
+    """Decorator form of ``span`` for coroutine functions.
+
+    Agents report failures as ``{"status": "error"}`` results rather than
+    exceptions, so such results also mark the span as failed.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            with span(name) as current:
+                result = await func(*args, **kwargs)
+                if current is not None and isinstance(result, dict) and result.get("status") == "error":
+                    current.set_status(Status(StatusCode.ERROR, str(result.get("error"))))
+                return result
+        return wrapper
+    return decorator
+
+def set_attributes(attributes: Dict[str, Any]):
+    """Annotate the current span, if it is being recorded."""
+    if _tracer is None:
+        return
+    current = trace.get_current_span()
+    if current.is_recording():
+        current.set_attributes({key: value for key, value in attributes.items() if value is not None})
+
+def inject_headers(headers: Optional[Dict[str, str]] = None) -> Optional[Dict[str, str]]:
+    """Add ``traceparent``/``tracestate`` for the current span to outbound request headers."""
+    if _tracer is None:
+        return headers
+    carrier = dict(headers or {})
+    propagate.inject(carrier)
+    return carrier
+
+def _request_queue_ms(value: Optional[str]) -> Optional[float]:
+    # Proxies stamp X-Request-Start as "t=<epoch seconds|ms|us>"; the gap is time spent queued before the app
+    if not value:
+        return None
+    try:
+        started = float(value.strip().lstrip("t="))
+    except ValueError:
+        return None
+    while started > 1e11:
+        started /= 1000
+    return round(max(0.0, time.time() - started) * 1000, 3)
+
+class TracingMiddleware:
+    """ASGI middleware opening a server span per HTTP request.
+
+    Continues the caller's trace from ``traceparent``, records the status
+    code and any proxy queue time, and returns the trace id in an
+    ``X-Trace-Id`` header when the request is sampled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or _tracer is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope.get("headers", [])}
+        attributes = {
+            "http.method": scope["method"],
+            "http.target": scope["path"],
+            "http.request.queue_ms": _request_queue_ms(headers.get("x-request-start"))
+        }
+        with _tracer.start_as_current_span(
+            f"{scope['method']} {scope['path']}",
+            context=propagate.extract(headers),
+            kind=SpanKind.SERVER,
+            attributes={key: value for key, value in attributes.items() if value is not None}
+        ) as server_span:
+            async def send_with_trace(message):
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    server_span.set_attribute("http.status_code", status_code)
+                    if status_code >= 500:
+                        server_span.set_status(Status(StatusCode.ERROR))
+                    if server_span.is_recording():
+                        trace_id = format(server_span.get_span_context().trace_id, "032x")
+                        message = {**message, "headers": [*message.get("headers", []), (b"x-trace-id", trace_id.encode())]}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace)
+            finally:
+                # Name the span by route template rather than concrete path once routing has run
+                path = scope["path"]
+                for param, value in (scope.get("path_params") or {}).items():
+                    path = path.replace(str(value), "{" + param + "}")
+                server_span.update_name(f"{scope['method']} {path}")
@@ -2,46 +2,88 @@
 Web Automation Agent - Specializes in web scraping and API interactions
 """
 
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from base_agent import BaseAgent
-import json
+from resilience import is_overload
+from web_fetcher import WebFetcher
+from metrics import stage
+from tracing import traced
+
+AUTOMATION_PROMPT = """
+Web Automation Task: {task_description}
+Parameters: {parameters}
+
+As a web automation expert, provide:
+1. Implementation approach
+2. Required tools/methods
+3. Step-by-step plan
+4. Expected challenges
+5. Success criteria
+"""
 
 class WebAutomationAgent(BaseAgent):
-    def __init__(self, llm_service_url: str):
-        super().__init__("web_automation", llm_service_url)
-        self.capabilities = ["web_scraping", "api_integration", "content_extraction"]
+    capabilities = ["web_scraping", "web_crawling", "api_integration", "content_extraction"]
     
-    async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
-        task_description = task.get("task_description", "")
-        parameters = task.get("parameters", {})
-        
-        automation_prompt = f"""
-        Web Automation Task: {task_description}
-        Parameters: {json.dumps(parameters, indent=2)}
+    def __init__(self, llm_service_url: str, web_fetcher: WebFetcher = None, max_pages: int = 20, **kwargs):
+        super().__init__("web_automation", llm_service_url, **kwargs)
+        self.web_fetcher = web_fetcher or WebFetcher()
+        self.max_pages = max_pages
+    
+    async def prepare_task(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        """Fetch (or crawl) the task's URLs so the LLM sees extracted page text instead of bare links."""
+        parameters = dict(task.get("parameters") or {})
+        urls = parameters.pop("urls", None) or parameters.pop("url", None) or []
+        if isinstance(urls, str):
+            urls = [urls]
+        if not isinstance(urls, list) or not all(isinstance(url, str) for url in urls):
+            raise ValueError("'urls' must be a URL or a list of URLs")
+        if not urls:
+            return task
         
-        As a web automation expert, provide:
-        1. Implementation approach
-        2. Required tools/methods
-        3. Step-by-step plan
-        4. Expected challenges
-        5. Success criteria
-        """
+        with stage("web_fetch"):
+            if parameters.get("crawl"):
+                pages = await self.web_fetcher.crawl(
+                    urls,
+                    max_pages=min(int(parameters.get("max_pages", 10)), self.max_pages),
+                    max_depth=int(parameters.get("max_depth", 1))
+                )
+            else:
+                pages = await self.web_fetcher.fetch_many(urls[:self.max_pages])
         
+        parameters["pages"] = [
+            {"url": page["url"], "error": page["error"]} if page.get("error")
+            else {"url": page["url"], "title": page.get("title"), "text": page["text"]}
+            for page in pages
+        ]
+        sources = [
+            {key: page.get(key) for key in ("url", "status", "cached", "truncated", "error") if page.get(key) is not None}
+            for page in pages
+        ]
+        return {**task, "parameters": parameters, "sources": sources}
+    
+    def build_prompt(self, task: Dict[str, Any]) -> Tuple[str, str]:
+        return self.render_prompt(AUTOMATION_PROMPT, task, "You are a web automation expert. Provide detailed implementation plans.")
+    
+    @traced("web_automation.execute")
+    async def execute(self, task: Dict[str, Any]) -> Dict[str, Any]:
         try:
-            response = await self.chat_with_llm(
-                automation_prompt,
-                "You are a web automation expert. Provide detailed implementation plans."
-            )
+            task = await self.prepare_task(task)
+            with stage("prompt_build"):
+                prompt, system_prompt = self.build_prompt(task)
+            response = await self.chat_with_llm(prompt, system_prompt, use_cache=task.get("use_cache", True))
             
             return {
                 "status": "completed",
                 "agent_type": "web_automation", 
                 "response": response,
+                "prompt_tokens": self.prompt_tokens(prompt, system_prompt),
+                "sources": task.get("sources"),
                 "capabilities": self.capabilities
             }
         except Exception as e:
             return {
                 "status": "error",
                 "agent_type": "web_automation",
-                "error": str(e)
+                "error": str(e),
+                "overloaded": is_overload(e)
             }
@@ -0,0 +1,535 @@
+"""
+Web Fetcher - Polite concurrent fetching with robots.txt, per-host rate limits and a revalidating disk cache
+"""
+
+import asyncio
+import codecs
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from html.parser import HTMLParser
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator
+from urllib.parse import urljoin, urldefrag, urlsplit
+from urllib.robotparser import RobotFileParser
+import httpx
+
+logger = logging.getLogger("agent.web_fetcher")
+
+TEXT_CONTENT_TYPES = ("text/plain", "application/json", "text/csv", "text/markdown", "application/xml", "text/xml")
+BLOCK_TAGS = {
+    "p", "div", "br", "li", "ul", "ol", "tr", "table", "section", "article", "header", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "pre", "blockquote", "hr", "main", "nav", "aside"
+}
+SKIP_TAGS = {"script", "style", "noscript", "template", "svg", "title"}
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML to text: feed decoded chunks as they arrive, read ``text()`` at the end."""
+
+    def __init__(self, max_chars: int = 200_000, max_links: int = 100):
+        super().__init__(convert_charrefs=True)
+        self.max_chars = max_chars
+        self.max_links = max_links
+        self.parts: List[str] = []
+        self.size = 0
+        self.title_parts: List[str] = []
+        self.links: List[str] = []
+        self._skip_depth = 0
+        self._in_title = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIP_TAGS:
+            self._skip_depth += 1
+            self._in_title = self._in_title or tag == "title"
+        elif tag in BLOCK_TAGS:
+            self._append("\n")
+        if tag == "a" and len(self.links) < self.max_links:
+            href = dict(attrs).get("href")
+            if href:
+                self.links.append(href)
+
+    def handle_endtag(self, tag):
+        if tag in SKIP_TAGS and self._skip_depth:
+            self._skip_depth -= 1
+            if tag == "title":
+                self._in_title = False
+        elif tag in BLOCK_TAGS:
+            self._append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title_parts.append(data)
+        elif not self._skip_depth:
+            self._append(data)
+
+    def _append(self, data: str):
+        if self.size < self.max_chars:
+            self.parts.append(data)
+            self.size += len(data)
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_chars
+
+    def title(self) -> Optional[str]:
+        return " ".join("".join(self.title_parts).split()) or None
+
+    def text(self) -> str:
+        lines = (" ".join(line.split()) for line in "".join(self.parts).splitlines())
+        return "\n".join(line for line in lines if line)[:self.max_chars]
+
+def is_public_address(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    return not (ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_reserved or ip.is_multicast or ip.is_unspecified)
+
+async def resolve_public_address(host: str) -> str:
+    """Resolve ``host`` and return an address to connect to; raises ``ValueError`` if any address is not public."""
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, None)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    if not addresses or not all(is_public_address(address) for address in addresses):
+        raise ValueError(f"Refusing to fetch {host}: resolves to a non-public address")
+    return addresses[0]
+
+class PublicAddressTransport(httpx.AsyncBaseTransport):
+    """Connects only to public addresses, checking the same address it connects to.
+
+    Each request's host is resolved here and the request is sent to the
+    checked IP, with the original name kept in the Host header and TLS SNI.
+    A DNS answer that changes between the check and the connect (rebinding)
+    therefore cannot redirect the connection to an internal address.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        address = await resolve_public_address(host)
+        if address != host:
+            # A copy, so the response still reports the URL that was asked for
+            request = httpx.Request(
+                request.method,
+                request.url.copy_with(host=address),
+                headers=request.headers,
+                stream=request.stream,
+                extensions={**request.extensions, "sni_hostname": host}
+            )
+        return await self.transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+class _HostState:
+    def __init__(self, concurrency: int, delay: float):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.delay = delay
+        self.next_request = 0.0
+        self.robots: Optional[RobotFileParser] = None
+        self.robots_expires = 0.0
+        self.robots_lock = asyncio.Lock()
+        self.in_use = 0
+
+class WebFetcher:
+    """Fetches pages for the web automation agent and reduces them to text.
+
+    Global concurrency is capped by ``max_concurrency`` and each host gets at
+    most ``per_host_concurrency`` requests in flight, spaced by
+    ``per_host_delay`` seconds (or the site's robots.txt Crawl-delay, if
+    longer, up to ``max_crawl_delay``). robots.txt is honoured when
+    ``respect_robots`` is set. State for at most ``max_hosts`` idle hosts is
+    kept.
+
+    Extracted text is cached on disk under ``cache_dir``. Entries younger
+    than ``fresh_ttl`` are served without a request; older ones are
+    revalidated with If-None-Match / If-Modified-Since and a 304 reuses the
+    stored text. Writes periodically prune entries older than
+    ``cache_max_age`` and the least recently written beyond
+    ``cache_max_entries``. HTML is parsed incrementally while the body streams in and
+    reading stops after ``max_bytes``.
+
+    With ``block_private_networks`` set, URLs resolving to loopback,
+    private or link-local addresses are refused so tasks cannot reach
+    internal services. Redirects are followed here, up to ``max_redirects``
+    hops, and every hop gets the same address and robots.txt checks.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 16,
+        per_host_concurrency: int = 2,
+        per_host_delay: float = 0.5,
+        timeout: float = 15.0,
+        max_bytes: int = 2 * 1024 * 1024,
+        max_chars: int = 200_000,
+        cache_dir: Optional[str] = "/tmp/agent-web-cache",
+        fresh_ttl: float = 300.0,
+        cache_max_age: float = 86400.0,
+        respect_robots: bool = True,
+        robots_ttl: float = 3600.0,
+        block_private_networks: bool = True,
+        user_agent: str = "AgentPlatformBot/1.0",
+        max_redirects: int = 5,
+        max_crawl_delay: float = 30.0,
+        max_hosts: int = 1024,
+        cache_max_entries: int = 10_000
+    ):
+        self.max_concurrency = max_concurrency
+        self.per_host_concurrency = per_host_concurrency
+        self.per_host_delay = per_host_delay
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.max_chars = max_chars
+        self.cache_dir = cache_dir
+        self.fresh_ttl = fresh_ttl
+        self.cache_max_age = cache_max_age
+        self.respect_robots = respect_robots
+        self.robots_ttl = robots_ttl
+        self.block_private_networks = block_private_networks
+        self.user_agent = user_agent
+        self.max_redirects = max_redirects
+        self.max_crawl_delay = max_crawl_delay
+        self.max_hosts = max_hosts
+        self.cache_max_entries = cache_max_entries
+        # Prune on the first write, then about every tenth of the cap
+        self._prune_every = max(1, cache_max_entries // 10)
+        self._writes_since_prune = self._prune_every
+
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._hosts: "OrderedDict[str, _HostState]" = OrderedDict()
+
+        self.requests = 0
+        self.cache_hits = 0
+        self.revalidated = 0
+        self.robots_blocked = 0
+        self.errors = 0
+        self.bytes_read = 0
+        self.redirects = 0
+        self.cache_evictions = 0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency)
+            )
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                # Redirects are followed in ``fetch`` so each hop is checked
+                follow_redirects=False,
+                headers={"User-Agent": self.user_agent},
+                transport=PublicAddressTransport(transport) if self.block_private_networks else transport
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _host(self, origin: str) -> _HostState:
+        state = self._hosts.get(origin)
+        if state is None:
+            self._evict_hosts()
+            state = self._hosts[origin] = _HostState(self.per_host_concurrency, self.per_host_delay)
+        self._hosts.move_to_end(origin)
+        return state
+
+    def _evict_hosts(self):
+        # Least recently used first; hosts in use or still inside their crawl delay are kept
+        now = asyncio.get_running_loop().time()
+        for origin in list(self._hosts):
+            if len(self._hosts) < self.max_hosts:
+                break
+            state = self._hosts[origin]
+            if not state.in_use and state.next_request <= now:
+                del self._hosts[origin]
+
+    @asynccontextmanager
+    async def _using_host(self, origin: str) -> AsyncIterator[_HostState]:
+        state = self._host(origin)
+        state.in_use += 1
+        try:
+            yield state
+        finally:
+            state.in_use -= 1
+
+    @asynccontextmanager
+    async def _host_slot(self, origin: str) -> AsyncIterator[None]:
+        async with self._using_host(origin) as state, state.semaphore:
+            loop = asyncio.get_running_loop()
+            now = loop.time()
+            wait = state.next_request - now
+            state.next_request = max(now, state.next_request) + state.delay
+            if wait > 0:
+                await asyncio.sleep(wait)
+            yield
+
+    async def _check_address(self, host: str):
+        # Early, readable refusal; the transport re-checks the address it actually connects to
+        if self.block_private_networks:
+            await resolve_public_address(host)
+
+    async def _robots(self, origin: str) -> Optional[RobotFileParser]:
+        async with self._using_host(origin) as state, state.robots_lock:
+            if state.robots_expires > time.monotonic():
+                return state.robots
+            parser = RobotFileParser()
+            try:
+                async with self._host_slot(origin), self._semaphore:
+                    self.requests += 1
+                    response = await self.client.get(f"{origin}/robots.txt")
+                    for _ in range(self.max_redirects):
+                        if not response.has_redirect_location:
+                            break
+                        response = await self.client.get(urljoin(str(response.url), response.headers["location"]))
+                if response.status_code >= 500:
+                    # Server errors mean "assume disallowed" until the next check (RFC 9309)
+                    parser.disallow_all = True
+                elif response.status_code >= 400:
+                    parser.allow_all = True
+                else:
+                    parser.parse(response.text.splitlines())
+            except httpx.HTTPError:
+                parser.disallow_all = True
+            delay = parser.crawl_delay(self.user_agent)
+            if delay:
+                state.delay = min(self.max_crawl_delay, max(self.per_host_delay, float(delay)))
+            state.robots = parser
+            state.robots_expires = time.monotonic() + self.robots_ttl
+            return parser
+
+    def _cache_path(self, url: str) -> Optional[str]:
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, hashlib.sha256(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _cache_load(self, url: str) -> Optional[Dict[str, Any]]:
+        path = self._cache_path(url)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as handle:
+                entry = json.load(handle)
+        except (OSError, ValueError):
+            return None
+        if time.time() - entry.get("fetched_at", 0) > self.cache_max_age:
+            return None
+        return entry
+
+    def _cache_store(self, url: str, entry: Dict[str, Any]):
+        path = self._cache_path(url)
+        if path is None:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        partial = f"{path}.{os.getpid()}.part"
+        with open(partial, "w") as handle:
+            json.dump(entry, handle)
+        os.replace(partial, path)
+        self._writes_since_prune += 1
+        if self._writes_since_prune >= self._prune_every:
+            self._writes_since_prune = 0
+            self._cache_prune()
+
+    def _cache_prune(self):
+        # Oldest writes first; a 304 rewrites its entry, so revalidated pages count as recent
+        files = []
+        with os.scandir(self.cache_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(".json"):
+                    try:
+                        files.append((entry.stat().st_mtime, entry.path))
+                    except OSError:
+                        pass
+        files.sort()
+        excess = len(files) - self.cache_max_entries
+        expired_before = time.time() - self.cache_max_age
+        for index, (mtime, path) in enumerate(files):
+            if index >= excess and mtime >= expired_before:
+                break
+            try:
+                os.remove(path)
+                self.cache_evictions += 1
+            except OSError:
+                pass
+
+    @staticmethod
+    def _page(entry: Dict[str, Any], cached: bool) -> Dict[str, Any]:
+        return {
+            "url": entry["url"],
+            "status": entry["status"],
+            "title": entry.get("title"),
+            "text": entry.get("text", ""),
+            "links": entry.get("links", []),
+            "truncated": entry.get("truncated", False),
+            "cached": cached
+        }
+
+    async def _read_text(self, response: httpx.Response) -> Tuple[str, Optional[str], List[str], bool]:
+        """Stream the body through the extractor, stopping at ``max_bytes`` or ``max_chars``."""
+        content_type = response.headers.get("content-type", "").split(";")[0].strip().lower()
+        is_html = content_type in ("text/html", "application/xhtml+xml") or not content_type
+        if not is_html and content_type not in TEXT_CONTENT_TYPES:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+        try:
+            decoder = codecs.getincrementaldecoder(response.charset_encoding or "utf-8")(errors="replace")
+        except LookupError:
+            decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        extractor = TextExtractor(self.max_chars) if is_html else None
+        plain: List[str] = []
+        size = 0
+        truncated = False
+
+        async for chunk in response.aiter_bytes():
+            size += len(chunk)
+            text = decoder.decode(chunk)
+            if extractor is not None:
+                extractor.feed(text)
+            else:
+                plain.append(text)
+            if size >= self.max_bytes or (extractor is not None and extractor.full):
+                truncated = True
+                break
+        self.bytes_read += size
+
+        if extractor is None:
+            body = ("".join(plain) + decoder.decode(b"", final=True))[:self.max_chars]
+            return body, None, [], truncated
+        extractor.feed(decoder.decode(b"", final=True))
+        extractor.close()
+        base = str(response.url)
+        links = []
+        for href in extractor.links:
+            link = urldefrag(urljoin(base, href))[0]
+            if link.startswith(("http://", "https://")) and link not in links:
+                links.append(link)
+        return extractor.text(), extractor.title(), links, truncated
+
+    async def fetch(self, url: str) -> Dict[str, Any]:
+        """Fetch one URL and return its extracted text; failures are reported in ``error``."""
+        url = urldefrag(url)[0]
+        for _ in range(self.max_redirects + 1):
+            page = await self._fetch_one(url)
+            location = page.pop("redirect", None)
+            if location is None:
+                return page
+            self.redirects += 1
+            url = location
+        self.errors += 1
+        return {"url": url, "status": None, "error": f"More than {self.max_redirects} redirects"}
+
+    async def _fetch_one(self, url: str) -> Dict[str, Any]:
+        """Fetch ``url`` without following redirects; a redirect is returned as ``{"redirect": <url>}``."""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            return {"url": url, "status": None, "error": "Only absolute http(s) URLs can be fetched"}
+        origin = f"{parts.scheme}://{parts.netloc}"
+
+        try:
+            await self._check_address(parts.hostname)
+            if self.respect_robots:
+                robots = await self._robots(origin)
+                if not robots.can_fetch(self.user_agent, url):
+                    self.robots_blocked += 1
+                    return {"url": url, "status": None, "error": "Disallowed by robots.txt"}
+
+            cached = await asyncio.to_thread(self._cache_load, url)
+            if cached is not None and time.time() - cached["fetched_at"] < self.fresh_ttl:
+                self.cache_hits += 1
+                return self._page(cached, True)
+
+            headers = {}
+            if cached is not None:
+                if cached.get("etag"):
+                    headers["If-None-Match"] = cached["etag"]
+                if cached.get("last_modified"):
+                    headers["If-Modified-Since"] = cached["last_modified"]
+
+            # Host slot first, so URLs queued behind a slow host do not hold global slots
+            async with self._host_slot(origin), self._semaphore:
+                self.requests += 1
+                async with self.client.stream("GET", url, headers=headers) as response:
+                    if response.has_redirect_location:
+                        return {"url": url, "redirect": urldefrag(urljoin(url, response.headers["location"]))[0]}
+                    if response.status_code == 304 and cached is not None:
+                        self.revalidated += 1
+                        cached["fetched_at"] = time.time()
+                        await asyncio.to_thread(self._cache_store, url, cached)
+                        return self._page(cached, True)
+                    if response.status_code >= 400:
+                        self.errors += 1
+                        return {"url": url, "status": response.status_code, "error": f"HTTP {response.status_code}"}
+                    text, title, links, truncated = await self._read_text(response)
+                    entry = {
+                        "url": url,
+                        "status": response.status_code,
+                        "title": title,
+                        "text": text,
+                        "links": links,
+                        "truncated": truncated,
+                        "etag": response.headers.get("etag"),
+                        "last_modified": response.headers.get("last-modified"),
+                        "fetched_at": time.time()
+                    }
+
+            if "no-store" not in response.headers.get("cache-control", ""):
+                await asyncio.to_thread(self._cache_store, url, entry)
+            return self._page(entry, False)
+
+        except (httpx.HTTPError, OSError, ValueError) as e:
+            self.errors += 1
+            logger.warning(f"Fetching {url} failed: {str(e)}")
+            return {"url": url, "status": None, "error": str(e) or type(e).__name__}
+
+    async def fetch_many(self, urls: List[str]) -> List[Dict[str, Any]]:
+        return list(await asyncio.gather(*(self.fetch(url) for url in urls)))
+
+    async def crawl(
+        self,
+        start_urls: List[str],
+        max_pages: int = 20,
+        max_depth: int = 1,
+        same_host: bool = True
+    ) -> List[Dict[str, Any]]:
+        """Breadth-first crawl from ``start_urls``, fetching each level concurrently."""
+        start_urls = list(dict.fromkeys(urldefrag(url)[0] for url in start_urls))
+        hosts = {urlsplit(url).netloc for url in start_urls}
+        seen = set(start_urls)
+        frontier = [(url, 0) for url in start_urls]
+        pages: List[Dict[str, Any]] = []
+
+        while frontier and len(pages) < max_pages:
+            level, frontier = frontier[:max_pages - len(pages)], frontier[max_pages - len(pages):]
+            results = await self.fetch_many([url for url, _ in level])
+            for (url, depth), page in zip(level, results):
+                pages.append(page)
+                if depth >= max_depth:
+                    continue
+                for link in page.get("links", []):
+                    if link not in seen and (not same_host or urlsplit(link).netloc in hosts):
+                        seen.add(link)
+                        frontier.append((link, depth + 1))
+        return pages
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_concurrency": self.max_concurrency,
+            "per_host_concurrency": self.per_host_concurrency,
+            "hosts": len(self._hosts),
+            "requests": self.requests,
+            "cache_hits": self.cache_hits,
+            "revalidated": self.revalidated,
+            "cache_evictions": self.cache_evictions,
+            "robots_blocked": self.robots_blocked,
+            "errors": self.errors,
+            "bytes_read": self.bytes_read,
+            "redirects": self.redirects
+        }
@@ -0,0 +1,217 @@
+"""
+Workflow Engine - DAG execution of agent steps with parallel branches, step caching and partial re-runs
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Any, List, Optional, Set
+from tenancy import current_tenant
+
+# Result fields handed to dependent steps; the rest (capabilities, token counts) is bookkeeping
+OUTPUT_FIELDS = ("response", "data_summary", "sources")
+
+class WorkflowError(Exception):
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+def step_output(result: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: result[field] for field in OUTPUT_FIELDS if result.get(field) is not None}
+
+def topological_order(steps: List[Dict[str, Any]], agent_types) -> List[Dict[str, Any]]:
+    """Validate a step list and return it dependencies-first; raises ``WorkflowError``."""
+    by_id: Dict[str, Dict[str, Any]] = {}
+    for step in steps:
+        step_id = step.get("id")
+        if not step_id or step_id in by_id:
+            raise WorkflowError(f"Step ids must be present and unique: {step_id!r}")
+        if step.get("agent_type") not in agent_types:
+            raise WorkflowError(f"Step {step_id}: unknown agent type {step.get('agent_type')!r}")
+        by_id[step_id] = step
+    for step in steps:
+        unknown = [dep for dep in step.get("depends_on", []) if dep not in by_id]
+        if unknown:
+            raise WorkflowError(f"Step {step['id']}: unknown dependencies {', '.join(unknown)}")
+
+    # Kahn's algorithm, keeping declaration order among ready steps
+    remaining = {step["id"]: set(step.get("depends_on", [])) for step in steps}
+    order = []
+    while remaining:
+        ready = [step_id for step_id, deps in remaining.items() if not deps]
+        if not ready:
+            raise WorkflowError(f"Workflow has a dependency cycle among: {', '.join(remaining)}")
+        for step_id in ready:
+            order.append(by_id[step_id])
+            del remaining[step_id]
+        for deps in remaining.values():
+            deps.difference_update(ready)
+    return order
+
+class WorkflowEngine:
+    """Runs workflows declared as a DAG of agent steps.
+
+    Each step names an agent, a task description and parameters, and may
+    ``depends_on`` other steps. A step starts as soon as its dependencies
+    have completed, so independent branches run concurrently, under the
+    orchestrator's batch limits. Dependency outputs are passed in memory
+    as ``parameters["inputs"][<step id>]``. A step whose dependencies did
+    not complete is marked ``skipped``.
+
+    Completed step results are cached per tenant by agent and resolved task,
+    so an identical step in another workflow (or a re-run) is not executed
+    again. Steps named in a ``rerun`` bypass both this and the response cache.
+    Runs are kept in memory (the newest ``max_runs``). ``rerun`` executes
+    only the failed and skipped steps, or the named steps and everything
+    downstream of them, and reuses the outputs of the rest.
+    """
+
+    def __init__(self, orchestrator, max_runs: int = 1000, step_cache_size: int = 1024):
+        self.orchestrator = orchestrator
+        self.max_runs = max_runs
+        self.step_cache_size = step_cache_size
+        self._runs: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._step_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+
+        self.workflows = 0
+        self.reruns = 0
+        self.steps_executed = 0
+        self.step_cache_hits = 0
+
+    async def run(self, steps: List[Dict[str, Any]], use_cache: bool = True) -> Dict[str, Any]:
+        order = topological_order(steps, self.orchestrator.agents)
+        record = {
+            "id": uuid.uuid4().hex,
+            "tenant": current_tenant(),
+            "status": "running",
+            "created_at": time.time(),
+            "updated_at": time.time(),
+            "use_cache": use_cache,
+            "steps": order,
+            "results": {}
+        }
+        self._runs[record["id"]] = record
+        while len(self._runs) > self.max_runs:
+            self._runs.popitem(last=False)
+
+        self.workflows += 1
+        await self._execute(record, {step["id"] for step in order}, set())
+        return record
+
+    async def rerun(self, workflow_id: str, step_ids: Optional[List[str]] = None) -> Dict[str, Any]:
+        record = self.get(workflow_id)
+        if record is None:
+            raise WorkflowError("Workflow not found", 404)
+        if record["status"] == "running":
+            raise WorkflowError("Workflow is still running", 409)
+
+        if step_ids:
+            unknown = [step_id for step_id in step_ids if step_id not in record["results"]]
+            if unknown:
+                raise WorkflowError(f"Unknown steps: {', '.join(unknown)}")
+            forced = set(step_ids)
+            to_run = self._with_descendants(record["steps"], forced)
+        else:
+            forced = set()
+            to_run = {
+                step_id for step_id, result in record["results"].items()
+                if result.get("status") != "completed"
+            }
+
+        self.reruns += 1
+        record["status"] = "running"
+        await self._execute(record, to_run, forced)
+        return record
+
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        return self._runs.get(workflow_id)
+
+    @staticmethod
+    def _with_descendants(steps: List[Dict[str, Any]], roots: Set[str]) -> Set[str]:
+        selected = set(roots)
+        # Steps are in topological order, so one pass reaches every descendant
+        for step in steps:
+            if selected.intersection(step.get("depends_on", [])):
+                selected.add(step["id"])
+        return selected
+
+    async def _execute(self, record: Dict[str, Any], to_run: Set[str], forced: Set[str]):
+        tasks: Dict[str, asyncio.Future] = {}
+
+        async def run_step(step: Dict[str, Any]):
+            deps = step.get("depends_on", [])
+            waiting = [tasks[dep] for dep in deps if dep in tasks]
+            if waiting:
+                await asyncio.gather(*waiting)
+
+            failed = [dep for dep in deps if record["results"].get(dep, {}).get("status") != "completed"]
+            if failed:
+                record["results"][step["id"]] = {
+                    "status": "skipped",
+                    "agent_type": step["agent_type"],
+                    "error": f"Dependencies did not complete: {', '.join(failed)}"
+                }
+                return
+
+            parameters = dict(step.get("parameters") or {})
+            if deps:
+                parameters["inputs"] = {dep: step_output(record["results"][dep]) for dep in deps}
+            task = {
+                "task_description": step.get("task_description", ""),
+                "parameters": parameters,
+                # A forced rerun must reach the LLM, not the response cache
+                "use_cache": record["use_cache"] and step["id"] not in forced
+            }
+            record["results"][step["id"]] = await self._run_task(step, task, record["use_cache"])
+
+        try:
+            for step in record["steps"]:
+                if step["id"] in to_run:
+                    tasks[step["id"]] = asyncio.ensure_future(run_step(step))
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+            statuses = {result.get("status") for result in record["results"].values()}
+            record["status"] = "completed" if statuses == {"completed"} else "failed"
+            record["updated_at"] = time.time()
+
+    def _step_key(self, step: Dict[str, Any], task: Dict[str, Any]) -> str:
+        # Per tenant: one tenant's step results must never be served to another
+        return self.orchestrator._request_key(step["agent_type"], {
+            "tenant": current_tenant(),
+            "task_description": task["task_description"],
+            "parameters": task["parameters"]
+        })
+
+    async def _run_task(self, step: Dict[str, Any], task: Dict[str, Any], cacheable: bool) -> Dict[str, Any]:
+        key = self._step_key(step, task) if cacheable else None
+        if key is not None and task["use_cache"]:
+            cached = self._step_cache.get(key)
+            if cached is not None:
+                self._step_cache.move_to_end(key)
+                self.step_cache_hits += 1
+                return dict(cached, cached=True)
+
+        self.steps_executed += 1
+        _, result = await self.orchestrator._execute_limited(
+            0, {"agent_type": step["agent_type"], "task": task}, mode="workflow"
+        )
+        if key is not None and result.get("status") == "completed":
+            self._step_cache[key] = result
+            self._step_cache.move_to_end(key)
+            while len(self._step_cache) > self.step_cache_size:
+                self._step_cache.popitem(last=False)
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "runs_stored": len(self._runs),
+            "running": sum(1 for record in self._runs.values() if record["status"] == "running"),
+            "workflows": self.workflows,
+            "reruns": self.reruns,
+            "steps_executed": self.steps_executed,
+            "step_cache_entries": len(self._step_cache),
+            "step_cache_hits": self.step_cache_hits
+        }
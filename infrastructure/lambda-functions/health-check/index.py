@@ -5,9 +5,12 @@ Provides comprehensive health checks for all infrastructure components
 
 import json
 import os
+import threading
+import time
 import boto3
 import psycopg2
 import redis
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
 import logging
 
@@ -15,40 +18,211 @@ import logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Check depths, cheapest first:
+#   liveness  - no backend calls; reports recently cached component results
+#   readiness - one cheap read-only probe per component
+#   deep      - full diagnostics, write tests and latency percentiles
+MODES = ('liveness', 'readiness', 'deep')
+DEFAULT_MODE = os.environ.get('HEALTH_DEFAULT_MODE', 'readiness')
+
+# Per-check deadlines, cache lifetimes (seconds) and deep-mode sample count
+CHECK_TIMEOUT = float(os.environ.get('HEALTH_CHECK_TIMEOUT', '8'))
+DEEP_CHECK_TIMEOUT = float(os.environ.get('HEALTH_DEEP_CHECK_TIMEOUT', '25'))
+RESULT_CACHE_TTL = float(os.environ.get('HEALTH_CACHE_TTL', '10'))
+LIVENESS_MAX_AGE = float(os.environ.get('HEALTH_LIVENESS_MAX_AGE', '300'))
+SECRET_CACHE_TTL = float(os.environ.get('SECRET_CACHE_TTL', '300'))
+DEEP_SAMPLES = int(os.environ.get('HEALTH_DEEP_SAMPLES', '5'))
+
+# Connect and query timeouts for the database drivers, below CHECK_TIMEOUT so a
+# check abandoned at its deadline does not keep running in the background
+DRIVER_TIMEOUT = float(os.environ.get('HEALTH_DRIVER_TIMEOUT', str(max(1.0, CHECK_TIMEOUT / 2))))
+
+# Module-level state survives across warm invocations of the same container
+_executor = ThreadPoolExecutor(max_workers=16)
+_lock = threading.Lock()
+_clients = {}
+_secrets = {}
+_pg_conn = None
+# psycopg2 connections must not be used from two threads at once
+_pg_lock = threading.Lock()
+_redis_client = None
+# component name -> (checked_at, mode, result)
+_component_cache = {}
+
+def get_client(service_name):
+    """
+    Return a cached boto3 client (clients are thread-safe, creating them is not)
+    """
+    with _lock:
+        if service_name not in _clients:
+            _clients[service_name] = boto3.client(service_name)
+        return _clients[service_name]
+
+def get_secret(secret_id):
+    """
+    Return a Secrets Manager secret as a dict, cached for SECRET_CACHE_TTL seconds
+    """
+    cached = _secrets.get(secret_id)
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+    
+    secret_response = get_client('secretsmanager').get_secret_value(SecretId=secret_id)
+    secret_data = json.loads(secret_response['SecretString'])
+    _secrets[secret_id] = (time.monotonic() + SECRET_CACHE_TTL, secret_data)
+    return secret_data
+
+def is_api_gateway_event(event):
+    """
+    True for events proxied from API Gateway, as opposed to direct invocations
+    """
+    return 'requestContext' in event or 'httpMethod' in event or 'queryStringParameters' in event
+
+def parse_request(event):
+    """
+    Read the check mode, component list and force flag from a direct or API Gateway event
+    """
+    if is_api_gateway_event(event):
+        # Public callers get cached liveness/readiness only; deep and forced
+        # checks hit the backends and are reserved for direct invocations
+        params = event.get('queryStringParameters') or {}
+        mode = params.get('mode') or DEFAULT_MODE
+        components = params.get('components') or list(CHECKS)
+        force = False
+        if mode == 'deep':
+            raise PermissionError("Deep checks are only available on direct invocation")
+    else:
+        mode = event.get('mode') or DEFAULT_MODE
+        components = event.get('components') or list(CHECKS)
+        force = event.get('force') in (True, 'true')
+    
+    if isinstance(components, str):
+        components = [name.strip() for name in components.split(',') if name.strip()]
+    
+    if mode not in MODES:
+        raise ValueError(f"Unknown mode '{mode}', expected one of {', '.join(MODES)}")
+    unknown = [name for name in components if name not in CHECKS]
+    if unknown:
+        raise ValueError(f"Unknown components: {', '.join(unknown)}")
+    
+    return mode, components, force
+
+def cached_result(name, max_age, modes):
+    """
+    Return a copy of a component result cached within max_age seconds by one of the given modes
+    """
+    cached = _component_cache.get(name)
+    if not cached:
+        return None
+    
+    checked_at, mode, result = cached
+    age = time.monotonic() - checked_at
+    if age > max_age or mode not in modes:
+        return None
+    
+    return dict(result, cached=True, checked_mode=mode, age_seconds=round(age, 1))
+
+def run_checks(names, mode, force=False):
+    """
+    Run the named health checks concurrently, reusing fresh cached results
+    """
+    if mode == 'liveness':
+        # Never touch the backends; report whatever is known and recent
+        results = {}
+        for name in names:
+            results[name] = cached_result(name, LIVENESS_MAX_AGE, MODES) or {'status': 'unknown'}
+        return results
+    
+    # A readiness probe is satisfied by a recent deep result, but not the other way round
+    reusable = ('readiness', 'deep') if mode == 'readiness' else ('deep',)
+    timeout = DEEP_CHECK_TIMEOUT if mode == 'deep' else CHECK_TIMEOUT
+    results = {}
+    futures = {}
+    
+    for name in names:
+        cached = None if force else cached_result(name, RESULT_CACHE_TTL, reusable)
+        if cached:
+            results[name] = cached
+        else:
+            futures[name] = _executor.submit(CHECKS[name], mode)
+    
+    deadline = time.monotonic() + timeout
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+        except FutureTimeoutError:
+            logger.error(f"{name} health check exceeded {timeout}s deadline")
+            results[name] = {
+                'status': 'unhealthy',
+                'error': f'check timed out after {timeout}s'
+            }
+        except Exception as e:
+            results[name] = {
+                'status': 'unhealthy',
+                'error': str(e)
+            }
+        _component_cache[name] = (time.monotonic(), mode, results[name])
+    
+    return {name: results[name] for name in names}
+
+def sample_latency(probe, samples=DEEP_SAMPLES):
+    """
+    Time repeated calls of a cheap probe and summarise them as latency percentiles
+    """
+    timings = []
+    for _ in range(samples):
+        start_time = time.perf_counter()
+        probe()
+        timings.append((time.perf_counter() - start_time) * 1000)
+    
+    timings.sort()
+    percentile = lambda q: round(timings[min(len(timings) - 1, int(len(timings) * q))], 2)
+    return {
+        'samples': len(timings),
+        'min_ms': round(timings[0], 2),
+        'p50_ms': percentile(0.50),
+        'p95_ms': percentile(0.95),
+        'max_ms': round(timings[-1], 2)
+    }
+
 def lambda_handler(event, context):
     """
     Main Lambda handler for health check functionality
+    
+    Accepts 'mode' (liveness, readiness or deep), 'components' (list or
+    comma-separated) and 'force' on direct invocations. API Gateway callers
+    may pass 'mode' (liveness or readiness) and 'components' as query string
+    parameters.
     """
+    event = event or {}
+    
+    try:
+        mode, components, force = parse_request(event)
+    except (ValueError, PermissionError) as e:
+        return {
+            'statusCode': 403 if isinstance(e, PermissionError) else 400,
+            'headers': {
+                'Content-Type': 'application/json'
+            },
+            'body': json.dumps({'error': str(e)})
+        }
+    
     try:
         # Initialize health check results
         health_status = {
             'timestamp': datetime.utcnow().isoformat(),
+            'mode': mode,
             'overall_status': 'healthy',
             'components': {}
         }
         
-        # Check RDS connectivity
-        rds_status = check_rds_health()
-        health_status['components']['rds'] = rds_status
-        
-        # Check Redis connectivity
-        redis_status = check_redis_health()
-        health_status['components']['redis'] = redis_status
-        
-        # Check EKS cluster status
-        eks_status = check_eks_health()
-        health_status['components']['eks'] = eks_status
-        
-        # Check AWS services
-        aws_status = check_aws_services()
-        health_status['components']['aws_services'] = aws_status
+        # Check the selected components concurrently
+        start_time = time.monotonic()
+        health_status['components'] = run_checks(components, mode, force)
+        health_status['duration_ms'] = round((time.monotonic() - start_time) * 1000, 2)
         
         # Determine overall status
         component_statuses = [
-            rds_status['status'],
-            redis_status['status'],
-            eks_status['status'],
-            aws_status['status']
+            component['status'] for component in health_status['components'].values()
         ]
         
         if 'unhealthy' in component_statuses:
@@ -56,16 +230,19 @@ def lambda_handler(event, context):
         elif 'degraded' in component_statuses:
             health_status['overall_status'] = 'degraded'
         
+        # Liveness only reports that the function itself is responsive
+        healthy = mode == 'liveness' or health_status['overall_status'] == 'healthy'
+        
         # Return response
         return {
-            'statusCode': 200 if health_status['overall_status'] == 'healthy' else 503,
+            'statusCode': 200 if healthy else 503,
             'headers': {
                 'Content-Type': 'application/json',
                 'Cache-Control': 'no-cache'
             },
             'body': json.dumps(health_status, indent=2)
         }
-        
+    
     except Exception as e:
         logger.error(f"Health check failed: {str(e)}")
         return {
@@ -80,58 +257,87 @@ def lambda_handler(event, context):
             })
         }
 
-def check_rds_health():
+def get_rds_connection():
+    """
+    Return the cached PostgreSQL connection, reconnecting if it was closed; callers hold _pg_lock
+    """
+    global _pg_conn
+    if _pg_conn is not None and _pg_conn.closed == 0:
+        return _pg_conn
+    
+    # Get database connection parameters from environment
+    host = os.environ.get('RDS_ENDPOINT')
+    port = os.environ.get('RDS_PORT', '5432')
+    database = os.environ.get('RDS_DATABASE')
+    
+    # Get credentials from Secrets Manager
+    secret_arn = os.environ.get('SECRET_ARN')
+    
+    if secret_arn:
+        secret_data = get_secret(secret_arn)
+        username = secret_data['username']
+        password = secret_data['password']
+    else:
+        # Fallback to environment variables for development
+        username = 'dbadmin'
+        password = 'temp_password'
+    
+    _pg_conn = psycopg2.connect(
+        host=host,
+        port=port,
+        database=database,
+        user=username,
+        password=password,
+        connect_timeout=max(2, int(DRIVER_TIMEOUT)),
+        options=f'-c statement_timeout={int(DRIVER_TIMEOUT * 1000)}'
+    )
+    _pg_conn.autocommit = True
+    return _pg_conn
+
+def query_rds(sql):
+    """
+    Run a query on the cached connection, reconnecting once if it went stale
+    """
+    global _pg_conn
+    with _pg_lock:
+        for attempt in range(2):
+            conn = get_rds_connection()
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute(sql)
+                    return cursor.fetchone()
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                _pg_conn = None
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                if attempt == 1:
+                    raise
+
+def check_rds_health(mode='readiness'):
     """
     Check RDS PostgreSQL database connectivity and basic functionality
     """
     try:
-        # Get database connection parameters from environment
-        host = os.environ.get('RDS_ENDPOINT')
-        port = os.environ.get('RDS_PORT', '5432')
-        database = os.environ.get('RDS_DATABASE')
-        
-        # Get credentials from Secrets Manager
-        secrets_client = boto3.client('secretsmanager')
-        secret_arn = os.environ.get('SECRET_ARN')
-        
-        if secret_arn:
-            secret_response = secrets_client.get_secret_value(SecretId=secret_arn)
-            secret_data = json.loads(secret_response['SecretString'])
-            username = secret_data['username']
-            password = secret_data['password']
-        else:
-            # Fallback to environment variables for development
-            username = 'dbadmin'
-            password = 'temp_password'
-        
-        # Test database connection
+        # Test database connection with a simple query
         start_time = datetime.utcnow()
-        conn = psycopg2.connect(
-            host=host,
-            port=port,
-            database=database,
-            user=username,
-            password=password,
-            connect_timeout=10
-        )
-        
-        # Execute a simple query
-        cursor = conn.cursor()
-        cursor.execute("SELECT version(), current_timestamp;")
-        result = cursor.fetchone()
-        
-        cursor.close()
-        conn.close()
-        
+        query_rds("SELECT 1;")
         response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
         
-        return {
+        status = {
             'status': 'healthy',
-            'response_time_ms': round(response_time, 2),
-            'version': result[0].split(' ')[1] if result else 'unknown',
-            'timestamp': result[1].isoformat() if result else None
+            'response_time_ms': round(response_time, 2)
         }
         
+        if mode == 'deep':
+            result = query_rds("SELECT version(), current_timestamp;")
+            status['version'] = result[0].split(' ')[1] if result else 'unknown'
+            status['timestamp'] = result[1].isoformat() if result else None
+            status['latency'] = sample_latency(lambda: query_rds("SELECT 1;"))
+        
+        return status
+    
     except Exception as e:
         logger.error(f"RDS health check failed: {str(e)}")
         return {
@@ -139,65 +345,79 @@ def check_rds_health():
             'error': str(e)
         }
 
-def check_redis_health():
+def get_redis_client():
+    """
+    Return the cached Redis client; its connection pool is reused across invocations
+    """
+    global _redis_client
+    if _redis_client is not None:
+        return _redis_client
+    
+    # Get Redis connection parameters from environment
+    host = os.environ.get('REDIS_ENDPOINT')
+    port = int(os.environ.get('REDIS_PORT', '6379'))
+    
+    # Get auth token from Secrets Manager
+    secret_name = f"{os.environ.get('PROJECT_NAME', 'agent-platform')}-{os.environ.get('ENVIRONMENT', 'dev')}-redis-credentials"
+    
+    try:
+        auth_token = get_secret(secret_name)['auth_token']
+    except Exception as e:
+        # Not cached, so the next invocation retries the lookup instead of
+        # keeping an unauthenticated, non-TLS client for the container's lifetime
+        logger.warning(f"Redis auth token lookup failed, connecting without auth: {str(e)}")
+        return redis.Redis(
+            host=host,
+            port=port,
+            socket_connect_timeout=DRIVER_TIMEOUT,
+            socket_timeout=DRIVER_TIMEOUT
+        )
+    
+    _redis_client = redis.Redis(
+        host=host,
+        port=port,
+        password=auth_token,
+        ssl=True,
+        socket_connect_timeout=DRIVER_TIMEOUT,
+        socket_timeout=DRIVER_TIMEOUT,
+        health_check_interval=30
+    )
+    return _redis_client
+
+def check_redis_health(mode='readiness'):
     """
     Check Redis ElastiCache connectivity and basic functionality
     """
     try:
-        # Get Redis connection parameters from environment
-        host = os.environ.get('REDIS_ENDPOINT')
-        port = int(os.environ.get('REDIS_PORT', '6379'))
-        
-        # Get auth token from Secrets Manager
-        secrets_client = boto3.client('secretsmanager')
-        secret_name = f"{os.environ.get('PROJECT_NAME', 'agent-platform')}-{os.environ.get('ENVIRONMENT', 'dev')}-redis-credentials"
-        
-        try:
-            secret_response = secrets_client.get_secret_value(SecretId=secret_name)
-            secret_data = json.loads(secret_response['SecretString'])
-            auth_token = secret_data['auth_token']
-        except:
-            auth_token = None
-        
         # Test Redis connection
         start_time = datetime.utcnow()
-        
-        if auth_token:
-            r = redis.Redis(
-                host=host,
-                port=port,
-                password=auth_token,
-                ssl=True,
-                socket_connect_timeout=10,
-                socket_timeout=10
-            )
-        else:
-            r = redis.Redis(
-                host=host,
-                port=port,
-                socket_connect_timeout=10,
-                socket_timeout=10
-            )
-        
-        # Test basic operations
+        r = get_redis_client()
         r.ping()
-        r.set('health_check', 'ok', ex=60)
-        value = r.get('health_check')
-        r.delete('health_check')
-        
         response_time = (datetime.utcnow() - start_time).total_seconds() * 1000
         
-        # Get Redis info
-        info = r.info()
-        
-        return {
+        status = {
             'status': 'healthy',
-            'response_time_ms': round(response_time, 2),
-            'version': info.get('redis_version', 'unknown'),
-            'memory_used': info.get('used_memory_human', 'unknown'),
-            'connected_clients': info.get('connected_clients', 0)
+            'response_time_ms': round(response_time, 2)
         }
         
+        if mode == 'deep':
+            # Test basic write/read operations
+            r.set('health_check', 'ok', ex=60)
+            value = r.get('health_check')
+            r.delete('health_check')
+            if value not in (b'ok', 'ok'):
+                status['status'] = 'degraded'
+                status['error'] = 'read after write returned an unexpected value'
+            
+            # Get Redis info
+            info = r.info()
+            status['version'] = info.get('redis_version', 'unknown')
+            status['memory_used'] = info.get('used_memory_human', 'unknown')
+            status['connected_clients'] = info.get('connected_clients', 0)
+            status['latency'] = sample_latency(r.ping)
+        
+        return status
+    
     except Exception as e:
         logger.error(f"Redis health check failed: {str(e)}")
         return {
@@ -205,7 +425,7 @@ def check_redis_health():
             'error': str(e)
         }
 
-def check_eks_health():
+def check_eks_health(mode='readiness'):
     """
     Check EKS cluster status and basic functionality
     """
@@ -220,7 +440,7 @@ def check_eks_health():
             }
         
         # Check cluster status using AWS API
-        eks_client = boto3.client('eks')
+        eks_client = get_client('eks')
         
         start_time = datetime.utcnow()
         cluster_response = eks_client.describe_cluster(name=cluster_name)
@@ -229,16 +449,26 @@ def check_eks_health():
         cluster = cluster_response['cluster']
         cluster_status = cluster['status']
         
-        # Check node groups
+        status = {
+            'status': 'healthy' if cluster_status == 'ACTIVE' else 'unhealthy',
+            'response_time_ms': round(response_time, 2),
+            'cluster_status': cluster_status,
+            'cluster_version': cluster['version'],
+            'endpoint': cluster['endpoint']
+        }
+        
+        if mode != 'deep':
+            return status
+        
+        # Check node groups, describing them in parallel
         nodegroups_response = eks_client.list_nodegroups(clusterName=cluster_name)
-        nodegroup_statuses = []
         
-        for nodegroup_name in nodegroups_response['nodegroups']:
+        def describe_nodegroup(nodegroup_name):
             ng_response = eks_client.describe_nodegroup(
                 clusterName=cluster_name,
                 nodegroupName=nodegroup_name
             )
-            nodegroup_statuses.append({
+            return {
                 'name': nodegroup_name,
                 'status': ng_response['nodegroup']['status'],
                 'capacity': {
@@ -246,27 +476,25 @@ def check_eks_health():
                     'min': ng_response['nodegroup']['scalingConfig']['minSize'],
                     'max': ng_response['nodegroup']['scalingConfig']['maxSize']
                 }
-            })
+            }
+        
+        # A dedicated pool: nesting on _executor could deadlock when it is busy with the top-level checks
+        nodegroup_names = nodegroups_response['nodegroups']
+        if nodegroup_names:
+            with ThreadPoolExecutor(max_workers=min(8, len(nodegroup_names))) as pool:
+                nodegroup_statuses = list(pool.map(describe_nodegroup, nodegroup_names))
+        else:
+            nodegroup_statuses = []
         
         # Determine overall EKS status
         if cluster_status == 'ACTIVE':
             unhealthy_nodegroups = [ng for ng in nodegroup_statuses if ng['status'] != 'ACTIVE']
             if unhealthy_nodegroups:
-                status = 'degraded'
-            else:
-                status = 'healthy'
-        else:
-            status = 'unhealthy'
-        
-        return {
-            'status': status,
-            'response_time_ms': round(response_time, 2),
-            'cluster_status': cluster_status,
-            'cluster_version': cluster['version'],
-            'endpoint': cluster['endpoint'],
-            'nodegroups': nodegroup_statuses
-        }
+                status['status'] = 'degraded'
         
+        status['nodegroups'] = nodegroup_statuses
+        return status
+    
     except Exception as e:
         logger.error(f"EKS health check failed: {str(e)}")
         return {
@@ -274,39 +502,36 @@ def check_eks_health():
             'error': str(e)
         }
 
-def check_aws_services():
+def check_aws_services(mode='readiness'):
     """
     Check AWS service availability and quotas
     """
     try:
-        services_status = {}
-        
-        # Check Secrets Manager
-        try:
-            secrets_client = boto3.client('secretsmanager')
-            secrets_client.list_secrets(MaxResults=1)
-            services_status['secrets_manager'] = 'healthy'
-        except Exception as e:
-            services_status['secrets_manager'] = f'unhealthy: {str(e)}'
-        
-        # Check Systems Manager Parameter Store
-        try:
-            ssm_client = boto3.client('ssm')
-            ssm_client.get_parameters_by_path(
+        def probe(call):
+            try:
+                call()
+                return 'healthy'
+            except Exception as e:
+                return f'unhealthy: {str(e)}'
+        
+        probes = {
+            # Check Secrets Manager
+            'secrets_manager': lambda: get_client('secretsmanager').list_secrets(MaxResults=1),
+            # Check Systems Manager Parameter Store
+            'parameter_store': lambda: get_client('ssm').get_parameters_by_path(
                 Path=f"/{os.environ.get('PROJECT_NAME', 'agent-platform')}/",
                 MaxResults=1
             )
-            services_status['parameter_store'] = 'healthy'
-        except Exception as e:
-            services_status['parameter_store'] = f'unhealthy: {str(e)}'
+        }
         
-        # Check CloudWatch
-        try:
-            cloudwatch_client = boto3.client('cloudwatch')
-            cloudwatch_client.list_metrics(MaxRecords=1)
-            services_status['cloudwatch'] = 'healthy'
-        except Exception as e:
-            services_status['cloudwatch'] = f'unhealthy: {str(e)}'
+        if mode == 'deep':
+            # Check CloudWatch
+            probes['cloudwatch'] = lambda: get_client('cloudwatch').list_metrics(MaxRecords=1)
+        
+        # Probe the services in parallel
+        with ThreadPoolExecutor(max_workers=len(probes)) as pool:
+            futures = {name: pool.submit(probe, call) for name, call in probes.items()}
+            services_status = {name: future.result() for name, future in futures.items()}
         
         # Determine overall AWS services status
         unhealthy_services = [k for k, v in services_status.items() if not v.startswith('healthy')]
@@ -322,7 +547,7 @@ def check_aws_services():
             'status': overall_status,
             'services': services_status
         }
-        
+    
     except Exception as e:
         logger.error(f"AWS services health check failed: {str(e)}")
         return {
@@ -330,3 +555,9 @@ def check_aws_services():
             'error': str(e)
         }
 
+CHECKS = {
+    'rds': check_rds_health,
+    'redis': check_redis_health,
+    'eks': check_eks_health,
+    'aws_services': check_aws_services
+}